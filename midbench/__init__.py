@@ -1,2 +1,2 @@
 from midbench.core import Env, Design, Condition
-from midbench import envs, utils
\ No newline at end of file
+from midbench import data, envs, utils
\ No newline at end of file
@@ -0,0 +1 @@
+from midbench.data.database import DataBase, DataEntry
\ No newline at end of file
@@ -0,0 +1,355 @@
+"""Columnar storage of the (design, condition, performance) tuples produced by the environments."""
+import json
+import os
+from collections.abc import Mapping
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from midbench import error
+
+GROUPS = ("designs", "conditions", "performances")
+
+
+def _as_group(values) -> Dict[str, np.ndarray]:
+    """Named arrays of a group, an unnamed array being named ``value``."""
+    if values is None:
+        return {}
+    if isinstance(values, Mapping):
+        return {name: np.asarray(value) for name, value in values.items()}
+    return {"value": np.asarray(values)}
+
+
+class DataEntry:
+    r"""The (design, condition, performance) tuples of a simulation or optimization process.
+
+    Each of the three groups is a mapping from field names to arrays sharing their first
+    dimension, e.g., ``conditions={"mach": [0.7, 0.8], "reynolds": [6e6, 8e6]}``. An array
+    given instead of a mapping is stored as the single field ``value``. Indexing and
+    slicing apply across all fields of the three groups.
+
+    Args:
+        designs: The designs.
+        conditions: The boundary conditions.
+        performances: The corresponding performances.
+        specs: The specifications of the operation by which this data is obtained.
+    """
+
+    def __init__(self, designs, conditions, performances, specs=None):
+        designs, conditions, performances = map(_as_group, (designs, conditions, performances))
+        if not self._is_compatible(designs, conditions, performances):
+            lengths = {name: len(value) for name, value in self._flatten(designs, conditions, performances).items()}
+            raise error.SchemaError(f"The fields of a data entry differ in length: {lengths}.")
+        self.designs = designs
+        self.conditions = conditions
+        self.performances = performances
+        self.specs = specs
+
+    @classmethod
+    def from_record(cls, designs, conditions, performances, specs=None) -> "DataEntry":
+        """Builds a single-row entry from the values of one tuple, e.g., scalar conditions."""
+        add_row = lambda group: {name: np.asarray(value)[None] for name, value in _as_group(group).items()}
+        return cls(add_row(designs), add_row(conditions), add_row(performances), specs)
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, np.ndarray], specs=None) -> "DataEntry":
+        """Inverse of :meth:`columns`."""
+        groups = {group: {} for group in GROUPS}
+        for key, value in columns.items():
+            group, name = key.split(".", 1)
+            groups[group][name] = value
+        return cls(**groups, specs=specs)
+
+    @staticmethod
+    def _flatten(designs, conditions, performances) -> Dict[str, np.ndarray]:
+        return {
+            f"{group}.{name}": value
+            for group, fields in zip(GROUPS, (designs, conditions, performances))
+            for name, value in fields.items()
+        }
+
+    @staticmethod
+    def _is_compatible(designs, conditions, performances) -> bool:
+        """Checks if the first dimensions of the designs, conditions and performances agree."""
+        lengths = {len(value) for value in DataEntry._flatten(designs, conditions, performances).values()}
+        return len(lengths) <= 1
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """The fields of all groups keyed by ``"<group>.<name>"``, e.g., ``"conditions.mach"``."""
+        return self._flatten(self.designs, self.conditions, self.performances)
+
+    def __len__(self) -> int:
+        return next((len(value) for value in self.columns().values()), 0)
+
+    def __getitem__(self, idx) -> "DataEntry":
+        if isinstance(idx, (int, np.integer)):
+            idx = [idx]
+        return DataEntry.from_columns({key: value[idx] for key, value in self.columns().items()}, self.specs)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __repr__(self) -> str:
+        return f"DataEntry(size={len(self)}, columns={list(self.columns())})"
+
+
+class DataBase:
+    r"""Append-only columnar store of data entries on disk.
+
+    Every column, e.g., ``"designs.airfoil"`` or ``"conditions.mach"``, is stored in chunks
+    of ``chunk_rows`` rows as ``.npy`` files under ``path/chunks``, described by
+    ``path/schema.json``. The chunks are preallocated and memory-mapped, so appending writes
+    the new rows in place, and reading a range within a chunk returns a view without copy.
+    The minimum and maximum of the scalar columns are kept per chunk to skip chunks in range
+    queries, and :meth:`create_index` adds a sorted index to a column. Appended rows become
+    visible to readers once the schema is committed at the end of :meth:`append`.
+    A database supports a single writer.
+
+    Only the columns are stored: the ``specs`` of the appended entries are dropped, and the
+    entries returned by :meth:`select` have none. Keep the specifications of the process
+    that produced the data next to the database if they are needed.
+
+    Args:
+        path: The directory of the database, created if it does not exist.
+        entries: Data entries to be appended.
+        chunk_rows: The number of rows per chunk of a new database.
+    """
+
+    def __init__(self, path: str, *entries: DataEntry, chunk_rows: int = 65536):
+        self.path = path
+        self._readers = {}
+        self._writers = {}
+        if os.path.exists(self._schema_path):
+            with open(self._schema_path) as f:
+                self.schema = json.load(f)
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.schema = {"chunk_rows": chunk_rows, "n_rows": 0, "columns": {}, "stats": {}, "indexes": {}}
+        for entry in entries:
+            self.append(entry)
+
+    @property
+    def _schema_path(self) -> str:
+        return os.path.join(self.path, "schema.json")
+
+    @property
+    def chunk_rows(self) -> int:
+        return self.schema["chunk_rows"]
+
+    @property
+    def columns(self) -> Dict[str, Tuple[np.dtype, tuple]]:
+        """The dtype and the row shape of each column."""
+        return {
+            name: (np.dtype(spec["dtype"]), tuple(spec["shape"]))
+            for name, spec in self.schema["columns"].items()
+        }
+
+    def __len__(self) -> int:
+        return self.schema["n_rows"]
+
+    def _commit(self):
+        tmp = self._schema_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.schema, f)
+        os.replace(tmp, self._schema_path)
+
+    def _chunk_path(self, chunk: int, name: str) -> str:
+        return os.path.join(self.path, "chunks", f"{chunk:06d}", name + ".npy")
+
+    def _chunk_size(self, chunk: int) -> int:
+        return min(self.chunk_rows, len(self) - chunk * self.chunk_rows)
+
+    def _writer(self, chunk: int, name: str) -> np.memmap:
+        if (chunk, name) not in self._writers:
+            path = self._chunk_path(chunk, name)
+            if os.path.exists(path):
+                array = np.load(path, mmap_mode="r+")
+            else:
+                dtype, shape = self.columns[name]
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                array = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(self.chunk_rows,) + shape)
+            self._writers = {key: value for key, value in self._writers.items() if key[0] == chunk}
+            self._writers[chunk, name] = array
+        return self._writers[chunk, name]
+
+    def _reader(self, chunk: int, name: str) -> np.ndarray:
+        if (chunk, name) not in self._readers:
+            self._readers[chunk, name] = np.load(self._chunk_path(chunk, name), mmap_mode="r")
+        return self._readers[chunk, name][: self._chunk_size(chunk)]
+
+    def _check(self, columns: Dict[str, np.ndarray]):
+        if not self.schema["columns"]:
+            self.schema["columns"] = {
+                name: {"dtype": value.dtype.str, "shape": list(value.shape[1:])} for name, value in columns.items()
+            }
+            self.schema["stats"] = {
+                name: [] for name, value in columns.items()
+                if value.dtype.kind in "biuf" and int(np.prod(value.shape[1:])) == 1
+            }
+        if set(columns) != set(self.schema["columns"]):
+            raise error.SchemaError(
+                f"The columns {sorted(columns)} do not match the schema {sorted(self.schema['columns'])}."
+            )
+        for name, (dtype, shape) in self.columns.items():
+            value = columns[name]
+            if value.shape[1:] != shape or not np.can_cast(value.dtype, dtype, "same_kind"):
+                raise error.SchemaError(
+                    f"Column {name} expects rows of shape {shape} and dtype {dtype}, "
+                    f"got {value.shape[1:]} and {value.dtype}."
+                )
+
+    def append(self, entry: DataEntry):
+        """Appends the rows of a data entry to the database.
+
+        Args:
+            entry: The data entry, whose columns must match those of the previous entries.
+        """
+        columns = entry.columns()
+        self._check(columns)
+        n, start = len(entry), 0
+        while start < n:
+            chunk, offset = divmod(len(self), self.chunk_rows)
+            stop = start + min(n - start, self.chunk_rows - offset)
+            for name, value in columns.items():
+                writer = self._writer(chunk, name)
+                writer[offset : offset + stop - start] = value[start:stop]
+                writer.flush()
+                if name in self.schema["stats"]:
+                    self._update_stats(name, chunk, value[start:stop])
+            self.schema["n_rows"] += stop - start
+            start = stop
+        self._commit()
+
+    def extend(self, entries: Sequence[DataEntry]):
+        """Appends several data entries at once, dropping their ``specs`` as :meth:`append` does."""
+        entries = list(entries)
+        if entries:
+            columns = {key: np.concatenate([entry.columns()[key] for entry in entries]) for key in entries[0].columns()}
+            self.append(DataEntry.from_columns(columns))
+
+    def _update_stats(self, name: str, chunk: int, value: np.ndarray):
+        stats = self.schema["stats"][name]
+        low, high = value.min().item(), value.max().item()
+        if chunk < len(stats):
+            stats[chunk] = [min(stats[chunk][0], low), max(stats[chunk][1], high)]
+        else:
+            stats.append([low, high])
+
+    def read(self, name: str, rows: Union[slice, Sequence[int], np.ndarray] = slice(None)) -> np.ndarray:
+        """Reads the rows of a column.
+
+        Args:
+            name: The column, e.g., ``"conditions.mach"``.
+            rows: A slice or an array of row indices.
+
+        Returns:
+            The values. A slice of unit step within a chunk is a read-only view of the
+            memory map, anything else is copied.
+        """
+        if name not in self.schema["columns"]:
+            raise KeyError(name)
+        if isinstance(rows, slice):
+            start, stop, step = rows.indices(len(self))
+            first, last = divmod(start, self.chunk_rows), divmod(max(stop - 1, start), self.chunk_rows)
+            if step == 1 and first[0] == last[0] and start < stop:
+                return self._reader(first[0], name)[first[1] : last[1] + 1]
+            rows = np.arange(start, stop, step)
+        rows = np.asarray(rows, dtype=np.int64)
+        rows = np.where(rows < 0, rows + len(self), rows)
+        if rows.size and (rows.min() < 0 or rows.max() >= len(self)):
+            raise IndexError(f"Row indices out of range for a database of size {len(self)}.")
+        dtype, shape = self.columns[name]
+        out = np.empty((len(rows),) + shape, dtype=dtype)
+        chunks = rows // self.chunk_rows
+        for chunk in np.unique(chunks):
+            mask = chunks == chunk
+            out[mask] = self._reader(int(chunk), name)[rows[mask] - chunk * self.chunk_rows]
+        return out
+
+    def chunks(self, name: str):
+        """Yields the chunks of a column as read-only views of the memory maps."""
+        for chunk in range(-(-len(self) // self.chunk_rows)):
+            yield self._reader(chunk, name)
+
+    def select(self, rows, columns: Optional[Sequence[str]] = None) -> DataEntry:
+        """The data entry of the given rows, restricted to ``columns`` if given, without ``specs``."""
+        columns = self.schema["columns"] if columns is None else columns
+        return DataEntry.from_columns({name: self.read(name, rows) for name in columns})
+
+    def __getitem__(self, key) -> Union[np.ndarray, DataEntry]:
+        if isinstance(key, str):
+            return self.read(key)
+        if isinstance(key, (int, np.integer)):
+            key = [key]
+        return self.select(key)
+
+    def create_index(self, name: str):
+        """Adds a sorted index to a scalar column, kept up to date on the next query.
+
+        Args:
+            name: The column, e.g., ``"conditions.mach"``.
+        """
+        if name not in self.schema["stats"]:
+            raise error.SchemaError(f"Only scalar numeric columns can be indexed, got {name}.")
+        self.schema["indexes"].setdefault(name, 0)
+        self._index(name)
+
+    def _index(self, name: str) -> Tuple[np.ndarray, np.ndarray]:
+        path = os.path.join(self.path, "indexes", name)
+        n_indexed = self.schema["indexes"][name]
+        if n_indexed:
+            values, rows = np.load(path + ".values.npy"), np.load(path + ".rows.npy")
+        else:
+            values, rows = np.empty(0, dtype=self.columns[name][0]), np.empty(0, dtype=np.int64)
+        if n_indexed < len(self):  # merge the new rows, two sorted runs for the stable sort
+            new = self.read(name, slice(n_indexed, len(self))).ravel()
+            order = np.argsort(new, kind="stable")
+            values = np.concatenate([values, new[order]])
+            rows = np.concatenate([rows, np.arange(n_indexed, len(self))[order]])
+            order = np.argsort(values, kind="stable")
+            values, rows = values[order], rows[order]
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            for suffix, array in ((".values.npy", values), (".rows.npy", rows)):
+                np.save(path + suffix + ".tmp.npy", array)
+                os.replace(path + suffix + ".tmp.npy", path + suffix)
+            self.schema["indexes"][name] = len(self)
+            self._commit()
+        return values, rows
+
+    def _scan(self, name: str, low: float, high: float) -> np.ndarray:
+        rows = []
+        stats = self.schema["stats"][name]
+        for chunk, values in enumerate(self.chunks(name)):
+            if stats[chunk][1] < low or stats[chunk][0] > high:
+                continue
+            values = values.reshape(len(values))
+            rows.append(np.flatnonzero((values >= low) & (values <= high)) + chunk * self.chunk_rows)
+        return np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+
+    def query(self, ranges: Dict[str, Tuple[Optional[float], Optional[float]]]) -> np.ndarray:
+        """Finds the rows whose values fall in the given closed ranges.
+
+        Args:
+            ranges: The ``(low, high)`` bounds per scalar column, ``None`` for no bound,
+                e.g., ``{"conditions.mach": (0.6, 0.8), "conditions.reynolds": (None, 1e7)}``.
+
+        Returns:
+            The sorted indices of the rows satisfying all ranges.
+        """
+        result = np.arange(len(self))
+        for name, (low, high) in ranges.items():
+            if name not in self.schema["stats"]:
+                raise error.SchemaError(f"Only scalar numeric columns can be queried, got {name}.")
+            low = -np.inf if low is None else low
+            high = np.inf if high is None else high
+            if name in self.schema["indexes"]:
+                values, rows = self._index(name)
+                rows = rows[np.searchsorted(values, low, "left") : np.searchsorted(values, high, "right")]
+            else:
+                rows = self._scan(name, low, high)
+            result = np.intersect1d(result, rows, assume_unique=True)
+        return result
+
+    def __repr__(self) -> str:
+        return f"DataBase(path={self.path!r}, size={len(self)}, columns={list(self.schema['columns'])})"
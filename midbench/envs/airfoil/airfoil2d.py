@@ -1,10 +1,14 @@
 # from typing import Optional, Union
 import numpy as np
-import os, sys, shutil, glob
-import pandas as pd
+import os, sys, glob, copy, subprocess, tempfile, threading
 sys.path.append(os.environ['SU2_RUN'])
 import SU2
 import midbench
+from midbench import logger
+from midbench.envs.airfoil import su2_io
+from midbench.envs.airfoil.fidelity import FIDELITIES, SuccessiveHalving, check_fidelity
+from midbench.envs.airfoil.monitor import ConvergenceMonitor
+from midbench.envs.airfoil.restart import RestartStore, restart_ascii_filename
 
 
 class Airfoil2dCondition(midbench.core.Condition):
@@ -38,23 +42,41 @@ class Airfoil2dDesign(midbench.core.Design):
         self, 
         air_coord_path= 'airfoils_pred_cbegan_example.npy', 
         su2='mesh_NACA0012_inv.su2',
+        su2_coarse=None,
     ):
         self.air_coord_path = air_coord_path
         self.su2 = os.path.abspath(su2)
+        self.su2_coarse = None if su2_coarse is None else os.path.abspath(su2_coarse)
             
-    def meshgen(self):
+    def meshgen(self, coarse_stride=None):
+        """Generates the mesh of the airfoil, and a coarse mesh from every ``coarse_stride``-th point if given."""
         air_coord = np.load(self.air_coord_path)
         air_coord[0,:,0] = (air_coord[0,:,0] - np.amin(air_coord[0,:,0]))/(np.amax(air_coord[0,:,0])-np.amin(air_coord[0,:,0]))
-        np.savetxt(os.path.dirname(self.air_coord_path) + '/air_coord.dat', air_coord[0,:,:], delimiter='     ')
+        self.su2 = self._convert(air_coord[0,:,:], 'air_coord')
+        if coarse_stride is not None:
+            n = air_coord.shape[1]
+            idx = np.r_[np.arange(0, n - 1, coarse_stride), n - 1] # keep both trailing edge points
+            self.su2_coarse = self._convert(air_coord[0,idx,:], 'air_coord_coarse')
         
-        # Converter the .dat points to .su2 mesh
-        os.system('AirfoilGeometryConverter -i ' + os.path.dirname(self.air_coord_path) + '/air_coord.dat -o ' 
-                  + os.path.dirname(self.air_coord_path) + '/air_coord -f su2 -frf circle')
+        return self
+    
+    def _convert(self, air_coord, name):
+        directory = os.path.dirname(self.air_coord_path)
+        np.savetxt(directory + '/' + name + '.dat', air_coord, delimiter='     ')
         
-        su2_abspath = os.path.abspath(os.path.dirname(self.air_coord_path) + '/air_coord.su2')
-        self.su2 = su2_abspath
+        # Converter the .dat points to .su2 mesh
+        os.system('AirfoilGeometryConverter -i ' + directory + '/' + name + '.dat -o ' 
+                  + directory + '/' + name + ' -f su2 -frf circle')
         
-        return self
+        return os.path.abspath(directory + '/' + name + '.su2')
+    
+    def mesh(self, fidelity='full'):
+        """The mesh used at a fidelity level."""
+        if check_fidelity(fidelity) != 'coarse':
+            return self.su2
+        if self.su2_coarse is None:
+            raise ValueError("No coarse mesh, call meshgen(coarse_stride=2) or pass su2_coarse.")
+        return self.su2_coarse
     
 
 class Airfoil2dEnv(midbench.core.Env):
@@ -65,53 +87,143 @@ class Airfoil2dEnv(midbench.core.Env):
     midbench.make('Airfoil2d')
     ```
 
-    No additional arguments are currently supported.
+    Pass ``monitor=ConvergenceMonitor(...)`` to stop ``SU2_CFD`` in ``simulate`` as soon as
+    CD and CL have converged or diverged. The reason why the last simulation of the calling
+    thread stopped is then kept in ``stop_reason``. A simulation that diverged, failed or
+    timed out returns NaN coefficients.
+
+    ``simulate`` and ``optimize`` take a ``fidelity`` among ``FIDELITIES``: ``'full'`` runs the
+    configured case, ``'reduced'`` scales the solver (and optimizer) iterations by
+    ``reduced_iter_fraction`` and ``'coarse'`` additionally uses the coarse mesh of the design.
+    ``SuccessiveHalving`` screens a batch of designs on this ladder.
+
+    Pass ``restart_store=RestartStore(path)`` to start each simulation from the interpolated
+    solution of the nearest case simulated before, and to store its own full-fidelity solution.
+    Only a restart file written by the run itself is stored. When the monitor stops a converged
+    run, it is the last periodic write of ``SU2_CFD``, at most ``OUTPUT_WRT_FREQ`` iterations old.
+
+    The configuration files are parsed once per mesh directory and cached. Each simulation
+    renders its own copy into ``results_dir_simu``, where only the lines of the options it
+    changes (conditions, mesh, budgets) differ from the shared file. The shared files are
+    never modified, so ``simulate`` can run from several threads.
+    ``optimize`` runs ``SU2.opt`` in a child process from the mesh directory, so the working
+    directory of the caller never changes either.
     """
 
     def __init__(
         self, 
         cfgfile_simu = '/config_simu.cfg',
         cfgfile_opt = '/config_opt.cfg',
+        monitor = None,
+        restart_store = None,
+        reduced_iter_fraction = 0.3,
     ):
         self.cfgfile_simu = cfgfile_simu
         self.cfgfile_opt = cfgfile_opt
+        self.monitor = monitor
+        self.restart_store = restart_store
+        self.reduced_iter_fraction = reduced_iter_fraction
+        self._templates = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        
+    @property
+    def stop_reason(self):
+        """The reason why the last simulation of the calling thread stopped.
+
+        Without monitor, it is ``'failed'`` if ``SU2_CFD`` exited with an error and None otherwise.
+        """
+        return getattr(self._local, 'stop_reason', None)
+        
+    def _load(self, cfgfile):
+        """Returns the parsed configuration file and its text, which are read only once."""
+        cfgfile = os.path.abspath(cfgfile)
+        with self._lock:
+            if cfgfile not in self._templates:
+                with open(cfgfile) as f:
+                    self._templates[cfgfile] = SU2.io.Config(cfgfile), f.read()
+            return self._templates[cfgfile]
         
+    def _template(self, cfgfile):
+        """Returns a copy of the parsed configuration file."""
+        return copy.deepcopy(self._load(cfgfile)[0])
         
-    def simulate(self, conditions, designs, performances, results_dir_simu):
+    def _render(self, cfgfile, config, path):
+        """Writes the configuration file with only the options changed in ``config`` rewritten."""
+        template, text = self._load(cfgfile)
+        overrides = {key: value for key, value in config.items() if key not in template or template[key] != value}
+        su2_io.render_config(text, overrides, path)
         
-        config = SU2.io.Config(os.path.dirname(designs.su2) + self.cfgfile_simu)
+    def _apply_fidelity(self, config, fidelity):
+        """Reduces the iteration budgets of the config below the full fidelity."""
+        if check_fidelity(fidelity) != 'full':
+            config.ITER = max(1, int(int(config.ITER) * self.reduced_iter_fraction))
+            if 'OPT_ITERATIONS' in config:
+                config.OPT_ITERATIONS = max(1, int(int(config.OPT_ITERATIONS) * self.reduced_iter_fraction))
+        
+    def simulate(self, conditions, designs, performances, results_dir_simu, fidelity='full'):
+        
+        config = self._template(os.path.dirname(designs.su2) + self.cfgfile_simu)
         config.MACH_NUMBER = conditions.mach
         config.REYNOLDS_NUMBER = conditions.reynolds
         config.TARGET_CL = conditions.lift
         config.AOA = conditions.aoa
-        config.MESH_FILENAME = designs.su2     # Customize mesh filename in the configuration file
+        config.MESH_FILENAME = designs.mesh(fidelity)     # Customize mesh filename in the configuration file
+        self._apply_fidelity(config, fidelity)
         # config.CONV_FILENAME = 'history' + filename # Customize the history filename in the configuration file
-        SU2.io.Config.write(config, os.path.dirname(designs.su2) + self.cfgfile_simu)        # Regenerate the configuration file with the same filename
-        cfgfile_simu_abspath = os.path.abspath(os.path.dirname(designs.su2) + self.cfgfile_simu) 
-        
-        # Run the simulation using SU2 simulator
         if not os.path.exists(results_dir_simu):
             os.makedirs(results_dir_simu)
-        os.chdir(results_dir_simu)
-        os.system('SU2_CFD ' + cfgfile_simu_abspath)
+        if self.restart_store is not None:
+            with self._lock:
+                row = self.restart_store.warm_start(config, conditions, designs, results_dir_simu)
+            if row is not None:
+                logger.info(f"Restarting from the solution {row} of {self.restart_store.path}")
         
-        # Extract the drag and lift coefficients from the history file
-        data = pd.read_csv('history.csv')
-        data.dropna(inplace = True) # dropping null value columns to avoid errors
+        # Render the configuration of this run next to its results
+        prefix, suffix = os.path.splitext(os.path.basename(self.cfgfile_simu))
+        fd, cfgfile_simu_abspath = tempfile.mkstemp(suffix=suffix, prefix=prefix + '_', dir=os.path.abspath(results_dir_simu))
+        os.close(fd)
+        self._render(os.path.dirname(designs.su2) + self.cfgfile_simu, config, cfgfile_simu_abspath)
+        
+        # A restart file left by an earlier run in this directory must not be stored for this one
+        restart_file = os.path.join(results_dir_simu, restart_ascii_filename(config))
+        if os.path.exists(restart_file):
+            os.remove(restart_file)
+        
+        # Run the simulation using SU2 simulator
+        stop_reason = None
+        if self.monitor is None:
+            if subprocess.run(['SU2_CFD', cfgfile_simu_abspath], cwd=results_dir_simu).returncode != 0:
+                stop_reason = 'failed'
+        else:
+            monitor = self.monitor.configure(config)
+            stop_reason = monitor.run(['SU2_CFD', cfgfile_simu_abspath], cwd=results_dir_simu)
+            logger.info(f"SU2_CFD stopped after {monitor.n_iter} iterations: {stop_reason}")
+        self._local.stop_reason = stop_reason
+        
+        # A diverged, failed or timed out run has no meaningful coefficients, even if its history has finite rows
+        if stop_reason in ('diverged', 'failed', 'timeout'):
+            logger.warn(f"SU2_CFD {stop_reason} in {results_dir_simu}, returning NaN coefficients.")
+            return float('nan'), float('nan')
+        
+        # Extract the drag and lift coefficients from the last row of the history file
+        data = su2_io.read_last_row(os.path.join(results_dir_simu, 'history.csv'))
         for name in performances:
             if name == 'drag':
-                cd = data['       "CD"       '][data.index[-1]]
+                cd = data['CD']
             elif name == 'lift':
-                cl = data['       "CL"       '][data.index[-1]]
+                cl = data['CL']
         
-        os.chdir("../../..")
+        if self.restart_store is not None and fidelity == 'full':
+            with self._lock:
+                self.restart_store.add(conditions, designs, restart_file)
         
         return cd, cl
     
-    def optimize(self, conditions, designs, objectives, results_dir_opt):      
+    def optimize(self, conditions, designs, objectives, results_dir_opt, fidelity='full'):      
         # Config
-        os.chdir(os.path.abspath(os.path.dirname(designs.su2)))
-        config = SU2.io.Config(os.path.dirname(designs.su2) + self.cfgfile_opt)
+        mesh_dir = os.path.abspath(os.path.dirname(designs.su2))
+        config = self._template(mesh_dir + self.cfgfile_opt)
         config.NUMBER_PART = conditions.partitions
         config.NZONES      = int( conditions.nzones )
         if conditions.quiet: config.CONSOLE = 'CONCISE'
@@ -120,83 +232,58 @@ class Airfoil2dEnv(midbench.core.Env):
         config.REYNOLDS_NUMBER = conditions.reynolds
         config.TARGET_CL = conditions.lift
         config.AOA = conditions.aoa
-        config.MESH_FILENAME = os.path.basename(designs.su2) # Customize mesh filename in the configuration file
-        
-        its               = int ( config.OPT_ITERATIONS )                      # number of opt iterations
-        bound_upper       = float ( config.OPT_BOUND_UPPER )                   # variable bound to be scaled by the line search
-        bound_lower       = float ( config.OPT_BOUND_LOWER )                   # variable bound to be scaled by the line search
-        relax_factor      = float ( config.OPT_RELAX_FACTOR )                  # line search scale
-        gradient_factor   = float ( config.OPT_GRADIENT_FACTOR )               # objective function and gradient scale
-        def_dv            = config.DEFINITION_DV                               # complete definition of the desing variable
-        n_dv              = sum(def_dv['SIZE'])                                # number of design variables
-        accu              = float ( config.OPT_ACCURACY ) * gradient_factor    # optimizer accuracy
-        x0                = [0.0]*n_dv # initial design
-        xb_low            = [float(bound_lower)/float(relax_factor)]*n_dv      # lower dv bound it includes the line search acceleration factor
-        xb_up             = [float(bound_upper)/float(relax_factor)]*n_dv      # upper dv bound it includes the line search acceleration fa
-        xb                = list(zip(xb_low, xb_up)) # design bounds
-        
-        # State
-        state = SU2.io.State()
-        state.find_files(config)
-    
-        # add restart files to state.FILES
-        if config.get('TIME_DOMAIN', 'NO') == 'YES' and config.get('RESTART_SOL', 'NO') == 'YES' and conditions.gradient != 'CONTINUOUS_ADJOINT':
-            restart_name = config['RESTART_FILENAME'].split('.')[0]
-            restart_filename = restart_name + '_' + str(int(config['RESTART_ITER'])-1).zfill(5) + '.dat'
-            if not os.path.isfile(restart_filename): # throw, if restart files does not exist
-                sys.exit("Error: Restart file <" + restart_filename + "> not found.")
-            state['FILES']['RESTART_FILE_1'] = restart_filename
-    
-            # use only, if time integration is second order
-            if config.get('TIME_MARCHING', 'NO') == 'DUAL_TIME_STEPPING-2ND_ORDER':
-                restart_filename = restart_name + '_' + str(int(config['RESTART_ITER'])-2).zfill(5) + '.dat'
-                if not os.path.isfile(restart_filename): # throw, if restart files does not exist
-                    sys.exit("Error: Restart file <" + restart_filename + "> not found.")
-                state['FILES']['RESTART_FILE_2'] =restart_filename 
-    
-        # Project
-        if os.path.exists(conditions.projectname):
-            project = SU2.io.load_data(conditions.projectname)
-            project.config = config
-        else:
-            project = SU2.opt.Project(config,state,folder = results_dir_opt)
-            
-        # Optimize
-        if conditions.optimization == 'SLSQP':
-          SU2.opt.SLSQP(project,x0,xb,its,accu)
-        if conditions.optimization == 'CG':
-          SU2.opt.CG(project,x0,xb,its,accu)
-        if conditions.optimization == 'BFGS':
-          SU2.opt.BFGS(project,x0,xb,its,accu)
-        if conditions.optimization == 'POWELL':
-          SU2.opt.POWELL(project,x0,xb,its,accu)
-    
-        # rename project file
-        if conditions.projectname:
-            shutil.move('project.pkl',conditions.projectname)
+        config.MESH_FILENAME = os.path.basename(designs.mesh(fidelity)) # Customize mesh filename in the configuration file
+        self._apply_fidelity(config, fidelity)
+        
+        # Render the configuration of this run, and optimize in a process of its own from the
+        # mesh directory since SU2.opt changes the working directory
+        prefix, suffix = os.path.splitext(os.path.basename(self.cfgfile_opt))
+        fd, cfgfile_opt_abspath = tempfile.mkstemp(suffix=suffix, prefix=prefix + '_', dir=mesh_dir)
+        os.close(fd)
+        self._render(mesh_dir + self.cfgfile_opt, config, cfgfile_opt_abspath)
+        env = dict(os.environ)
+        package_root = os.path.dirname(os.path.dirname(os.path.abspath(midbench.__file__)))
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [package_root, env.get('PYTHONPATH')]))
+        try:
+            subprocess.run(
+                [sys.executable, '-m', 'midbench.envs.airfoil.optimization', cfgfile_opt_abspath,
+                 '--folder', results_dir_opt, '--optimization', conditions.optimization,
+                 '--projectname', conditions.projectname],
+                cwd=mesh_dir, env=env, check=True,
+            )
+        finally:
+            os.remove(cfgfile_opt_abspath)
+        results_dir_opt = os.path.join(mesh_dir, results_dir_opt)
         
         # Objectives
-        para = pd.read_csv(results_dir_opt + '/history_project.csv')
-        para.dropna(inplace = True) # dropping null value columns to avoid errors
+        para = su2_io.read_last_row(results_dir_opt + '/history_project.csv')
         
         # Optimized airfoil
         list_of_folders = glob.glob(results_dir_opt + '/DESIGNS/*') # * means all if need specific format then *.csv
         sorted_folder = sorted(list_of_folders, key=os.path.getctime)
         try:
-            data = pd.read_csv(sorted_folder[-1] + '/DIRECT/surface_flow.csv')
+            design_dir = sorted_folder[-1]
+            data = su2_io.read_columns(design_dir + '/DIRECT/surface_flow.csv', ['x', 'y'])
         except OSError:
-            data = pd.read_csv(sorted_folder[-2] + '/DIRECT/surface_flow.csv')
+            design_dir = sorted_folder[-2]
+            data = su2_io.read_columns(design_dir + '/DIRECT/surface_flow.csv', ['x', 'y'])
         
         for name in objectives:
             if name == 'drag':
-                cd = para[' "DRAG"          '][para.index[-1]]
+                cd = para['DRAG']
             elif name == 'ld_ratio':
-                ld = para[' "EFFICIENCY"    '][para.index[-1]]
+                ld = para['EFFICIENCY']
             elif name == 'airfoil_opt':
                 airfoil_opt_x = data['x']
                 airfoil_opt_y = data['y']
                 airfoil_opt = [airfoil_opt_x, airfoil_opt_y]
-                
+            elif name == 'aoa_opt':
+                # in fixed-CL mode SU2 adjusts the AoA to meet TARGET_CL, read where it ended
+                history = su2_io.read_last_row(design_dir + '/DIRECT/history.csv')
+                aoa_opt = history['AoA'] if 'AoA' in history else history['AOA']
+        
+        if 'aoa_opt' in objectives:
+            return cd, ld, airfoil_opt, aoa_opt
         return cd, ld, airfoil_opt
 
  
\ No newline at end of file
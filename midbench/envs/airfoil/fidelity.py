@@ -0,0 +1,98 @@
+"""Fidelity levels of the airfoil environment and a successive-halving scheduler over them."""
+import math
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+
+from midbench import error
+
+FIDELITIES = ("coarse", "reduced", "full")
+"""The fidelity levels from the cheapest to the most accurate.
+
+- ``'coarse'``: the coarse mesh of the design and the reduced iteration budget.
+- ``'reduced'``: the mesh of the design and the reduced iteration budget.
+- ``'full'``: the configured case.
+"""
+
+
+def check_fidelity(fidelity: str) -> str:
+    """Returns the fidelity if it is one of ``FIDELITIES``, raises ``ValueError`` otherwise."""
+    if fidelity not in FIDELITIES:
+        raise ValueError(f"Unknown fidelity {fidelity!r}, expected one of {FIDELITIES}.")
+    return fidelity
+
+
+class SuccessiveHalving:
+    r"""Evaluates a batch of designs on a fidelity ladder and escalates only the best of each rung.
+
+    All candidates are evaluated at the first fidelity, the best ``1 / eta`` of them (at least
+    ``min_keep``) are evaluated again at the next one, and so on up to the last fidelity. A
+    candidate whose evaluation fails gets an infinitely bad score: the evaluation either returns
+    NaN, as ``Airfoil2dEnv.simulate`` does when the solver diverged, failed or timed out, or raises
+    ``error.SolverOutputError`` when the history has no complete row. Other errors, e.g., a
+    missing coarse mesh, propagate.
+
+    Args:
+        evaluate: The score of a candidate at a fidelity, ``evaluate(candidate, fidelity)``, e.g.,
+            ``lambda design, fidelity: env.simulate(conditions, design, ['drag', 'lift'], results_dir, fidelity)[0]``.
+        fidelities: The fidelity levels from the cheapest to the most accurate.
+        eta: The inverse of the fraction of candidates promoted to the next fidelity.
+        min_keep: The minimum number of candidates promoted.
+        minimize: Whether lower scores are better.
+        executor: A ``concurrent.futures.Executor`` to evaluate the candidates of a rung concurrently.
+    """
+
+    def __init__(
+        self,
+        evaluate: Callable[[object, str], float],
+        fidelities: Sequence[str] = FIDELITIES,
+        eta: float = 3,
+        min_keep: int = 1,
+        minimize: bool = True,
+        executor=None,
+    ):
+        self.evaluate = evaluate
+        self.fidelities = [check_fidelity(fidelity) for fidelity in fidelities]
+        self.eta = eta
+        self.min_keep = min_keep
+        self.minimize = minimize
+        self.executor = executor
+
+    def _score(self, candidate, fidelity: str) -> float:
+        try:
+            score = float(self.evaluate(candidate, fidelity))
+        except error.SolverOutputError:  # no complete row in the history
+            score = math.nan
+        if math.isnan(score):
+            return math.inf if self.minimize else -math.inf
+        return score
+
+    def run(self, candidates: Sequence) -> Dict[str, Dict[int, float]]:
+        """Runs the ladder on a batch of candidates.
+
+        Args:
+            candidates: The candidates, e.g., ``Airfoil2dDesign`` instances.
+
+        Returns:
+            The scores at each fidelity keyed by the index of the evaluated candidates, e.g.,
+            ``ranking(scores['full'])`` orders the candidates of the last rung from the best.
+        """
+        scores = {}
+        survivors = list(range(len(candidates)))
+        for rung, fidelity in enumerate(self.fidelities):
+            if rung:
+                n_keep = max(self.min_keep, int(len(survivors) / self.eta))
+                survivors = self.ranking(scores[self.fidelities[rung - 1]])[:n_keep]
+            if self.executor is None:
+                values = [self._score(candidates[i], fidelity) for i in survivors]
+            else:
+                values = list(self.executor.map(lambda i: self._score(candidates[i], fidelity), survivors))
+            scores[fidelity] = dict(zip(survivors, values))
+        return scores
+
+    def ranking(self, scores: Dict[int, float]) -> List[int]:
+        """The indices of the candidates from the best score to the worst."""
+        idx = np.array(list(scores), dtype=np.int64)
+        values = np.array(list(scores.values()))
+        order = np.argsort(values if self.minimize else -values, kind="stable")
+        return idx[order].tolist()
@@ -0,0 +1,153 @@
+"""Live convergence monitoring of SU2 runs from their ``history.csv``."""
+import collections
+import copy
+import os
+import subprocess
+import time
+from typing import Optional, Sequence
+
+import numpy as np
+
+from midbench.envs.airfoil import su2_io
+
+
+class ConvergenceMonitor:
+    r"""Runs a solver while tailing its history and stops it once the coefficients converged or diverged.
+
+    The convergence criterion is a Cauchy criterion as in SU2: the run has converged when, for each
+    monitored column, the relative change of the last ``cauchy_elems`` values with respect to the
+    latest one stays below ``cauchy_eps``, e.g., ``1e-4`` for CD and CL stable to 4 digits. The run
+    has diverged as soon as a monitored value is NaN, infinite or larger than ``diverge_limit`` in
+    absolute value.
+
+    In fixed-CL mode, SU2 only updates the AoA every ``ITER_DCL_DALPHA`` iterations, so CD and CL
+    can be stable at the initial AoA long before CL reaches its target. With ``target_cl``, the
+    run has only converged once CL is also within ``cl_tol`` of it. ``configure`` sets it, and a
+    ``min_iter`` past the first AoA update, from the config of a run.
+
+    After ``run``, ``reason`` is one of ``'converged'``, ``'diverged'``, ``'timeout'``,
+    ``'completed'`` (the solver reached its iteration limit) or ``'failed'`` (non-zero exit code),
+    and ``n_iter`` is the number of rows read from the history.
+
+    Args:
+        columns: The normalized names of the monitored columns.
+        cauchy_elems: The number of iterations of the Cauchy window.
+        cauchy_eps: The tolerance on the relative change over the window.
+        min_iter: The number of iterations before convergence is checked.
+        diverge_limit: The bound on the absolute value of the monitored columns.
+        history: The history file written by the solver in its working directory.
+        poll_interval: The time in seconds between two reads of the history.
+        timeout: The wall time in seconds after which the solver is stopped, unlimited by default.
+        target_cl: The CL required for convergence, e.g., the ``TARGET_CL`` of fixed-CL mode.
+        cl_tol: The absolute tolerance on CL with respect to ``target_cl``.
+    """
+
+    def __init__(
+        self,
+        columns: Sequence[str] = ("CD", "CL"),
+        cauchy_elems: int = 100,
+        cauchy_eps: float = 1e-4,
+        min_iter: int = 200,
+        diverge_limit: float = 1e3,
+        history: str = "history.csv",
+        poll_interval: float = 1.0,
+        timeout: Optional[float] = None,
+        target_cl: Optional[float] = None,
+        cl_tol: float = 1e-3,
+    ):
+        self.columns = list(columns)
+        self.cauchy_elems = cauchy_elems
+        self.cauchy_eps = cauchy_eps
+        self.min_iter = min_iter
+        self.diverge_limit = diverge_limit
+        self.history = history
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.target_cl = target_cl
+        self.cl_tol = cl_tol
+        if target_cl is not None and "CL" not in self.columns:
+            raise ValueError("CL must be monitored to check it against target_cl.")
+        self.reason: Optional[str] = None
+        self.n_iter = 0
+
+    def check(self, window: np.ndarray, n_iter: int) -> Optional[str]:
+        """Applies the criteria to the latest rows.
+
+        Args:
+            window: The last (at most ``cauchy_elems``) values of the monitored columns.
+            n_iter: The number of iterations so far.
+
+        Returns:
+            ``'converged'``, ``'diverged'`` or None to keep running.
+        """
+        last = window[-1]
+        if not np.all(np.isfinite(last)) or np.any(np.abs(last) > self.diverge_limit):
+            return "diverged"
+        if n_iter < max(self.min_iter, self.cauchy_elems):
+            return None
+        if self.target_cl is not None and abs(last[self.columns.index("CL")] - self.target_cl) >= self.cl_tol:
+            return None
+        change = np.abs(window - last) / np.maximum(np.abs(last), np.finfo(np.float64).tiny)
+        return "converged" if change.max() < self.cauchy_eps else None
+
+    def configure(self, config) -> "ConvergenceMonitor":
+        """A copy of the monitor for a run of an ``SU2.io.Config``.
+
+        With ``FIXED_CL_MODE= YES``, the copy requires CL within ``cl_tol`` of ``TARGET_CL`` and
+        at least ``ITER_DCL_DALPHA + cauchy_elems`` iterations, i.e., a full Cauchy window after
+        the first AoA update.
+        """
+        monitor = copy.copy(self)
+        if str(config.get("FIXED_CL_MODE", "NO")).upper() == "YES":
+            if "CL" not in self.columns:
+                raise ValueError("CL must be monitored in fixed-CL mode.")
+            monitor.target_cl = float(config["TARGET_CL"])
+            monitor.min_iter = max(self.min_iter, int(float(config.get("ITER_DCL_DALPHA", 0))) + self.cauchy_elems)
+        return monitor
+
+    def run(self, args: Sequence[str], cwd: str = ".") -> str:
+        """Runs the solver and monitors it until it exits or a criterion is met.
+
+        Args:
+            args: The command, e.g., ``['SU2_CFD', 'config_simu.cfg']``.
+            cwd: The working directory of the solver, where it writes the history.
+
+        Returns:
+            The reason why the solver stopped, also stored in ``reason``.
+        """
+        path = os.path.join(cwd, self.history)
+        if os.path.exists(path):  # would be read before the solver truncates it
+            os.remove(path)
+        tail = su2_io.HistoryTail(path)
+        window = collections.deque(maxlen=self.cauchy_elems)
+        self.reason, self.n_iter = None, 0
+        start = time.monotonic()
+        with subprocess.Popen(list(args), cwd=cwd) as proc:
+            while self.reason is None:
+                returncode = proc.poll()
+                rows = tail.read()
+                if len(rows):
+                    missing = set(self.columns) - set(tail.header)
+                    if missing:
+                        proc.terminate()
+                        raise KeyError(f"Columns {sorted(missing)} not in {path}.")
+                    rows = rows[:, [tail.header.index(name) for name in self.columns]]
+                    for row in rows:
+                        window.append(row)
+                        self.n_iter += 1
+                        self.reason = self.check(np.array(window), self.n_iter)
+                        if self.reason is not None:
+                            break
+                if self.reason is None and returncode is not None:
+                    self.reason = "completed" if returncode == 0 else "failed"
+                elif self.reason is None and self.timeout is not None and time.monotonic() - start > self.timeout:
+                    self.reason = "timeout"
+                if self.reason is None:
+                    time.sleep(self.poll_interval)
+            if proc.poll() is None:
+                proc.terminate()
+                try:
+                    proc.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+        return self.reason
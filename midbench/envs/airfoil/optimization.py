@@ -0,0 +1,93 @@
+"""SU2 shape optimization of ``Airfoil2dEnv.optimize``, run in a process of its own.
+
+``SU2.opt`` changes the working directory of its process while it optimizes, so the environment
+runs ``python -m midbench.envs.airfoil.optimization config_opt.cfg`` in the mesh directory of the
+design instead of changing the directory of the caller.
+"""
+import argparse
+import os
+import shutil
+import sys
+
+sys.path.append(os.environ['SU2_RUN'])
+import SU2
+
+
+def run(cfgfile, folder, optimization='SLSQP', projectname=''):
+    """Runs the optimization of a rendered config from the current directory.
+
+    Args:
+        cfgfile: The config of the optimization.
+        folder: The directory of the SU2 project, relative to the current directory.
+        optimization: One of ``'SLSQP'``, ``'CG'``, ``'BFGS'`` and ``'POWELL'``.
+        projectname: The project file to resume from and to save to, none if empty.
+    """
+    config = SU2.io.Config(cfgfile)
+    gradient = config.GRADIENT_METHOD
+
+    its               = int ( config.OPT_ITERATIONS )                      # number of opt iterations
+    bound_upper       = float ( config.OPT_BOUND_UPPER )                   # variable bound to be scaled by the line search
+    bound_lower       = float ( config.OPT_BOUND_LOWER )                   # variable bound to be scaled by the line search
+    relax_factor      = float ( config.OPT_RELAX_FACTOR )                  # line search scale
+    gradient_factor   = float ( config.OPT_GRADIENT_FACTOR )               # objective function and gradient scale
+    def_dv            = config.DEFINITION_DV                               # complete definition of the desing variable
+    n_dv              = sum(def_dv['SIZE'])                                # number of design variables
+    accu              = float ( config.OPT_ACCURACY ) * gradient_factor    # optimizer accuracy
+    x0                = [0.0]*n_dv # initial design
+    xb_low            = [float(bound_lower)/float(relax_factor)]*n_dv      # lower dv bound it includes the line search acceleration factor
+    xb_up             = [float(bound_upper)/float(relax_factor)]*n_dv      # upper dv bound it includes the line search acceleration fa
+    xb                = list(zip(xb_low, xb_up)) # design bounds
+
+    # State
+    state = SU2.io.State()
+    state.find_files(config)
+
+    # add restart files to state.FILES
+    if config.get('TIME_DOMAIN', 'NO') == 'YES' and config.get('RESTART_SOL', 'NO') == 'YES' and gradient != 'CONTINUOUS_ADJOINT':
+        restart_name = config['RESTART_FILENAME'].split('.')[0]
+        restart_filename = restart_name + '_' + str(int(config['RESTART_ITER'])-1).zfill(5) + '.dat'
+        if not os.path.isfile(restart_filename): # throw, if restart files does not exist
+            sys.exit("Error: Restart file <" + restart_filename + "> not found.")
+        state['FILES']['RESTART_FILE_1'] = restart_filename
+
+        # use only, if time integration is second order
+        if config.get('TIME_MARCHING', 'NO') == 'DUAL_TIME_STEPPING-2ND_ORDER':
+            restart_filename = restart_name + '_' + str(int(config['RESTART_ITER'])-2).zfill(5) + '.dat'
+            if not os.path.isfile(restart_filename): # throw, if restart files does not exist
+                sys.exit("Error: Restart file <" + restart_filename + "> not found.")
+            state['FILES']['RESTART_FILE_2'] =restart_filename
+
+    # Project
+    if os.path.exists(projectname):
+        project = SU2.io.load_data(projectname)
+        project.config = config
+    else:
+        project = SU2.opt.Project(config,state,folder = folder)
+
+    # Optimize
+    if optimization == 'SLSQP':
+      SU2.opt.SLSQP(project,x0,xb,its,accu)
+    if optimization == 'CG':
+      SU2.opt.CG(project,x0,xb,its,accu)
+    if optimization == 'BFGS':
+      SU2.opt.BFGS(project,x0,xb,its,accu)
+    if optimization == 'POWELL':
+      SU2.opt.POWELL(project,x0,xb,its,accu)
+
+    # rename project file
+    if projectname:
+        shutil.move('project.pkl',projectname)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('cfgfile', help='the config of the optimization')
+    parser.add_argument('--folder', required=True, help='the directory of the SU2 project')
+    parser.add_argument('--optimization', default='SLSQP', choices=['SLSQP', 'CG', 'BFGS', 'POWELL'])
+    parser.add_argument('--projectname', default='')
+    args = parser.parse_args(argv)
+    run(args.cfgfile, args.folder, args.optimization, args.projectname)
+
+
+if __name__ == '__main__':
+    main()
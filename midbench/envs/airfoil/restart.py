@@ -0,0 +1,180 @@
+"""Store of converged SU2 flow solutions to warm-start new simulations from the nearest prior case."""
+import os
+import shutil
+from typing import Optional, Tuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from midbench.data import DataBase, DataEntry
+from midbench.envs.airfoil import su2_io
+
+
+def _as_list(value) -> list:
+    """A list-valued SU2 option, e.g., ``OUTPUT_FILES``, either parsed or as written ``(A, B)``."""
+    if isinstance(value, str):
+        return [item.strip() for item in value.strip("() ").split(",") if item.strip()]
+    return list(value)
+
+
+def restart_ascii_filename(config) -> str:
+    """The ASCII restart file written by SU2 with ``RESTART_ASCII``, e.g., ``restart_flow.csv``."""
+    return os.path.splitext(config.get("RESTART_FILENAME", "restart_flow.dat"))[0] + ".csv"
+
+
+def _complete(path: str) -> bool:
+    """Whether a text file exists and ends with a newline."""
+    if not os.path.exists(path) or not os.path.getsize(path):
+        return False
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+class RestartStore:
+    r"""Flow solutions of previous simulations keyed by design and condition.
+
+    The keys are kept in a ``midbench.data.DataBase`` under ``path`` with the columns
+    ``designs.airfoil`` (the coordinates of ``Airfoil2dDesign.air_coord_path``) and
+    ``conditions.{mach, reynolds, aoa}``, and the solution of row ``i`` in
+    ``solutions/{i:06d}.csv``. The distance between two cases is
+
+    .. math::
+        d^2 = \frac{\overline{\|x - x'\|^2}}{s_x^2} + \frac{(M - M')^2}{s_M^2}
+            + \frac{(\log_{10} Re - \log_{10} Re')^2}{s_{Re}^2} + \frac{(\alpha - \alpha')^2}{s_\alpha^2},
+
+    where :math:`\overline{\|x - x'\|^2}` is the mean squared distance between the airfoil points.
+
+    Args:
+        path: The directory of the store.
+        design_scale: The airfoil-coordinate distance equivalent to a unit distance.
+        mach_scale: The Mach number difference equivalent to a unit distance.
+        reynolds_scale: The difference of Reynolds number in decades equivalent to a unit distance.
+        aoa_scale: The angle of attack difference in degrees equivalent to a unit distance.
+        max_distance: Cases farther than this from every stored case start from freestream.
+        chunk_rows: The number of rows per chunk of a new store.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        design_scale: float = 0.01,
+        mach_scale: float = 0.05,
+        reynolds_scale: float = 0.5,
+        aoa_scale: float = 1.0,
+        max_distance: Optional[float] = None,
+        chunk_rows: int = 4096,
+    ):
+        self.path = path
+        self.database = DataBase(path, chunk_rows=chunk_rows)
+        self.design_scale = design_scale
+        self.scales = {"mach": mach_scale, "reynolds": reynolds_scale, "aoa": aoa_scale}
+        self.max_distance = max_distance
+
+    def __len__(self) -> int:
+        return len(self.database)
+
+    @staticmethod
+    def design_key(designs) -> Optional[np.ndarray]:
+        """The airfoil coordinates `(N, 2)` of a design, normalized as by ``meshgen``, or None if unavailable."""
+        if not os.path.exists(designs.air_coord_path):
+            return None
+        airfoil = np.load(designs.air_coord_path)[0].astype(np.float32)
+        airfoil[:, 0] = (airfoil[:, 0] - airfoil[:, 0].min()) / (airfoil[:, 0].max() - airfoil[:, 0].min())
+        return airfoil
+
+    def _conditions(self, conditions) -> dict:
+        return {"mach": conditions.mach, "reynolds": np.log10(conditions.reynolds), "aoa": conditions.aoa}
+
+    def solution_path(self, row: int) -> str:
+        return os.path.join(self.path, "solutions", f"{row:06d}.csv")
+
+    def nearest(self, conditions, designs) -> Optional[Tuple[int, float]]:
+        """Finds the stored case nearest to a new one.
+
+        Returns:
+            The row and the distance of the nearest case, or None if the store is empty,
+            the design has no coordinates or its number of points differs from the stored ones.
+        """
+        airfoil = self.design_key(designs)
+        if not len(self) or airfoil is None or self.database.columns["designs.airfoil"][1] != airfoil.shape:
+            return None
+        dist2 = np.mean(np.sum((self.database.read("designs.airfoil") - airfoil) ** 2, axis=-1), axis=-1)
+        dist2 /= self.design_scale**2
+        for name, value in self._conditions(conditions).items():
+            dist2 += ((self.database.read("conditions." + name) - value) / self.scales[name]) ** 2
+        row = int(np.argmin(dist2))
+        return row, float(np.sqrt(dist2[row]))
+
+    def add(self, conditions, designs, restart_file: str) -> Optional[int]:
+        """Stores the solution of a simulation.
+
+        Args:
+            conditions: The ``Airfoil2dCondition`` of the simulation.
+            designs: The ``Airfoil2dDesign`` of the simulation.
+            restart_file: The ASCII restart file it wrote.
+
+        Returns:
+            The row of the new case, or None if the design has no coordinates or the file does not
+            exist or is cut short, e.g., by a solver stopped while writing it.
+        """
+        airfoil = self.design_key(designs)
+        if airfoil is None or not _complete(restart_file):
+            return None
+        row = len(self)
+        os.makedirs(os.path.dirname(self.solution_path(row)), exist_ok=True)
+        # the solution is in place before the row that points to it is committed
+        shutil.copyfile(restart_file, self.solution_path(row))
+        self.database.append(
+            DataEntry.from_record(
+                designs={"airfoil": airfoil},
+                conditions={name: np.float64(value) for name, value in self._conditions(conditions).items()},
+                performances=None,
+            )
+        )
+        return row
+
+    def interpolate(self, row: int, mesh: str) -> Tuple[list, np.ndarray]:
+        """Transfers a stored solution onto the nodes of a mesh by nearest neighbor.
+
+        The solution is used as is when the mesh has the same nodes.
+
+        Returns:
+            The field names and values of the restart on the new mesh.
+        """
+        header, data = su2_io.read_restart(self.solution_path(row))
+        points = su2_io.read_mesh_points(mesh)
+        coords = data[:, 1 : 1 + points.shape[1]]
+        if coords.shape == points.shape and np.allclose(coords, points):
+            return header, data
+        _, idx = cKDTree(coords).query(points)
+        data = data[idx]
+        data[:, 0] = np.arange(len(points))
+        data[:, 1 : 1 + points.shape[1]] = points
+        return header, data
+
+    def warm_start(self, config, conditions, designs, run_dir: str) -> Optional[int]:
+        """Sets up a simulation to restart from the nearest stored solution.
+
+        The solution is interpolated onto the ``MESH_FILENAME`` of the config, e.g., the coarse
+        mesh of ``designs`` at the coarse fidelity, into ``run_dir``, and the
+        ``SU2.io.Config`` is set to read it with ``RESTART_SOL``. In every case, the config
+        requests the ASCII restart output so that the solution can be stored with ``add``.
+
+        Returns:
+            The row of the stored case used, or None if the simulation starts from freestream.
+        """
+        outputs = _as_list(config.get("OUTPUT_FILES", ["RESTART"]))
+        if "RESTART_ASCII" not in outputs:
+            config.OUTPUT_FILES = outputs + ["RESTART_ASCII"]
+        config.RESTART_SOL = "NO"
+        match = self.nearest(conditions, designs)
+        if match is None or (self.max_distance is not None and match[1] > self.max_distance):
+            return None
+        row = match[0]
+        solution = os.path.abspath(os.path.join(run_dir, "restart_in.csv"))
+        su2_io.write_restart(solution, *self.interpolate(row, config.MESH_FILENAME))
+        config.RESTART_SOL = "YES"
+        config.READ_BINARY_RESTART = "NO"
+        config.SOLUTION_FILENAME = solution
+        return row
@@ -0,0 +1,204 @@
+"""Lightweight readers and writers of SU2 files, e.g., ``history.csv``, ``surface_flow.csv`` and config files."""
+import itertools
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from midbench import error
+
+
+def normalize_name(name: str) -> str:
+    """Strips the padding and quotes of an SU2 column name, e.g., ``'       "CD"       '`` to ``'CD'``."""
+    return name.strip().strip('"').strip()
+
+
+def read_header(path: str) -> List[str]:
+    """Reads the normalized column names of an SU2 CSV file."""
+    with open(path) as f:
+        return [normalize_name(name) for name in f.readline().split(",")]
+
+
+def _parse_row(line: bytes, n_columns: int, allow_nan: bool = False) -> Optional[np.ndarray]:
+    fields = line.split(b",")
+    if len(fields) != n_columns:
+        return None
+    try:
+        row = np.array([float(field) for field in fields])
+    except ValueError:
+        return None
+    return None if not allow_nan and np.isnan(row).any() else row
+
+
+def read_last_row(path: str, block_size: int = 8192) -> Dict[str, float]:
+    """Reads the last complete row of an SU2 CSV file without reading the rest of it.
+
+    The file is read backwards from its end by blocks, and rows that are incomplete,
+    e.g., a last line without newline while the solver is still writing it or after it
+    was stopped, or contain NaN are skipped, as ``dropna`` would.
+
+    Args:
+        path: The CSV file.
+        block_size: The initial number of bytes read from the end of the file.
+
+    Returns:
+        The values of the last valid row keyed by the normalized column names.
+
+    Raises:
+        error.SolverOutputError: If no row of the file is complete.
+    """
+    header = read_header(path)
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        while True:
+            start = max(0, size - block_size)
+            f.seek(start)
+            # the first line is either cut by the block or the header, and the last one is
+            # either empty or still being written, as long as it does not end with a newline
+            lines = f.read(size - start).split(b"\n")[1:-1]
+            for line in reversed(lines):
+                row = _parse_row(line, len(header))
+                if row is not None:
+                    return dict(zip(header, row.tolist()))
+            if start == 0:
+                raise error.SolverOutputError(f"No complete row in {path}.")
+            block_size *= 4
+
+
+def read_columns(path: str, columns: Optional[Sequence[str]] = None, dtype=np.float64) -> Dict[str, np.ndarray]:
+    """Reads whole columns of an SU2 CSV file as typed arrays.
+
+    Args:
+        path: The CSV file.
+        columns: The normalized names of the columns to read, all of them by default.
+        dtype: The dtype of the arrays.
+
+    Returns:
+        The arrays keyed by the normalized column names, without the rows with NaN in these columns.
+    """
+    header = read_header(path)
+    columns = header if columns is None else list(columns)
+    missing = set(columns) - set(header)
+    if missing:
+        raise KeyError(f"Columns {sorted(missing)} not in {path}.")
+    data = np.loadtxt(
+        path, delimiter=",", skiprows=1, usecols=[header.index(name) for name in columns], dtype=dtype, ndmin=2
+    )
+    data = data[~np.isnan(data).any(axis=1)]
+    return {name: data[:, i] for i, name in enumerate(columns)}
+
+
+def read_restart(path: str) -> Tuple[List[str], np.ndarray]:
+    """Reads an ASCII restart file of SU2, e.g., ``restart_flow.csv`` written with ``RESTART_ASCII``.
+
+    Returns:
+        The normalized field names, starting with ``PointID`` and the coordinates,
+        and the values of shape `(n_points, n_fields)` ordered by ``PointID``.
+    """
+    header = read_header(path)
+    data = np.loadtxt(path, delimiter=",", skiprows=1, ndmin=2)
+    return header, data[np.argsort(data[:, 0], kind="stable")]
+
+
+def write_restart(path: str, header: Sequence[str], data: np.ndarray):
+    """Writes an ASCII restart file of SU2 that ``READ_BINARY_RESTART= NO`` reads back."""
+    with open(path, "w") as f:
+        f.write(",\t".join(f'"{name}"' for name in header) + "\n")
+        np.savetxt(f, data, delimiter=",\t", fmt=["%d"] + ["%.15e"] * (len(header) - 1))
+
+
+def read_mesh_points(path: str) -> np.ndarray:
+    """Reads the node coordinates of a single-zone SU2 mesh.
+
+    Returns:
+        The coordinates of shape `(NPOIN, NDIME)` in the order of the mesh numbering.
+    """
+    dim = None
+    with open(path) as f:
+        for line in f:
+            key, _, value = line.partition("=")
+            key = key.strip()
+            if key == "NDIME":
+                dim = int(value)
+            elif key == "NPOIN":
+                if dim is None:
+                    raise ValueError(f"NPOIN before NDIME in {path}.")
+                n_points = int(value.split()[0])
+                return np.loadtxt(itertools.islice(f, n_points), usecols=range(dim), comments="%", ndmin=2)
+    raise ValueError(f"No NPOIN section in {path}.")
+
+
+class HistoryTail:
+    """Incremental reader of the rows appended to an SU2 CSV file while the solver writes it.
+
+    Each call to ``read`` only parses the bytes written since the previous one. A partially
+    written last line is kept until it is complete. Unlike ``read_last_row``, rows with NaN
+    are returned, so that a diverging solution can be detected.
+
+    Args:
+        path: The CSV file, which may not exist yet.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.header: Optional[List[str]] = None
+        self._offset = 0
+        self._rest = b""
+
+    def read(self) -> np.ndarray:
+        """Reads the complete rows appended since the last call.
+
+        Returns:
+            The new rows of shape `(n, len(header))`, empty while the header is not written.
+        """
+        if not os.path.exists(self.path):
+            return np.empty((0, 0))
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = self._rest + f.read()
+            self._offset = f.tell()
+        lines = data.split(b"\n")
+        self._rest = lines.pop()
+        if self.header is None:
+            if not lines:
+                return np.empty((0, 0))
+            self.header = [normalize_name(name) for name in lines.pop(0).decode().split(",")]
+        rows = [_parse_row(line, len(self.header), allow_nan=True) for line in lines]
+        rows = [row for row in rows if row is not None]
+        return np.array(rows).reshape((len(rows), len(self.header)))
+
+
+def format_option(value) -> str:
+    """Formats an option value as written in SU2 config files, e.g., a list as ``( A, B )``."""
+    if isinstance(value, dict):
+        raise TypeError(f"Cannot format the structured option {value!r}, edit the config file instead.")
+    if isinstance(value, (list, tuple)):
+        return "( " + ", ".join(format_option(item) for item in value) + " )"
+    return str(value)
+
+
+def render_config(template: str, overrides: Dict[str, object], path: str):
+    """Writes a copy of the text of an SU2 config file with some options replaced.
+
+    Only the lines of the overridden options are rewritten, every other line (comments, markers,
+    nested lists) is copied verbatim. The overridden options missing from the template are appended.
+
+    Args:
+        template: The text of the config file.
+        overrides: The new values by option name, e.g., ``{'MACH_NUMBER': 0.8}``.
+        path: The config file to write.
+    """
+    remaining = dict(overrides)
+    lines = template.splitlines(keepends=True)
+    for i, line in enumerate(lines):
+        if line.lstrip().startswith("%") or "=" not in line:
+            continue
+        key = line.partition("=")[0].strip()
+        if key in remaining:
+            lines[i] = f"{key}= {format_option(remaining.pop(key))}\n"
+    if remaining and lines and not lines[-1].endswith("\n"):
+        lines[-1] += "\n"
+    lines.extend(f"{key}= {format_option(value)}\n" for key, value in remaining.items())
+    with open(path, "w") as f:
+        f.writelines(lines)
@@ -3,4 +3,12 @@ import warnings
 
 
 class Error(Exception):
-    """Error superclass."""
\ No newline at end of file
+    """Error superclass."""
+
+
+class SchemaError(Error):
+    """Raised when data does not match the schema of a database."""
+
+
+class SolverOutputError(Error):
+    """Raised when the output of a solver has no usable result, e.g., a history without a complete row."""
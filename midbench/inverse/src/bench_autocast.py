@@ -0,0 +1,48 @@
+"""
+CPU benchmark of float32 against bfloat16 autocast training of CEBGAN.
+
+Reports the time per training step and the final MMD for both precisions.
+"""
+import time
+import torch
+import numpy as np
+
+from train_cv_cebgan import read_configs, assemble_new_gan
+from utils.dataloader import AirfoilDataset, NoiseGenerator, TensorLoader
+from utils.metrics import ci_mmd
+from utils.sampling import build_gen_func
+
+def run(dtype, dataset, epochs, batch, cz, noise_type, configs):
+    torch.manual_seed(0)
+    egan = assemble_new_gan(*configs)
+    dataloader = TensorLoader(dataset, batch_size=batch, shuffle=True)
+    noise_gen = NoiseGenerator(batch, sizes=cz, noise_type=noise_type)
+    start = time.perf_counter()
+    egan.train(
+        epochs=epochs, num_iter_D=1, num_iter_G=1,
+        dataloader=dataloader, noise_gen=noise_gen,
+        report_interval=epochs, autocast=dtype
+        )
+    step_time = (time.perf_counter() - start) / (epochs * len(dataloader))
+    return egan, step_time
+
+if __name__ == '__main__':
+    batch = 128
+    epochs = 20
+    n_run = 10
+
+    dis_cfg, gen_cfg, egan_cfg, cz, noise_type = read_configs('cebgan')
+
+    airfoils_opt = np.load('../data/airfoils_opt_995.npy').astype(np.float32)
+    inp_paras = np.load('../data/inp_paras_995.npy').astype(np.float32)
+    aoas_opt = np.load('../data/aoas_opt_995.npy').astype(np.float32).reshape(-1, 1)
+    mean_std = (inp_paras.mean(0), inp_paras.std(0))
+    dataset = AirfoilDataset(inp_paras, airfoils_opt, aoas_opt, inp_mean_std=mean_std)
+
+    tr_inp_paras = (inp_paras - mean_std[0]) / mean_std[1]
+    X = np.hstack([airfoils_opt.reshape(airfoils_opt.shape[0], -1), aoas_opt, tr_inp_paras])
+
+    for name, dtype in [('fp32', None), ('bf16', torch.bfloat16)]:
+        egan, step_time = run(dtype, dataset, epochs, batch, cz, noise_type, (dis_cfg, gen_cfg, egan_cfg))
+        mmd = ci_mmd(n_run, build_gen_func(egan.generator, tr_inp_paras, cz, noise_type), X)
+        print('{}: {:.2f} ms/step, MMD: {} ± {}'.format(name, step_time * 1e3, *mmd))
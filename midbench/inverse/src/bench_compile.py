@@ -0,0 +1,64 @@
+"""
+Per-step benchmark of eager against compiled CEBGAN training and inference,
+together with the frozen TorchScript export of the generator.
+"""
+import os
+import time
+import tempfile
+import torch
+import numpy as np
+
+from train_cv_cebgan import read_configs, assemble_new_gan
+from models.inference import export_torchscript, load_torchscript
+from utils.dataloader import AirfoilDataset, NoiseGenerator
+
+def time_it(func, n_steps, warmup):
+    for _ in range(warmup): func() # compilation happens during warmup
+    start = time.perf_counter()
+    for _ in range(n_steps): func()
+    return (time.perf_counter() - start) / n_steps
+
+def train_step(egan, batch, noise_gen):
+    def step():
+        egan._update_D(1, batch, noise_gen)
+        egan._update_G(1, batch, noise_gen)
+    return step
+
+def infer_step(generator, noise, inp_paras):
+    def step():
+        with torch.no_grad():
+            generator(noise, inp_paras)
+    return step
+
+if __name__ == '__main__':
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    batch = 128
+    n_steps = 50
+    warmup = 5
+
+    dis_cfg, gen_cfg, egan_cfg, cz, noise_type = read_configs('cebgan')
+
+    airfoils_opt = np.load('../data/airfoils_opt_995.npy').astype(np.float32)
+    inp_paras = np.load('../data/inp_paras_995.npy').astype(np.float32)
+    aoas_opt = np.load('../data/aoas_opt_995.npy').astype(np.float32).reshape(-1, 1)
+    mean_std = (inp_paras.mean(0), inp_paras.std(0))
+    dataset = AirfoilDataset(inp_paras, airfoils_opt, aoas_opt, inp_mean_std=mean_std, device=device)
+    data = dataset[:batch]
+    noise_gen = NoiseGenerator(batch, sizes=cz, noise_type=noise_type, device=device)
+
+    for compile in [False, True]:
+        torch.manual_seed(0)
+        egan = assemble_new_gan(dis_cfg, gen_cfg, egan_cfg, device=device)
+        if compile: egan.compile()
+        train_time = time_it(train_step(egan, data, noise_gen), n_steps, warmup)
+        egan.generator.eval()
+        infer_time = time_it(infer_step(egan.generator, noise_gen(), data[-1]), n_steps, warmup)
+        print('{}: train {:.2f} ms/step, inference {:.2f} ms/batch'.format(
+            'compiled' if compile else 'eager', train_time * 1e3, infer_time * 1e3))
+
+    path = os.path.join(tempfile.gettempdir(), 'cebgan_generator.pt')
+    egan = assemble_new_gan(dis_cfg, gen_cfg, egan_cfg, device=device)
+    export_torchscript(egan.generator, path, noise_gen(), data[-1])
+    scripted = load_torchscript(path, device=device)
+    infer_time = time_it(infer_step(scripted, noise_gen(), data[-1]), n_steps, warmup)
+    print('torchscript: inference {:.2f} ms/batch'.format(infer_time * 1e3))
@@ -0,0 +1,43 @@
+"""
+Numerical equivalence check and latency benchmark of the generator
+with batch normalization folded in by ``fuse_for_inference``.
+"""
+import time
+import torch
+
+from train_cv_cebgan import read_configs
+from models.cgans import AirfoilAoAGenerator
+from utils.dataloader import NoiseGenerator
+
+def latency(generator, noise, inp_paras, n_steps=100, warmup=5):
+    with torch.no_grad():
+        for _ in range(warmup): generator(noise, inp_paras)
+        start = time.perf_counter()
+        for _ in range(n_steps): generator(noise, inp_paras)
+    return (time.perf_counter() - start) / n_steps
+
+if __name__ == '__main__':
+    torch.manual_seed(0)
+    batch = 128
+    _, gen_cfg, _, cz, noise_type = read_configs('cebgan')
+    noise_gen = NoiseGenerator(batch, sizes=cz, noise_type=noise_type)
+
+    generator = AirfoilAoAGenerator(**gen_cfg)
+    with torch.no_grad(): # populate the batch normalization statistics
+        for _ in range(10): generator(noise_gen(), torch.randn(batch, 3))
+    generator.eval()
+    fused = generator.fuse_for_inference()
+
+    noise, inp_paras = noise_gen(), torch.randn(batch, 3)
+    with torch.no_grad():
+        (dp, aoa), *_ = generator(noise, inp_paras)
+        (dp_f, aoa_f), *_ = fused(noise, inp_paras)
+    torch.testing.assert_close(dp_f, dp, rtol=1e-4, atol=1e-5)
+    torch.testing.assert_close(aoa_f, aoa, rtol=1e-4, atol=1e-5)
+    print('max deviation: airfoils {:.2e}, aoa {:.2e}'.format(
+        (dp_f - dp).abs().max().item(), (aoa_f - aoa).abs().max().item()))
+
+    n_params = lambda m: sum(p.numel() for p in m.parameters()) + sum(b.numel() for b in m.buffers())
+    print('size: {} -> {} values'.format(n_params(generator), n_params(fused)))
+    print('latency: {:.2f} ms -> {:.2f} ms per batch of {}'.format(
+        latency(generator, noise, inp_paras) * 1e3, latency(fused, noise, inp_paras) * 1e3, batch))
@@ -0,0 +1,149 @@
+"""
+Benchmark of the distribution metrics in utils/metrics.py.
+
+Checks the tiled implementations against the dense reference on small
+inputs and times them at benchmark scale, along with the random Fourier
+feature approximation, the KDE likelihood, the batched LSC,
+the diversity reductions and the shared-pool MetricSuite.
+"""
+import os
+import time
+import tempfile
+import numpy as np
+from utils import metrics
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    out = func(*args, **kwargs)
+    return out, time.perf_counter() - start
+
+def dense_mmd(X, Y):
+    return np.sqrt(np.mean(metrics.gaussian_kernel(X, X))
+                   - 2 * np.mean(metrics.gaussian_kernel(X, Y))
+                   + np.mean(metrics.gaussian_kernel(Y, Y)))
+
+def bench_mmd(rng, n_small=500, n_large=20000, dim=387):
+    X, Y = rng.normal(size=(n_small, dim)) / 10, rng.normal(size=(n_small + 1, dim)) / 10
+    ref = dense_mmd(X, Y)
+    for backend in ['numpy', 'torch']:
+        value = metrics.mmd(X, Y, block_size=128, backend=backend)
+        assert np.isclose(value, ref, rtol=1e-8), (backend, value, ref)
+    print('MMD matches the dense reference ({:.6f})'.format(ref))
+
+    X, Y = rng.normal(size=(n_large, dim)) / 10, rng.normal(size=(n_large, dim)) / 10
+    for estimator in ['biased', 'unbiased', 'linear']:
+        for backend in ['numpy', 'torch']:
+            value, t = timed(metrics.mmd, X, Y, estimator=estimator, backend=backend)
+            print('MMD {} ({}), N={}: {:.6f} in {:.2f} s'.format(estimator, backend, n_large, value, t))
+
+def bench_ci_mmd(rng, n_run=10, n_samples=5000, dim=387):
+    X_test = rng.normal(size=(n_samples, dim)) / 10
+    gen_func = lambda: rng.normal(size=(n_samples, dim)) / 10
+    _, t_uncached = timed(lambda: [metrics.maximum_mean_discrepancy(gen_func, X_test) for _ in range(n_run)])
+    _, t_cached = timed(metrics.ci_mmd, n_run, gen_func, X_test)
+    print('ci_mmd x{}: {:.2f} s uncached, {:.2f} s with the cached test-set term'.format(n_run, t_uncached, t_cached))
+
+def bench_rff(rng, n_exact=10000, n_large=1000000, dim=387, n_features=2048):
+    X, Y = rng.normal(size=(n_exact, dim)) / 10, rng.normal(loc=.01, size=(n_exact, dim)) / 10
+    exact = metrics.mmd(X, Y)
+    (value, err), t = timed(metrics.MMDEvaluator(Y, estimator='rff', n_features=n_features, seed=0).evaluate, X)
+    print('MMD rff, N={}: {:.6f} ± {:.6f} in {:.2f} s (exact {:.6f})'.format(n_exact, value, err, t, exact))
+
+    Y = rng.normal(loc=.01, size=(n_exact, dim)) / 10
+    evaluator = metrics.MMDEvaluator(Y, estimator='rff', n_features=n_features, seed=0)
+    X = rng.normal(size=(n_large, dim)).astype(np.float32) / 10
+    (value, err), t = timed(evaluator.evaluate, X)
+    print('MMD rff, N={}: {:.6f} ± {:.6f} in {:.2f} s'.format(n_large, value, err, t))
+
+def bench_mll(rng, n_gen=2000, n_test=200, dim=387):
+    from sklearn.neighbors import KernelDensity
+    X_gen, X_test = rng.normal(size=(n_gen, dim)) / 10, rng.normal(size=(n_test, dim)) / 10
+    ref = KernelDensity(bandwidth=0.1).fit(X_gen).score_samples(X_test)
+    value = metrics._kde_log_density(X_test, X_gen, [0.1])[0]
+    assert np.allclose(value, ref, rtol=1e-8), (value, ref)
+
+    kde, t_grid = timed(metrics.optimize_kde, X_gen)
+    bandwidth, t_loo = timed(metrics.select_bandwidth, X_gen)
+    print('KDE bandwidth: grid search {:.4f} in {:.2f} s, leave-one-out {:.4f} in {:.2f} s'.format(
+        kde.bandwidth, t_grid, bandwidth, t_loo))
+    _, t = timed(metrics.ci_mll, 10, lambda N: rng.normal(size=(N, dim)) / 10, X_test)
+    print('ci_mll x10: {:.2f} s'.format(t))
+
+def looped_consistency(gen_func, latent_dim, bounds, n_eval=100, n_points=50):
+    mean_cor = 0
+    for i in range(n_eval):
+        c = metrics.sample_line(latent_dim, n_points, bounds)
+        X = gen_func(c).reshape((n_points, -1))
+        mean_cor += np.corrcoef(np.linalg.norm(c - c[0], axis=1), np.linalg.norm(X - X[0], axis=1))[0,1]
+    return mean_cor / n_eval
+
+def bench_lsc(rng, n_run=10, latent_dim=5, dim=387):
+    W = rng.normal(size=(latent_dim, dim))
+    gen_func = lambda c: np.tanh(c @ W) # must not draw from np.random for the seeds to line up
+
+    np.random.seed(0)
+    ref, t_loop = timed(lambda: [looped_consistency(gen_func, latent_dim, (0., 1.)) for _ in range(n_run)])
+    np.random.seed(0)
+    value, t = timed(lambda: metrics.line_correlations(
+        gen_func, metrics.sample_lines(n_run * 100, latent_dim, 50, (0., 1.))).reshape((n_run, 100)).mean(1))
+    assert np.allclose(value, ref, rtol=1e-12), (value, ref)
+    print('LSC x{}: {:.2f} s looped, {:.2f} s batched'.format(n_run, t_loop, t))
+
+def bench_diversity(rng, n_samples=2000, n_points=192, n_large=200000):
+    def looped_variation(X):
+        return np.mean([np.trace(np.cov(np.diff(x, axis=0).T)) / 2 for x in X])
+
+    X = rng.normal(size=(n_samples, n_points, 2))
+    ref, t_loop = timed(looped_variation, X)
+    value, t = timed(metrics.variation, X)
+    assert np.isclose(value, ref, rtol=1e-10), (value, ref)
+    print('variation, N={}: {:.2f} s looped, {:.3f} s vectorized'.format(n_samples, t_loop, t))
+
+    X = X.reshape((n_samples, -1))
+    ref, t_cov = timed(lambda: np.trace(np.cov(X.T)) / X.shape[1])
+    value, t = timed(metrics.variance, X, chunk_size=512)
+    assert np.isclose(value, ref, rtol=1e-10), (value, ref)
+    print('variance, N={}: {:.3f} s with the covariance, {:.3f} s chunked'.format(n_samples, t_cov, t))
+
+    path = os.path.join(tempfile.mkdtemp(), 'X.npy')
+    X = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=(n_large, n_points * 2))
+    for i in range(0, n_large, 10000):
+        X[i:i+10000] = rng.normal(size=(min(10000, n_large - i), n_points * 2))
+    X.flush()
+    X = np.load(path, mmap_mode='r')
+    value, t = timed(metrics.variance, X)
+    print('variance, N={} memory-mapped: {:.4f} in {:.2f} s'.format(n_large, value, t))
+    value, t = timed(metrics.variation, X.reshape((n_large, n_points, 2)))
+    print('variation, N={} memory-mapped: {:.4f} in {:.2f} s'.format(n_large, value, t))
+
+def bench_suite(rng, n_run=10, n_samples=2000, n_points=192):
+    X_test = rng.normal(size=(n_samples, n_points, 2)) / 10
+    gen_func = lambda N: rng.normal(size=(N, n_points, 2)) / 10
+
+    suite = metrics.MetricSuite(gen_func, X_test, n=1, pool_size=n_samples)
+    report = suite.evaluate()
+    X_gen = suite.pool
+    assert np.isclose(report['mmd'][0], metrics.mmd(X_gen, X_test), rtol=1e-8)
+    assert np.isclose(report['mll'][0], metrics.mean_log_likelihood(X_gen, X_test), rtol=1e-8)
+
+    def separate():
+        return {'mmd': metrics.ci_mmd(n_run, lambda: gen_func(n_samples), X_test),
+                'mll': metrics.ci_mll(n_run, gen_func, X_test),
+                'rsmth': metrics.ci_rsmth(n_run, gen_func, X_test),
+                'rdiv': metrics.ci_rdiv(n_run, X_test, gen_func)}
+    _, t_separate = timed(separate)
+    suite = metrics.MetricSuite(gen_func, X_test, n=n_run, pool_size=n_run * n_samples)
+    report, t_suite = timed(suite.evaluate)
+    print('4 metrics x{}: {:.2f} s separately, {:.2f} s with MetricSuite'.format(n_run, t_separate, t_suite))
+    for metric, (mean, err) in report.items():
+        print('  {}: {:.4f} ± {:.4f}'.format(metric, mean, err))
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    bench_mmd(rng)
+    bench_ci_mmd(rng)
+    bench_rff(rng)
+    bench_mll(rng)
+    bench_lsc(rng)
+    bench_diversity(rng)
+    bench_suite(rng)
@@ -0,0 +1,68 @@
+"""
+Accuracy report and CPU throughput benchmark of the INT8 CEBGAN generator
+against the float32 one, both built from the final checkpoint.
+"""
+import os
+import time
+import torch
+import numpy as np
+
+from train_cv_cebgan import read_configs
+from models.cgans import AirfoilAoAGenerator
+from models.inference import quantize_for_inference
+from utils.dataloader import NoiseGenerator
+from utils.metrics import ci_mmd
+from utils.sampling import build_gen_func
+
+def load_generator(gen_cfg, save_dir, checkpoint):
+    ckp = torch.load(os.path.join(save_dir, checkpoint), map_location='cpu')
+    generator = AirfoilAoAGenerator(**gen_cfg)
+    generator.load_state_dict(ckp['generator'])
+    generator.eval()
+    return generator
+
+def predict(generator, noise, inp_paras):
+    with torch.no_grad():
+        airfoils, aoas = generator(noise, inp_paras)[0]
+    return airfoils.numpy().transpose([0, 2, 1]), aoas.numpy()
+
+def throughput(generator, noise, inp_paras, n_steps=20, warmup=3):
+    with torch.no_grad():
+        for _ in range(warmup): generator(noise, inp_paras)
+        start = time.perf_counter()
+        for _ in range(n_steps): generator(noise, inp_paras)
+    return n_steps * len(noise) / (time.perf_counter() - start)
+
+if __name__ == '__main__':
+    torch.manual_seed(0)
+    batch = 4096
+    n_run = 10
+    _, gen_cfg, _, cz, noise_type = read_configs('cebgan')
+    fp32 = load_generator(gen_cfg, '../saves/final', 'cebgan14999.tar')
+
+    airfoils_opt = np.load('../data/airfoils_opt_995.npy').astype(np.float32)
+    inp_paras = np.load('../data/inp_paras_995.npy').astype(np.float32)
+    aoas_opt = np.load('../data/aoas_opt_995.npy').astype(np.float32).reshape(-1, 1)
+    inp_paras = (inp_paras - inp_paras.mean(0)) / inp_paras.std(0)
+    X = np.hstack([airfoils_opt.reshape(airfoils_opt.shape[0], -1), aoas_opt, inp_paras])
+
+    inp_paras_t = torch.tensor(inp_paras)
+    calibration = [(NoiseGenerator(len(inp_paras), cz, noise_type)(), inp_paras_t) for _ in range(4)]
+    int8 = quantize_for_inference(fp32, calibration)
+
+    noise = NoiseGenerator(len(inp_paras), cz, noise_type)()
+    af_32, ao_32 = predict(fp32, noise, inp_paras_t)
+    af_8, ao_8 = predict(int8, noise, inp_paras_t)
+    l2 = np.linalg.norm((af_8 - af_32).reshape(len(af_32), -1), axis=1)
+    print('airfoil L2 deviation: mean {:.2e}, max {:.2e}'.format(l2.mean(), l2.max()))
+    print('AoA abs error: mean {:.2e}, max {:.2e}'.format(np.abs(ao_8 - ao_32).mean(), np.abs(ao_8 - ao_32).max()))
+
+    mmd_32 = ci_mmd(n_run, build_gen_func(fp32, inp_paras, cz, noise_type), X)
+    mmd_8 = ci_mmd(n_run, build_gen_func(int8, inp_paras, cz, noise_type), X)
+    print('MMD fp32: {} ± {}'.format(*mmd_32))
+    print('MMD int8: {} ± {} (delta {:+.2e})'.format(*mmd_8, mmd_8[0] - mmd_32[0]))
+
+    noise = NoiseGenerator(batch, cz, noise_type)()
+    conditions = inp_paras_t[torch.randint(len(inp_paras_t), (batch,))]
+    for name, generator in [('fp32', fp32), ('fused', fp32.fuse_for_inference()), ('int8', int8)]:
+        print('{}: {:.0f} samples/s'.format(name, throughput(generator, noise, conditions)))
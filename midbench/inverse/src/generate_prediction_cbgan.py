@@ -6,6 +6,7 @@ from models.cgans import AirfoilAoAGenerator
 from train_final_cbgan import read_configs
 from utils.shape_plot import plot_samples, plot_grid, plot_comparision
 from utils.dataloader import NoiseGenerator
+from utils.sampling import stream_samples
 
 def load_generator(gen_cfg, save_dir, checkpoint, device='cpu'):
     ckp = torch.load(os.path.join(save_dir, checkpoint))
@@ -18,7 +19,7 @@ if __name__ == '__main__':
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 
     save_dir = '../saves/final/'
-    _, gen_cfg, _, cz, _ = read_configs('cbgan')
+    _, gen_cfg, _, cz, noise_type = read_configs('cbgan')
 
     epoch = 5000
 
@@ -41,13 +42,8 @@ if __name__ == '__main__':
     np.save('../data/pred_cbgan/single/airfoils_pred.npy', samples[0])
     np.save('../data/pred_cbgan/single/inp_params_pred.npy', params.cpu().detach().numpy())
 
-    # num_trials = 10
-    # for _ in range(num_trials):
-    #     noise = torch.randn([len(params), cz[0]], device=device, dtype=torch.float)
-    #     pred = generator(noise, params)[0]
-    #     samples.append(pred[0].cpu().detach().numpy().transpose([0, 2, 1]))
-    #     aoas.append(pred[1].cpu().detach().numpy())
-
-    # np.save('aoas_pred.npy', np.stack(aoas, axis=1))
-    # np.save('airfoils_pred.npy', np.stack(samples, axis=1))
-    # np.save('inp_params_pred.npy', params.cpu().detach().numpy())
+    num_trials = 10
+    stream_samples(
+        generator, tr_inp_paras, num_trials * len(tr_inp_paras), '../data/pred_cbgan/multiple', 
+        cz, noise_type, chunk_size=10000, device=device
+        )
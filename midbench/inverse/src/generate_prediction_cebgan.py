@@ -5,6 +5,7 @@ import matplotlib.pyplot as plt
 from models.cgans import AirfoilAoAGenerator
 from train_final_cebgan import read_configs
 from utils.dataloader import NoiseGenerator
+from utils.sampling import stream_samples
 
 def load_generator(gen_cfg, save_dir, checkpoint, device='cpu'):
     ckp = torch.load(os.path.join(save_dir, checkpoint))
@@ -17,7 +18,7 @@ if __name__ == '__main__':
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 
     save_dir = '../saves/final/'
-    _, gen_cfg, _, cz, _ = read_configs('cebgan')
+    _, gen_cfg, _, cz, noise_type = read_configs('cebgan')
 
     epoch = 15000
 
@@ -39,4 +40,10 @@ if __name__ == '__main__':
     print(samples, aoas)
     # np.save('../data/pred_cebgan/single/aoas_pred.npy', aoas[0])
     # np.save('../data/pred_cebgan/single/airfoils_pred.npy', samples[0])
-    # np.save('../data/pred_cebgan/single/inp_params_pred.npy', params.cpu().detach().numpy())
\ No newline at end of file
+    # np.save('../data/pred_cebgan/single/inp_params_pred.npy', params.cpu().detach().numpy())
+
+    num_trials = 10
+    stream_samples(
+        generator, tr_inp_paras, num_trials * len(tr_inp_paras), '../data/pred_cebgan/multiple', 
+        cz, noise_type, chunk_size=10000, device=device
+        )
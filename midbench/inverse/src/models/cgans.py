@@ -57,6 +57,10 @@ class AirfoilAoAGenerator(nn.Module):
         dp, cp, w, pv, intvls = self.airfoil_generator(torch.hstack([noise, inp_paras]))
         aoa = self.aoa_generator(torch.hstack([noise, inp_paras]))
         return (dp, aoa), cp, w, pv, intvls
+
+    def fuse_for_inference(self):
+        """Smaller and faster copy for inference with batch normalization folded into the weights."""
+        return layers.fuse_for_inference(self)
     
     def extra_repr(self) -> str:
         return 'in_features={}, n_control_points={}, n_data_points={}'.format(
@@ -132,10 +136,7 @@ class AirfoilAoACEGAN(BezierSEGAN):
                 tb_writer.add_scalar('Regularization Loss', reg_loss, epoch)
                 tb_writer.add_scalar('MSE of AoA', mse, epoch)
 
-            try: 
-                kwargs['plotting'](epoch, batch, fake)
-            except:
-                pass
+            self._plotting_hook(epoch, batch, fake, **kwargs)
 
 class CBGAN(BezierGAN):
 
@@ -144,8 +145,10 @@ class CBGAN(BezierGAN):
 
     def train(
         self, dataloader, noise_gen, epochs, num_iter_D=5, num_iter_G=1, report_interval=5,
-        save_dir=None, save_iter_list=[100,], tb_writer=None, **kwargs
+        save_dir=None, save_iter_list=[100,], tb_writer=None, autocast=None, compile=False, **kwargs
         ):
+        self.autocast = autocast
+        if compile: self.compile()
         for epoch in range(epochs):
             self._epoch_hook(epoch, epochs, noise_gen, tb_writer, **kwargs)
             for i, (dp, aoa, inp_paras) in enumerate(dataloader):
@@ -163,13 +166,17 @@ class CBGAN(BezierGAN):
     def _update_D(self, num_iter_D, real_dp, real_aoa, inp_paras, noise_gen, **kwargs):
         for _ in range(num_iter_D):
             self.optimizer_D.zero_grad()
-            self.loss_D(real_dp, real_aoa, inp_paras, noise_gen, **kwargs).backward()
+            with self._autocast():
+                loss = self.loss_D(real_dp, real_aoa, inp_paras, noise_gen, **kwargs)
+            loss.backward()
             self.optimizer_D.step()
     
     def _update_G(self, num_iter_G, real_dp, real_aoa, inp_paras, noise_gen, **kwargs):
         for _ in range(num_iter_G):
             self.optimizer_G.zero_grad()
-            self.loss_G(real_dp, real_aoa, inp_paras, noise_gen, **kwargs).backward()
+            with self._autocast():
+                loss = self.loss_G(real_dp, real_aoa, inp_paras, noise_gen, **kwargs)
+            loss.backward()
             self.optimizer_G.step()
 
     def loss_G(self, real_dp, real_aoa, inp_paras, noise_gen, **kwargs):
@@ -213,7 +220,4 @@ class CBGAN(BezierGAN):
             else:
                 print('[Epoch {}/{}] JS loss: {:d}, Regularization loss: {:d}'.format(
                     epoch, epochs,  js_loss, reg_loss))
-            try:
-                kwargs['plotting'](epoch, (real_dp, real_aoa, inp_paras), (fake_dp, fake_aoa))
-            except:
-                pass
+            self._plotting_hook(epoch, (real_dp, real_aoa, inp_paras), (fake_dp, fake_aoa), **kwargs)
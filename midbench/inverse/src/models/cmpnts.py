@@ -184,6 +184,10 @@ class BezierGenerator(nn.Module):
         cp, w = self.cpw_generator(input)
         dp, pv, intvls = self.bezier_layer(features, cp, w)
         return dp, cp, w, pv, intvls
+
+    def fuse_for_inference(self):
+        """Smaller and faster copy for inference with batch normalization folded into the weights."""
+        return layers.fuse_for_inference(self)
     
     def extra_repr(self) -> str:
         return 'in_features={}, n_control_points={}, n_data_points={}'.format(
@@ -2,7 +2,7 @@ import os
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from .utils import strong_convex_func, first_element
+from .utils import strong_convex_func, first_element, detach, compile_module
 from .sinkhorn import sinkhorn_divergence, regularized_ot, sink
 
 _eps = 1e-7
@@ -22,6 +22,7 @@ class GAN:
             self.generator.parameters(), lr=opt_g_lr, betas=opt_g_betas, eps=opt_g_eps)
         self.optimizer_D = torch.optim.Adam(
             self.discriminator.parameters(), lr=opt_d_lr, betas=opt_d_betas, eps=opt_g_eps)
+        self.autocast = None
         if checkpoint:
             self.load(checkpoint, train_mode)
     
@@ -54,6 +55,11 @@ class GAN:
 
     def _epoch_hook(self, epoch, epochs, noise_gen, tb_writer, **kwargs): pass
 
+    def _plotting_hook(self, epoch, *args, plotting=None, **kwargs):
+        # hand detached snapshots over so that a background plotter never holds the graph
+        if plotting is not None:
+            plotting(epoch, *detach(args))
+
     def _epoch_report(self, epoch, epochs, batch, noise_gen, report_interval, tb_writer, **kwargs):
         if epoch % report_interval == 0:
             if tb_writer:
@@ -91,22 +97,45 @@ class GAN:
         else: 
             return first_element(self.generator(input))
     
+    def compile(self, **kwargs):
+        """Compile the generator and the discriminator in place. See ``utils.compile_module``."""
+        compile_module(self.generator, **kwargs)
+        compile_module(self.discriminator, **kwargs)
+        return self
+
+    def _autocast(self):
+        # mixed precision context for the forward passes and losses, e.g. bfloat16 on CPU
+        device_type = next(self.generator.parameters()).device.type
+        return torch.autocast(device_type, dtype=self.autocast, enabled=self.autocast is not None)
+    
     def _update_D(self, num_iter_D, batch, noise_gen, **kwargs):
         for _ in range(num_iter_D):
             self.optimizer_D.zero_grad()
-            self.loss_D(batch, noise_gen, **kwargs).backward()
+            with self._autocast():
+                loss = self.loss_D(batch, noise_gen, **kwargs)
+            loss.backward()
             self.optimizer_D.step()
     
     def _update_G(self, num_iter_G, batch, noise_gen, **kwargs):
         for _ in range(num_iter_G):
             self.optimizer_G.zero_grad()
-            self.loss_G(batch, noise_gen, **kwargs).backward()
+            with self._autocast():
+                loss = self.loss_G(batch, noise_gen, **kwargs)
+            loss.backward()
             self.optimizer_G.step()
 
     def train(
         self, dataloader, noise_gen, epochs, num_iter_D=5, num_iter_G=1, report_interval=5,
-        save_dir=None, save_iter_list=[100,], tb_writer=None, **kwargs
+        save_dir=None, save_iter_list=[100,], tb_writer=None, autocast=None, compile=False, **kwargs
         ):
+        """Train the GAN.
+
+        ``autocast`` sets the reduced precision dtype (e.g. ``torch.bfloat16``) under which 
+        the losses are computed. The Sinkhorn iterations and the Bezier layer always run in float32.
+        ``compile`` compiles the generator and the discriminator before training.
+        """
+        self.autocast = autocast
+        if compile: self.compile()
         for epoch in range(epochs):
             self._epoch_hook(epoch, epochs, noise_gen, tb_writer, **kwargs)
             for i, batch in enumerate(dataloader):
@@ -173,10 +202,7 @@ class BezierGAN(InfoGAN):
             else:
                 print('[Epoch {}/{}] JS loss: {:d}, Info loss: {:d}, Regularization loss: {:d}'.format(
                     epoch, epochs,  js_loss, info_loss, reg_loss))
-            try: 
-                kwargs['plotting'](epoch, fake)
-            except:
-                pass
+            self._plotting_hook(epoch, fake, **kwargs)
 
 class EGAN(GAN):
     def __init__(self, generator: nn.Module, discriminator: nn.Module, lamb: float, 
@@ -312,10 +338,7 @@ class BezierEGAN(EGAN, BezierGAN):
             else:
                 print('[Epoch {}/{}] Dual loss: {:d}, Info loss: {:d}, Regularization loss: {:d}'.format(
                     epoch, epochs,  d_r.mean() - d_f.mean() - smooth, info_loss, reg_loss))
-            try: 
-                kwargs['plotting'](epoch, fake)
-            except:
-                pass
+            self._plotting_hook(epoch, fake, **kwargs)
 
 class BezierSEGAN(SinkhornEGAN, BezierGAN):
     def loss_D(self, batch, noise_gen, **kwargs):
@@ -348,7 +371,4 @@ class BezierSEGAN(SinkhornEGAN, BezierGAN):
                 tb_writer.add_scalar('Info Loss', info_loss, epoch)
                 tb_writer.add_scalar('Regularization Loss', reg_loss, epoch)
 
-            try: 
-                kwargs['plotting'](epoch, fake)
-            except:
-                pass
\ No newline at end of file
+            self._plotting_hook(epoch, fake, **kwargs)
\ No newline at end of file
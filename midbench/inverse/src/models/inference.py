@@ -0,0 +1,90 @@
+"""
+Utilities for deploying trained generators for inference.
+"""
+import torch
+import torch.nn as nn
+import torch.ao.quantization as quant
+from . import layers
+
+
+def export_torchscript(generator: nn.Module, path: str, *example_inputs):
+    r"""Trace the generator into a frozen TorchScript module and save it.
+
+    The saved file is self-contained: :func:`load_torchscript` restores it
+    without the Python model classes.
+
+    Args:
+        generator: The generator to be exported. It is switched to eval mode.
+        path: The file to save the TorchScript module to.
+        example_inputs: Example inputs of the generator used for tracing,
+            e.g., noise and conditions for ``AirfoilAoAGenerator``.
+
+    Returns:
+        The frozen TorchScript module.
+    """
+    generator.eval()
+    with torch.no_grad():
+        traced = torch.jit.trace(generator, example_inputs)
+    frozen = torch.jit.freeze(traced)
+    torch.jit.save(frozen, path)
+    return frozen
+
+def load_torchscript(path: str, device='cpu'):
+    r"""Load a generator exported by :func:`export_torchscript`.
+    """
+    return torch.jit.load(path, map_location=device)
+
+class _StaticQuantized(nn.Module):
+    r"""Runs the wrapped module on statically quantized activations.
+    """
+    def __init__(self, module: nn.Module):
+        super().__init__()
+        self.quant = quant.QuantStub()
+        self.module = module
+        self.dequant = quant.DeQuantStub()
+
+    def forward(self, input):
+        return self.dequant(self.module(self.quant(input)))
+
+def quantize_for_inference(generator: nn.Module, calibration_inputs, backend: str='fbgemm'):
+    r"""Build an INT8 CPU copy of the generator for high-volume sampling.
+
+    Batch normalization is first folded in with :func:`layers.fuse_for_inference`.
+    The transposed convolutions are then statically quantized with activation ranges 
+    calibrated on ``calibration_inputs``, and the linear layers are dynamically 
+    quantized. The Bezier layer is left in float32.
+
+    Args:
+        generator: The float32 generator, e.g., ``AirfoilAoAGenerator`` or ``BezierGenerator``.
+        calibration_inputs: An iterable of input tuples of the generator, 
+            e.g., ``[(noise, inp_paras), ...]``, covering the expected input distribution.
+        backend: The quantized engine, ``'fbgemm'`` (x86) or ``'qnnpack'`` (ARM). It is only
+            selected while the model is built, ``torch.backends.quantized.engine`` is restored after.
+
+    Returns:
+        The quantized generator in eval mode, running on CPU.
+    """
+    previous = torch.backends.quantized.engine
+    torch.backends.quantized.engine = backend # the weights are prepacked for this engine
+    try:
+        model = layers.fuse_for_inference(generator).cpu()
+
+        # per-tensor weight observer, transposed convolutions do not support per-channel quantization
+        qconfig = quant.get_default_qconfig(backend)._replace(weight=quant.default_weight_observer)
+        for combo in [m for m in model.modules() if isinstance(m, layers.Deconv1DCombo)]:
+            combo.model[0] = _StaticQuantized(combo.model[0])
+            combo.model[0].qconfig = qconfig
+        quant.prepare(model, inplace=True)
+        with torch.no_grad():
+            for inputs in calibration_inputs:
+                model(*[each.cpu() for each in inputs])
+        quant.convert(model, inplace=True)
+
+        excluded = {name for name, m in model.named_modules() if isinstance(m, layers.BezierLayer)}
+        linears = {
+            name: quant.default_dynamic_qconfig for name, m in model.named_modules()
+            if isinstance(m, nn.Linear) and not any(name.startswith(each + '.') for each in excluded)
+            }
+        return quant.quantize_dynamic(model, linears, dtype=torch.qint8)
+    finally:
+        torch.backends.quantized.engine = previous
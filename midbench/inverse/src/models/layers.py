@@ -1,6 +1,9 @@
+import copy
 import torch
 import torch.nn as nn
 from torch import Tensor
+from torch.nn.utils.fusion import fuse_linear_bn_eval, fuse_conv_bn_eval
+from .utils import full_precision, autocast_disabled
 
 _eps = 1e-7
 
@@ -37,9 +40,11 @@ class BezierLayer(nn.Module):
         )
 
     def forward(self, input: Tensor, control_points: Tensor, weights: Tensor) -> Tensor:
-        cp, w = self._check_consistency(control_points, weights) # [N, d, n_cp], [N, 1, n_cp]
-        bs, pv, intvls = self.generate_bernstein_polynomial(input) # [N, n_cp, n_dp]
-        dp = (cp * w) @ bs / (w @ bs) # [N, d, n_dp]
+        with autocast_disabled(input): # log-Bernstein terms underflow in reduced precision
+            input, control_points, weights = full_precision((input, control_points, weights))
+            cp, w = self._check_consistency(control_points, weights) # [N, d, n_cp], [N, 1, n_cp]
+            bs, pv, intvls = self.generate_bernstein_polynomial(input) # [N, n_cp, n_dp]
+            dp = (cp * w) @ bs / (w @ bs) # [N, d, n_dp]
         return dp, pv, intvls
     
     def _check_consistency(self, control_points: Tensor, weights: Tensor) -> Tensor:
@@ -72,6 +77,12 @@ class _Combo(nn.Module):
     def forward(self, input):
         return self.model(input)
 
+    def fuse(self):
+        r"""Fold the frozen batch normalization into the preceding layer in place.
+        Only valid in eval mode.
+        """
+        return self
+
 class LinearCombo(_Combo):
     r"""Regular fully connected layer combo.
     """
@@ -83,6 +94,11 @@ class LinearCombo(_Combo):
             nn.LeakyReLU(alpha)
         )
 
+    def fuse(self):
+        linear, bn, act = self.model
+        self.model = nn.Sequential(fuse_linear_bn_eval(linear, bn), act)
+        return self
+
 class Deconv1DCombo(_Combo):
     r"""Regular deconvolutional layer combo.
     """
@@ -97,6 +113,11 @@ class Deconv1DCombo(_Combo):
             nn.LeakyReLU(alpha)
         )
 
+    def fuse(self):
+        deconv, bn, act = self.model
+        self.model = nn.Sequential(fuse_conv_bn_eval(deconv, bn, transpose=True), act)
+        return self
+
 class Deconv2DCombo(_Combo):
     r"""Regular deconvolutional layer combo.
     """
@@ -124,4 +145,18 @@ class Conv1DCombo(_Combo):
             nn.BatchNorm1d(out_channels),
             nn.LeakyReLU(alpha),
             nn.Dropout(dropout)
-        )
\ No newline at end of file
+        )
+
+    def fuse(self):
+        conv, bn, act, dropout = self.model
+        self.model = nn.Sequential(fuse_conv_bn_eval(conv, bn), act, dropout)
+        return self
+
+def fuse_for_inference(module: nn.Module) -> nn.Module:
+    r"""Return a copy of the module in eval mode with the batch normalization of 
+    every layer combo folded into the preceding linear or (transposed) convolutional layer.
+    """
+    fused = copy.deepcopy(module).eval()
+    for combo in [m for m in fused.modules() if isinstance(m, _Combo)]:
+        combo.fuse()
+    return fused
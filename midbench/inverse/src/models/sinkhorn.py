@@ -14,6 +14,7 @@
 #--------------------------------------------------------------------------------------------
 
 import torch
+from .utils import full_precision, autocast_disabled
 
 #######################################################################################################################
 # Elementary operations .....................................................................
@@ -21,6 +22,7 @@ import torch
 
 def lse(v_ij):
     """[lse(v_ij)]_i = log sum_j exp(v_ij), with numerical accuracy."""
+    v_ij = v_ij.float() # never reduce precision here, even under autocast
     V_i = torch.max(v_ij, 1)[0].view(-1, 1)
     return V_i + (v_ij - V_i).exp().sum(1).log().view(-1, 1)
 
@@ -38,8 +40,9 @@ def Sinkhorn_ops(ε, x_i, y_j, cost_func):
     This may look like a strange level of abstraction, but it is the most convenient way of
     working with KeOps and Vanilla pytorch (with a pre-computed cost matrix) at the same time.
     """
-    # We precompute the |x_i-y_j|^p matrix once and for all...
-    C_e = cost_func(x_i, y_j) / ε
+    # We precompute the |x_i-y_j|^p matrix once and for all, in float32 even under autocast...
+    with autocast_disabled(x_i):
+        C_e = cost_func(full_precision(x_i), full_precision(y_j)) / ε
 
     # Before wrapping it up in a simple pair of operators - don't forget the minus!
     S_x = lambda f_i: -lse(f_i.view(1, -1) - C_e.T)
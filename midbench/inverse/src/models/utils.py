@@ -2,6 +2,7 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 import math
+import warnings
 
 
 def strong_convex_func(x, lamb, useHingedL2=False):
@@ -27,4 +28,49 @@ def first_element(input):
     if type(input) == tuple or type(input) == list:
         return input[0]
     else:
-        return input
\ No newline at end of file
+        return input
+
+def detach(input):
+    """Detach tensors, possibly nested in tuples or lists, from the graph.
+    """
+    if isinstance(input, torch.Tensor):
+        return input.detach()
+    elif type(input) == tuple or type(input) == list:
+        return type(input)(detach(each) for each in input)
+    else:
+        return input
+
+def full_precision(input):
+    """Cast floating point tensors, possibly nested in tuples or lists, to float32.
+    """
+    if isinstance(input, torch.Tensor):
+        return input.float() if input.is_floating_point() else input
+    elif type(input) == tuple or type(input) == list:
+        return type(input)(full_precision(each) for each in input)
+    else:
+        return input
+
+def autocast_disabled(input):
+    """Context in which the numerically sensitive computations on ``input`` stay in float32.
+    """
+    return torch.autocast(first_element(input).device.type, enabled=False)
+
+def compile_module(module, **kwargs):
+    """Compile ``module`` in place with ``torch.compile``, or leave it in eager mode 
+    if compilation is unavailable. Parameters and state dict keys are unaffected. Graphs 
+    that fail to compile run in eager mode, without changing ``torch._dynamo.config`` 
+    for the other compiled code of the program.
+    """
+    if not hasattr(module, 'compile'): # nn.Module.compile needs torch>=2.2
+        warnings.warn('torch.compile is unavailable, {} runs in eager mode.'.format(type(module).__name__))
+        return module
+    try:
+        import torch._dynamo
+        module.compile(**kwargs)
+        # fall back to eager on graphs that fail to compile, only within the calls of this module,
+        # which is where torch.compile compiles lazily
+        suppress_errors = torch._dynamo.config.patch(suppress_errors=True)
+        module._compiled_call_impl = suppress_errors(module._compiled_call_impl)
+    except Exception as e:
+        warnings.warn('Failed to compile {}, it runs in eager mode: {}'.format(type(module).__name__, e))
+    return module
@@ -4,35 +4,59 @@ import numpy as np
 import os
 import matplotlib.pyplot as plt
 from .models.cgans import AirfoilAoAGenerator
+from .models.utils import compile_module
+from .models.inference import quantize_for_inference
+from .utils.dataloader import NoiseGenerator
 from .train_final_cebgan import read_configs
 
-def load_generator(gen_cfg, save_dir, checkpoint, device='cpu'):
+def load_generator(
+    gen_cfg, save_dir, checkpoint, device='cpu', fuse=False, compile=False, quantize=False, calibration=None,
+    cz=None, noise_type=None, n_conditions=3
+    ):
+    if quantize: # the INT8 kernels only run on CPU
+        device = 'cpu'
     ckp = torch.load(os.path.join(save_dir, checkpoint), map_location=torch.device('cpu'))
     # ckp = torch.load(os.path.join(save_dir, checkpoint))
     generator = AirfoilAoAGenerator(**gen_cfg).to(device)
     generator.load_state_dict(ckp['generator'])
     generator.eval()
+    if quantize: # INT8 on CPU, calibrated on (noise, inp_paras) tuples
+        if calibration is None: # noise of the model and standard normal normalized conditions
+            if cz is None:
+                noise = torch.randn(512, gen_cfg['in_features'] - n_conditions)
+            else:
+                noise = NoiseGenerator(512, cz, noise_type)()
+            calibration = [(noise, torch.randn(512, n_conditions))]
+        generator = quantize_for_inference(generator, calibration)
+    elif fuse:
+        generator = generator.fuse_for_inference()
+    if compile:
+        compile_module(generator)
     return generator
 
 # if __name__ == '__main__':
 device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 
 save_dir = './midbench/inverse/saves/final/'
-_, gen_cfg, _, cz, _ = read_configs('cebgan')
+_, gen_cfg, _, cz, noise_type = read_configs('cebgan')
 epoch = 15000
 
 inp_paras = np.load('./midbench/inverse/data/inp_paras_995.npy')
 mean, std = inp_paras.mean(0), inp_paras.std(0)
 
 
-def cebgan_pred(inp_paras):
+def cebgan_pred(inp_paras, fuse=False, quantize=False):
  # reload inp_paras from Jun's test set.
     tr_inp_paras = (inp_paras - mean) / std
+    run_device = torch.device('cpu') if quantize else device
 
-    generator = load_generator(gen_cfg, save_dir, 'cebgan{}.tar'.format(epoch-1), device=device)
-    params = torch.tensor(tr_inp_paras, dtype=torch.float, device=device)
+    generator = load_generator(
+        gen_cfg, save_dir, 'cebgan{}.tar'.format(epoch-1), device=run_device,
+        fuse=fuse, quantize=quantize, cz=cz, noise_type=noise_type, n_conditions=tr_inp_paras.shape[1]
+        )
+    params = torch.tensor(tr_inp_paras, dtype=torch.float, device=run_device)
 
-    noise = torch.zeros([len(params), cz[0]], device=device, dtype=torch.float)
+    noise = torch.zeros([len(params), cz[0]], device=run_device, dtype=torch.float)
     pred = generator(noise, params)[0]
     designs = pred[0].cpu().detach().numpy().transpose([0, 2, 1])
     aoas = pred[1].cpu().detach().numpy()
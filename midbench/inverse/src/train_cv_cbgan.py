@@ -5,10 +5,12 @@ import os, json
 from datetime import datetime
 from sklearn.model_selection import train_test_split, KFold
 from torch.utils.tensorboard import SummaryWriter
-from torch.utils.data import DataLoader
+from torch.utils.data import DataLoader, Subset
 from models.cgans import CBGAN, AirfoilAoADiscriminator1D, AirfoilAoAGenerator
-from utils.dataloader import AirfoilDataset, NoiseGenerator
-from utils.shape_plot import plot_samples, plot_comparision
+from utils.dataloader import AirfoilDataset, MemmapAirfoilDataset, NoiseGenerator, TensorLoader
+from utils.shape_plot import plot_samples, plot_comparision, plot_epoch
+from utils.plot_worker import PlotWorker
+from utils.sampling import build_gen_func
 from torchvision.transforms import Normalize
 from utils.metrics import ci_cons, ci_mll, ci_rsmth, ci_rdiv, ci_mmd
 
@@ -45,24 +47,38 @@ if __name__ == '__main__':
     os.makedirs(save_dir, exist_ok=True)
     os.makedirs(os.path.join(save_dir, 'runs'), exist_ok=True)
 
-    airfoils_opt = np.load('../data/airfoils_opt_995.npy').astype(np.float32)
-    inp_paras = np.load('../data/inp_paras_995.npy').astype(np.float32)
-    aoas_opt = np.load('../data/aoas_opt_995.npy').astype(np.float32).reshape(-1, 1)
-    mean_std = (inp_paras.mean(0), inp_paras.std(0))
+    lazy_data = False # memory-map the .npy files instead of loading them, for corpora larger than memory
+
+    if lazy_data:
+        memmap_dataset = MemmapAirfoilDataset(
+            '../data/inp_paras_995.npy', '../data/airfoils_opt_995.npy', '../data/aoas_opt_995.npy', device=device
+            )
+        airfoils_opt, inp_paras = memmap_dataset.airfoils, memmap_dataset.inp_paras
+        aoas_opt = memmap_dataset.aoas_opt.reshape(-1, 1)
+        mean_std = memmap_dataset.inp_mean_std
+    else:
+        airfoils_opt = np.load('../data/airfoils_opt_995.npy').astype(np.float32)
+        inp_paras = np.load('../data/inp_paras_995.npy').astype(np.float32)
+        aoas_opt = np.load('../data/aoas_opt_995.npy').astype(np.float32).reshape(-1, 1)
+        mean_std = (inp_paras.mean(0), inp_paras.std(0))
 
     save_iter_list = list(np.linspace(1, epochs/save_intvl, dtype=int) * save_intvl - 1)
     
     time = datetime.now().strftime('%b%d_%H-%M-%S')
     for fold, (train_index, test_index) in enumerate(kf.split(aoas_opt)):
-        airfoils_train, airfoils_test = airfoils_opt[train_index], airfoils_opt[test_index]
-        inp_paras_train, inp_paras_test = inp_paras[train_index], inp_paras[test_index]
-        aoas_opt_train, aoas_opt_test = aoas_opt[train_index], aoas_opt[test_index]
         # build entropic gan on the device specified
         cbgan = assemble_new_gan(dis_cfg, gen_cfg, cbgan_cfg, device=device)
 
         # build dataloader and noise generator on the device specified
-        dataset = AirfoilDataset(inp_paras_train, airfoils_train, aoas_opt_train, inp_mean_std=mean_std, device=device)
-        dataloader = DataLoader(dataset, batch_size=batch, shuffle=True, drop_last=True)
+        if lazy_data: # only the rows of each batch are read from disk
+            dataloader = DataLoader(
+                Subset(memmap_dataset, train_index), batch_size=batch, shuffle=True, drop_last=True, collate_fn=memmap_dataset.collate_fn
+                )
+        else:
+            dataset = AirfoilDataset(
+                inp_paras[train_index], airfoils_opt[train_index], aoas_opt[train_index], inp_mean_std=mean_std, device=device
+                )
+            dataloader = TensorLoader(dataset, batch_size=batch, shuffle=True, drop_last=True)
         noise_gen = NoiseGenerator(batch, sizes=cz, noise_type=noise_type, device=device) # all Gaussian noise
 
         # build tensorboard summary writer
@@ -70,64 +86,39 @@ if __name__ == '__main__':
         os.makedirs(os.path.join(tb_dir, 'images'), exist_ok=True)
         writer = SummaryWriter(tb_dir)
         
-        def epoch_plot(epoch, batch, fake, *args, **kwargs):
-            if (epoch + 1) % 50 == 0:
-                num = min(36, len(fake[0]))
-                airfoils, aoas_opt, _ = batch
-                airfoils = airfoils.cpu().detach().numpy().transpose([0, 2, 1])[:num]
-                aoas_opt = aoas_opt.cpu().detach().numpy().squeeze()[:num]
-                pred_airfoils = fake[0].cpu().detach().numpy().transpose([0, 2, 1])[:num]
-                pred_aoas = fake[1].cpu().detach().numpy().squeeze()[:num]
-                # plot_samples(
-                #     None, fake_airfoils, annotate=pred_aoas, scale=1.0, scatter=False, symm_axis=None, lw=1.2, alpha=.7, c='k', 
-                #     fname=os.path.join(tb_dir, 'images', 'epoch {}'.format(epoch+1))
-                #     )
-                plot_comparision(
-                    None, airfoils, [pred_airfoils], aoas_opt, pred_aoas, scale=1.0, scatter=False, symm_axis=None, 
-                    fname=os.path.join(tb_dir, 'images', 'epoch {}'.format(epoch+1))
-                    )
-
-        cbgan.train(
-            epochs=epochs,
-            num_iter_D=1, 
-            num_iter_G=1,
-            dataloader=dataloader, 
-            noise_gen=noise_gen, 
-            tb_writer=writer,
-            report_interval=1,
-            save_dir=save_dir,
-            save_iter_list=save_iter_list,
-            plotting=epoch_plot
-            )
+        with PlotWorker(plot_epoch, interval=50, img_dir=os.path.join(tb_dir, 'images')) as plotter:
+            cbgan.train(
+                epochs=epochs,
+                num_iter_D=1, 
+                num_iter_G=1,
+                dataloader=dataloader, 
+                noise_gen=noise_gen, 
+                tb_writer=writer,
+                report_interval=1,
+                save_dir=save_dir,
+                save_iter_list=save_iter_list,
+                plotting=plotter
+                )
 
 
         # test on validation set
-        def build_gen_func(inp_paras):
-            def gen_func(N=1): # [ao, ip] tuple
-                tuples = []
-                cbgan.generator.eval()
-                for i in range(N):
-                    noise = NoiseGenerator(len(inp_paras), cz, noise_type, device=device)()
-                    pred = cbgan.generator(noise, torch.tensor(inp_paras, device=device, dtype=torch.float))[0]
-                    af_pred = pred[0].cpu().detach().numpy().transpose([0, 2, 1]).reshape(len(pred[0]), -1)
-                    ao_pred = pred[1].cpu().detach().numpy()
-                    tuples.append(np.hstack([af_pred, ao_pred, inp_paras]))
-                return np.concatenate(tuples)
-            return gen_func
-        
         n_run = 10
 
+        airfoils_train, airfoils_test = airfoils_opt[train_index], airfoils_opt[test_index]
+        inp_paras_train, inp_paras_test = inp_paras[train_index], inp_paras[test_index]
+        aoas_opt_train, aoas_opt_test = aoas_opt[train_index], aoas_opt[test_index]
+
         inp_paras_train = (inp_paras_train - mean_std[0]) / mean_std[1]
         inp_paras_test = (inp_paras_test - mean_std[0]) / mean_std[1]
 
         X_train = np.hstack([airfoils_train.reshape(airfoils_train.shape[0], -1), aoas_opt_train, inp_paras_train])
         X_test = np.hstack([airfoils_test.reshape(airfoils_test.shape[0], -1), aoas_opt_test, inp_paras_test])
-        train_mean, train_std = ci_mmd(n_run, build_gen_func(inp_paras_train), X_train)
-        test_mean, test_std = ci_mmd(n_run, build_gen_func(inp_paras_test), X_test)
+        train_mean, train_std = ci_mmd(n_run, build_gen_func(cbgan.generator, inp_paras_train, cz, noise_type, device), X_train)
+        test_mean, test_std = ci_mmd(n_run, build_gen_func(cbgan.generator, inp_paras_test, cz, noise_type, device), X_test)
 
         with open(os.path.join(tb_dir, 'MMD_log.txt'), 'w') as f:
             f.write("MMD Train: {} ± {}".format(train_mean, train_std) + '\n')
             f.write("MMD Test: {} ± {}".format(test_mean, test_std) + '\n')
 
-        # print("MMD Train: {} ± {}".format(*ci_mmd(n_run, build_gen_func(inp_paras_train), X_train)))
-        # print("MMD Test: {} ± {}".format(*ci_mmd(n_run, build_gen_func(inp_paras_test), X_test)))
+        # print("MMD Train: {} ± {}".format(*ci_mmd(n_run, build_gen_func(cbgan.generator, inp_paras_train, cz, noise_type, device), X_train)))
+        # print("MMD Test: {} ± {}".format(*ci_mmd(n_run, build_gen_func(cbgan.generator, inp_paras_test, cz, noise_type, device), X_test)))
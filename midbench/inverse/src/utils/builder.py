@@ -0,0 +1,119 @@
+"""
+Incremental construction of training datasets from the results of the airfoil environment.
+"""
+import numpy as np
+from midbench.data import DataBase, DataEntry
+from .interpolation import interpolate
+
+
+def order_contour(points):
+    r"""Order the surface points of an airfoil along its contour.
+
+    The points of ``surface_flow.csv`` follow the mesh numbering. They are chained into the
+    shortest closed contour whose upper and lower surfaces both run monotonically in x from
+    the leading edge (a bitonic tour), which, unlike nearest neighbors, never jumps between
+    the surfaces near a sharp trailing edge. The contour is then oriented by its signed area
+    so that it runs from the trailing edge over the upper surface, as in the UIUC coordinate
+    files.
+
+    Args:
+        points: The surface points of shape `(M, 2)`, `M >= 3`.
+
+    Returns:
+        The ordered points of shape `(M, 2)`.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    n = len(points)
+    idx = np.lexsort((points[:, 1], points[:, 0])) # by x, the upper trailing edge last if it is open
+    dist = np.linalg.norm(points[idx, None] - points[None, idx], axis=-1)
+    # cost[i, j], i < j: the shortest two x-monotone paths from the first point to i and j through all points up to j
+    cost = np.full((n, n), np.inf)
+    prev = np.zeros((n, n), dtype=np.int64) # the point before j on its path
+    cost[0, 1] = dist[0, 1]
+    for j in range(2, n):
+        # j follows j - 1 on its path
+        cost[:j - 1, j] = cost[:j - 1, j - 1] + dist[j - 1, j]
+        prev[:j - 1, j] = j - 1
+        # or j - 1 ends the other path and j follows one of the points before
+        k = np.argmin(cost[:j - 1, j - 1] + dist[:j - 1, j])
+        cost[j - 1, j] = cost[k, j - 1] + dist[k, j]
+        prev[j - 1, j] = k
+    # the edges of the closed contour
+    neighbors = [[] for _ in range(n)]
+    edges = [(n - 2, n - 1), (0, 1)]
+    i, j = n - 2, n - 1
+    while j > 1:
+        k = prev[i, j]
+        edges.append((k, j))
+        i, j = min(i, k), max(i, k)
+    for a, b in edges:
+        neighbors[a].append(b); neighbors[b].append(a)
+    order = [n - 1, neighbors[n - 1][0]]
+    while len(order) < n:
+        a, b = neighbors[order[-1]]
+        order.append(b if a == order[-2] else a)
+    # counterclockwise, i.e., over the upper surface first, from the trailing edge
+    order = idx[order]
+    x, y = points[order].T
+    if np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y) < 0:
+        order = np.r_[order[:1], order[:0:-1]]
+    return points[order]
+
+class DatasetBuilder:
+    r"""Append the designs optimized by the airfoil environment to an on-disk dataset.
+
+    Each result is ordered along the contour, resampled to the model resolution with
+    ``interpolate`` and appended to a ``midbench.data.DataBase`` with the columns
+    ``designs.airfoil`` `(N, 2)`, ``designs.aoa``, ``conditions.{mach, reynolds, lift}``
+    and the given performances. Each row is committed as soon as it is added, so
+    ``DataBaseAirfoilDataset`` picks it up while the dataset is still growing.
+
+    Args:
+        path: The directory of the database.
+        N: Number of data points of the resampled airfoils.
+        k: Degree of spline.
+        D: Shifting constant. The higher the more uniform the data points are.
+        chunk_rows: The number of rows per chunk of a new database.
+    """
+    def __init__(self, path, N=192, k=3, D=20, chunk_rows=4096):
+        self.database = DataBase(path, chunk_rows=chunk_rows)
+        self.N = N; self.k = k; self.D = D
+
+    def resample(self, airfoil):
+        r"""Resample the airfoil coordinates `(2, M)`, e.g., ``airfoil_opt`` of ``Env.optimize``, to `(N, 2)`.
+        """
+        points = order_contour(np.asarray(airfoil, dtype=np.float64).T)
+        keep = np.r_[True, np.any(np.diff(points, axis=0) != 0, axis=1)] # splprep fails on repeated points
+        return interpolate(points[keep].T, self.N, self.k, self.D).T
+
+    def add(self, conditions, airfoil, aoa=None, performances=None):
+        r"""Append one result.
+
+        Args:
+            conditions: The ``Airfoil2dCondition`` of the run.
+            airfoil: The optimized airfoil coordinates `(2, M)`.
+            aoa: The angle of attack, defaults to ``conditions.aoa``.
+            performances: The named performances, e.g., ``{'cd': cd, 'ld': ld}``.
+        """
+        entry = DataEntry.from_record(
+            designs={'airfoil': self.resample(airfoil).astype(np.float32),
+                     'aoa': np.float32(conditions.aoa if aoa is None else aoa)},
+            conditions={name: np.float64(getattr(conditions, name)) for name in ('mach', 'reynolds', 'lift')},
+            performances={name: np.float64(value) for name, value in (performances or {}).items()}
+            )
+        self.database.append(entry)
+
+    def consume(self, results):
+        r"""Append a stream of results, e.g., a generator yielding them as the optimizations complete.
+
+        Args:
+            results: An iterable of ``(conditions, (cd, ld, airfoil_opt, aoa_opt))`` pairs, the outputs 
+                of ``Env.optimize`` with the objectives ``['drag', 'ld_ratio', 'airfoil_opt', 'aoa_opt']``.
+                The final AoA is stored rather than ``conditions.aoa``, which SU2 changes in fixed-CL mode.
+
+        Returns:
+            The number of rows of the dataset.
+        """
+        for conditions, (cd, ld, airfoil_opt, aoa_opt) in results:
+            self.add(conditions, airfoil_opt, aoa=aoa_opt, performances={'cd': cd, 'ld': ld})
+        return len(self.database)
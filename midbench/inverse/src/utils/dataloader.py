@@ -1,8 +1,9 @@
+import os
 import numpy as np
 import torch
 import math
 from torch.utils.data import DataLoader, Dataset
-from .interpolation import interpolate
+from .interpolation import interpolate_batch
 
 class AirfoilDataset(Dataset):
     r"""UIUC Airfoil Dataset. 
@@ -12,13 +13,17 @@ class AirfoilDataset(Dataset):
         N: Number of data points.
         k: Degree of spline.
         D: Shifting constant. The higher the more uniform the data points are.
+        cache_dir: Directory caching the resampled airfoils across runs, see ``interpolate_batch``.
+        n_jobs: Number of processes resampling the airfoils.
     Shape:
         Output: `(N, D, DP)` where D is the dimension of each point and DP is the number of data points.
     """
 
-    def __init__(self, inp_paras, airfoils_opt, aoas_opt, inp_mean_std=(0, 1), N=192, k=3, D=20, device='cpu'):
+    def __init__(self, inp_paras, airfoils_opt, aoas_opt, inp_mean_std=(0, 1), N=192, k=3, D=20, device='cpu', cache_dir=None, n_jobs=None):
         super().__init__()
         self.device = device
+        self.cache_dir = cache_dir
+        self.n_jobs = n_jobs
         self.inp_paras = torch.tensor(
             inp_paras, device=device, dtype=torch.float
         )
@@ -31,6 +36,7 @@ class AirfoilDataset(Dataset):
         ).reshape(-1, 1)
         self.inp_mean = torch.tensor(inp_mean_std[0], dtype=torch.float, device=device)
         self.inp_std = torch.tensor(inp_mean_std[1], dtype=torch.float, device=device)
+        self.inp_paras_normalized = (self.inp_paras - self.inp_mean) / self.inp_std
         if (N, k, D) == (192, 3, 20):
             self.N = N; self.k = k; self.D = D
         else:
@@ -38,13 +44,14 @@ class AirfoilDataset(Dataset):
 
     def refresh(self, N, k, D):
         self.N = N; self.k = k; self.D = D
-        self.airfoils = torch.tensor(
-            [interpolate(airfoil, N, k, D) for airfoil in self.airfoils.cpu()],
-            device=self.device, dtype=torch.float
-        )
+        airfoils = interpolate_batch(
+            self.airfoils.cpu().numpy(), N, k, D, n_jobs=self.n_jobs, cache_dir=self.cache_dir
+            )
+        self.airfoils = torch.from_numpy(airfoils).to(device=self.device, dtype=torch.float)
     
     def __getitem__(self, index):
-        return self.airfoils[index], self.aoas_opt[index], (self.inp_paras[index] - self.inp_mean) / self.inp_std
+        # index may also be a tensor of indices, returning a whole batch, see TensorLoader
+        return self.airfoils[index], self.aoas_opt[index], self.inp_paras_normalized[index]
     
     def __len__(self):
         return len(self.airfoils)
@@ -54,22 +61,187 @@ class AirfoilDataset(Dataset):
             self.__len__(), self.N, self.k, self.D
         )
 
+class DataBaseAirfoilDataset(AirfoilDataset):
+    r"""``AirfoilDataset`` over a ``midbench.data.DataBase`` filled by ``utils.builder.DatasetBuilder``.
+
+    ``update`` appends the rows added to the database since the last call, so training can 
+    start on a partial dataset, see ``TensorLoader(update=True)``. The database may even be 
+    empty or not exist yet, in which case the dataset is empty until the first rows arrive.
+
+    Args:
+        path: The directory of the database.
+        inp_mean_std: Mean and standard deviation normalizing the input parameters.
+        device: Device of the tensors.
+    """
+
+    def __init__(self, path, inp_mean_std=(0, 1), device='cpu'):
+        self.path = path
+        self.n_rows = 0
+        self.inp_mean_std = inp_mean_std
+        super().__init__(*self._read(0), inp_mean_std=inp_mean_std, device=device)
+
+    def _read(self, start):
+        from midbench.data import DataBase
+        database = DataBase(self.path)
+        if len(database) <= start: # nothing new, the columns may not even exist yet
+            self.n_rows = len(database)
+            return np.empty((0, 3), dtype=np.float32), np.empty((0, 0, 2), dtype=np.float32), np.empty((0, 1), dtype=np.float32)
+        rows = slice(start, len(database))
+        inp_paras = np.stack([database.read('conditions.' + name, rows) for name in ('mach', 'reynolds', 'lift')], 1)
+        airfoils, aoas = database.read('designs.airfoil', rows), database.read('designs.aoa', rows)
+        self.n_rows = len(database)
+        return inp_paras.reshape(-1, 3), airfoils, aoas
+
+    def update(self):
+        r"""Load the new rows of the database and return their number.
+        """
+        start = self.n_rows
+        inp_paras, airfoils, aoas = self._read(start)
+        if len(airfoils):
+            new = AirfoilDataset(inp_paras, airfoils, aoas, self.inp_mean_std, device=self.device)
+            for name in ('inp_paras', 'inp_paras_normalized', 'airfoils', 'aoas_opt'):
+                # the placeholders of an empty dataset do not have the airfoil resolution
+                tensor = getattr(new, name) if len(self) == 0 else torch.cat([getattr(self, name), getattr(new, name)])
+                setattr(self, name, tensor)
+        return self.n_rows - start
+
+class TensorLoader:
+    r"""Data loader for datasets holding their samples as tensors, e.g., ``AirfoilDataset``.
+
+    Instead of fetching and collating the samples one by one as ``DataLoader``, 
+    the indices are shuffled once per epoch as a tensor on the dataset's device 
+    and each batch is sliced from the dataset with a single indexing.
+
+    Args:
+        dataset: The dataset, whose ``__getitem__`` accepts an index tensor.
+        batch_size: The number of samples per batch.
+        shuffle: Whether to reshuffle the samples every epoch.
+        drop_last: Whether to drop the last incomplete batch.
+        generator: An optional CPU ``torch.Generator`` for the shuffling.
+        update: Whether to call ``dataset.update()`` at the start of every epoch, 
+            picking up the rows appended meanwhile, e.g., to ``DataBaseAirfoilDataset``.
+    """
+    def __init__(self, dataset, batch_size=1, shuffle=False, drop_last=False, generator=None, update=False):
+        self.dataset = dataset
+        self.update = update
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.generator = generator
+        self.device = getattr(dataset, 'device', 'cpu')
+
+    def __iter__(self):
+        if self.update:
+            self.dataset.update()
+        n = len(self.dataset)
+        if self.shuffle:
+            if self.generator is None:
+                index = torch.randperm(n, device=self.device)
+            else:
+                index = torch.randperm(n, generator=self.generator).to(self.device)
+        else:
+            index = torch.arange(n, device=self.device)
+        for i in range(0, len(self) * self.batch_size, self.batch_size):
+            yield self.dataset[index[i:i+self.batch_size]]
+
+    def __len__(self):
+        n = len(self.dataset)
+        return n // self.batch_size if self.drop_last else -(-n // self.batch_size)
+
+def _load_mmap(source):
+    # copy-on-write mapping: no copy as with 'r', but writable as torch.from_numpy expects
+    return np.load(source, mmap_mode='c') if isinstance(source, (str, os.PathLike)) else source
+
+class MemmapAirfoilDataset(Dataset):
+    r"""Airfoil dataset lazily read from memory-mapped .npy files.
+
+    Drop-in for ``AirfoilDataset`` on corpora too large for memory. Only the rows of 
+    the requested samples are read from disk, and they are moved to ``device`` per batch. 
+    ``__getitems__`` reads a whole batch at once, so the data loader must be built with 
+    ``collate_fn=dataset.collate_fn``, e.g., 
+    ``DataLoader(dataset, batch_size=128, shuffle=True, collate_fn=dataset.collate_fn)``.
+
+    Args:
+        inp_paras: Path of the input parameters `(B, C)`, or an array, e.g., a memory map.
+        airfoils_opt: Path of the airfoils `(B, DP, 2)`, or an array.
+        aoas_opt: Path of the angles of attack `(B,)` or `(B, 1)`, or an array.
+        inp_mean_std: Mean and standard deviation normalizing the input parameters.
+            Computed from ``inp_paras`` in chunks if ``None``.
+        device: Device of the output batches.
+        chunk_size: Number of rows read at once when computing ``inp_mean_std``.
+    Shape:
+        Output: `(2, DP)` airfoils, as ``AirfoilDataset``.
+    """
+
+    def __init__(self, inp_paras, airfoils_opt, aoas_opt, inp_mean_std=None, device='cpu', chunk_size=100000):
+        super().__init__()
+        self.device = device
+        self.inp_paras = _load_mmap(inp_paras)
+        self.airfoils = _load_mmap(airfoils_opt)
+        self.aoas_opt = _load_mmap(aoas_opt)
+        if not len(self.inp_paras) == len(self.airfoils) == len(self.aoas_opt):
+            raise ValueError('The input parameters, airfoils and AoAs differ in length: {}, {}, {}.'.format(
+                len(self.inp_paras), len(self.airfoils), len(self.aoas_opt)))
+        if inp_mean_std is None:
+            inp_mean_std = self._mean_std(chunk_size)
+        self.inp_mean_std = inp_mean_std
+        self.inp_mean = torch.tensor(inp_mean_std[0], dtype=torch.float, device=device)
+        self.inp_std = torch.tensor(inp_mean_std[1], dtype=torch.float, device=device)
+        self.N = self.airfoils.shape[1]
+
+    def _mean_std(self, chunk_size):
+        n, s1, s2 = len(self.inp_paras), 0., 0.
+        for i in range(0, n, chunk_size):
+            chunk = np.asarray(self.inp_paras[i:i+chunk_size], dtype=np.float64)
+            s1 = s1 + chunk.sum(0)
+            s2 = s2 + (chunk**2).sum(0)
+        mean = s1 / n
+        return mean, np.sqrt(np.maximum(s2 / n - mean**2, 0))
+
+    def _batch(self, airfoils, aoas, inp_paras):
+        # the memory-mapped rows are wrapped without copy, the only copy is to device and float32 if needed
+        airfoils = torch.from_numpy(np.asarray(airfoils)).to(device=self.device, dtype=torch.float).transpose(-1, -2)
+        aoas = torch.from_numpy(np.asarray(aoas)).to(device=self.device, dtype=torch.float).reshape(*airfoils.shape[:-2], 1)
+        inp_paras = torch.from_numpy(np.asarray(inp_paras)).to(device=self.device, dtype=torch.float)
+        return airfoils, aoas, (inp_paras - self.inp_mean) / self.inp_std
+
+    def __getitem__(self, index):
+        return self._batch(self.airfoils[index], self.aoas_opt[index], self.inp_paras[index])
+
+    def __getitems__(self, indices):
+        # read the rows in file order, then restore the requested order
+        rows, inverse = np.unique(np.asarray(indices), return_inverse=True)
+        batch = self._batch(self.airfoils[rows], self.aoas_opt[rows], self.inp_paras[rows])
+        inverse = torch.from_numpy(inverse).to(self.device)
+        return tuple(each[inverse] for each in batch)
+
+    @staticmethod
+    def collate_fn(batch):
+        return batch
+
+    def __len__(self):
+        return len(self.airfoils)
+
+    def __str__(self):
+        return '<Memory-mapped Invert Airfoil Dataset (size={}, resolution={})>'.format(self.__len__(), self.N)
+
 class NoiseGenerator:
-    def __init__(self, batch: int, sizes: list=[4, 10], noise_type: list=['u', 'n'], output_prob: bool=False, device='cpu'):
+    def __init__(self, batch: int, sizes: list=[4, 10], noise_type: list=['u', 'n'], output_prob: bool=False, device='cpu', generator=None):
         super().__init__()
         self.batch = batch
         self.sizes = sizes
         self.noise_type = noise_type
         self.output_prob = output_prob
         self.device = device
+        self.generator = generator # optional torch.Generator for reproducible noise streams
         
     def __call__(self):
         noises = []
         for size, n_type in zip(self.sizes, self.noise_type):
             if n_type == 'u':
-                noises.append(torch.rand(self.batch, size))
+                noises.append(torch.rand(self.batch, size, generator=self.generator))
             elif n_type == 'n':
-                noises.append(torch.randn(self.batch, size))
+                noises.append(torch.randn(self.batch, size, generator=self.generator))
         if self.output_prob:
             return torch.cat(noises, dim=1).to(self.device), self._cal_prob(noises).to(self.device)
         else:
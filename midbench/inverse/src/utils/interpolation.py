@@ -15,7 +15,11 @@ n+1 : number of control points
 m+1 : number of data points
 """
 
+import os
+import hashlib
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from scipy.interpolate import splev, splprep, interp1d
 from scipy.integrate import cumtrapz
 
@@ -41,4 +45,44 @@ def interpolate(Q, N, k, D=20, resolution=1000):
     u_new = fcv(cv_int_samples)
     x_new, y_new = splev(u_new, tck, der=0)
     xy_new = np.vstack((x_new, y_new))
-    return xy_new
\ No newline at end of file
+    return xy_new
+
+def _cache_path(Q, N, k, D, resolution, cache_dir):
+    digest = hashlib.sha1(np.ascontiguousarray(Q).tobytes())
+    digest.update(repr((Q.shape, Q.dtype.str, N, k, D, resolution)).encode())
+    return os.path.join(cache_dir, 'interp_{}.npy'.format(digest.hexdigest()))
+
+def interpolate_batch(Q, N, k, D=20, resolution=1000, n_jobs=None, cache_dir=None):
+    r"""Apply ``interpolate`` to every shape in a process pool, with an optional disk cache.
+
+    Args:
+        Q: The shapes of shape `(B, 2, M)`.
+        N, k, D, resolution: See ``interpolate``.
+        n_jobs: The number of processes, defaults to the number of CPUs. 1 runs serially.
+        cache_dir: The directory of the cached results, keyed by the hash of Q and
+            the parameters. ``None`` disables the cache.
+
+    Returns:
+        The interpolated shapes of shape `(B, 2, N)`.
+    """
+    Q = np.asarray(Q)
+    if cache_dir is not None:
+        path = _cache_path(Q, N, k, D, resolution, cache_dir)
+        if os.path.exists(path):
+            return np.load(path)
+
+    func = partial(interpolate, N=N, k=k, D=D, resolution=resolution)
+    if n_jobs == 1:
+        xy_new = np.stack([func(q) for q in Q])
+    else:
+        n_jobs = n_jobs or os.cpu_count()
+        with ProcessPoolExecutor(n_jobs) as executor:
+            xy_new = np.stack(list(executor.map(func, Q, chunksize=max(1, len(Q) // (4 * n_jobs)))))
+
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = '{}.{}.tmp.npy'.format(path[:-4], os.getpid())
+        np.save(tmp, xy_new)
+        os.replace(tmp, path) # concurrent runs never see a partial file
+    return xy_new
+
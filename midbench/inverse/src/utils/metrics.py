@@ -1,7 +1,13 @@
 """
 Author(s): Wei Chen (wchen459@umd.edu)
 """
+import os
+import sys
+import inspect
+import functools
 import numpy as np
+from itertools import repeat
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from sklearn.metrics import pairwise_distances
 from sklearn.model_selection import GridSearchCV
 from sklearn.neighbors import KernelDensity
@@ -10,6 +16,10 @@ from sklearn.neighbors import KernelDensity
 ########## utils #########
 ##########################
 
+def _iter_chunks(X, chunk_size):
+    for i in range(0, X.shape[0], chunk_size):
+        yield np.asarray(X[i:i+chunk_size], dtype=np.float64)
+
 def mean_err(metric_list):
     n = len(metric_list)
     mean = np.mean(metric_list)
@@ -17,6 +27,110 @@ def mean_err(metric_list):
     err = 1.96*std/n**.5 # standard error, 1.96 is the approximate value of the 97.5 percentile point of the normal distribution
     return mean, err
 
+_CI_OPTIONS = ('executor', 'max_workers', 'seed', 'target_err', 'min_n')
+
+def _pop_ci_options(kwargs):
+    # the run_ci options passed to a ci_* function as ci_executor, ci_seed, etc.
+    return {name: kwargs.pop('ci_' + name) for name in _CI_OPTIONS if 'ci_' + name in kwargs}
+
+def _split_ci_options(kwargs):
+    # the ci_* options of a confidence_interval metric, and the other keyword arguments
+    kwargs = dict(kwargs)
+    return {'ci_' + name: value for name, value in _pop_ci_options(kwargs).items()}, kwargs
+
+def _accepts_rng(func):
+    try:
+        return 'rng' in inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return False
+
+def _seeded_call(metric, seed, args, kwargs):
+    # one repetition on its own seed stream
+    if seed is not None:
+        if _accepts_rng(metric):
+            kwargs = dict(kwargs, rng=np.random.default_rng(seed))
+        state = int(seed.generate_state(1)[0])
+        np.random.seed(state)
+        if 'torch' in sys.modules: # the noise of the generators
+            sys.modules['torch'].manual_seed(state)
+    return metric(*args, **kwargs)
+
+def run_ci(n, metric, args=(), kwargs=None, executor=None, max_workers=None, seed=None, target_err=None, min_n=2):
+    r"""Run up to n repetitions of a non-deterministic metric.
+
+    Args:
+        n: The maximum number of repetitions.
+        metric: The metric, called as ``metric(*args, **kwargs)``. It returns the score, 
+            or a tuple whose first element is the score.
+        executor: ``None`` (sequential), ``'thread'`` or ``'process'``. Threads suit metrics 
+            dominated by NumPy or torch calls, which release the GIL. Processes require 
+            ``metric`` and the arguments to be picklable, e.g., not closures.
+        max_workers: The number of workers, defaults to the number of CPUs.
+        seed: The seed the per-repetition seed streams are spawned from. The streams are passed 
+            as ``rng`` to metrics accepting it and seed the global NumPy and torch states otherwise,
+            which is not reproducible with threads, since those share the global states.
+        target_err: Stop as soon as the CI half-width of ``mean_err`` falls below it.
+        min_n: The minimum number of repetitions before stopping early.
+
+    Returns:
+        The array of the repetition results, of length at most n. Repetition i always draws 
+        from the i-th seed stream. With ``target_err``, the repetitions run in waves of 
+        ``max_workers`` and the stopping rule is checked after each wave.
+    """
+    kwargs = kwargs or {}
+    seeds = np.random.SeedSequence(seed).spawn(n) if seed is not None else [None] * n
+    if executor is None:
+        pool, wave = None, 1
+    elif executor in ('thread', 'process'):
+        pool = (ThreadPoolExecutor if executor == 'thread' else ProcessPoolExecutor)(max_workers)
+        wave = max_workers or os.cpu_count()
+    else:
+        raise ValueError('Unknown executor: {}'.format(executor))
+
+    results = []
+    try:
+        while len(results) < n:
+            size = n - len(results) if target_err is None else max(wave, min_n - len(results))
+            batch = seeds[len(results):len(results)+size]
+            if pool is None:
+                results += [_seeded_call(metric, each, args, kwargs) for each in batch]
+            else:
+                results += list(pool.map(_seeded_call, repeat(metric), batch, repeat(args), repeat(kwargs)))
+            if target_err is not None and len(results) >= min_n:
+                scores = np.array(results).reshape((len(results), -1))[:, 0]
+                if mean_err(scores)[1] <= target_err:
+                    break
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return np.array(results)
+
+def confidence_interval(metric=None, aggregate=mean_err, **options):
+    r"""Decorator turning a non-deterministic metric into one evaluating its confidence interval.
+
+    The decorated function takes the number of repetitions ``ci_n`` as its first positional 
+    argument, followed by the arguments of ``metric``, and returns ``aggregate`` of the array of
+    repetition results, ``mean_err`` by default. The options of ``run_ci`` can be fixed by the 
+    decorator, ``@confidence_interval(executor='thread')``, or passed per call with a ``ci_`` 
+    prefix, e.g., ``ci_seed=0`` or ``ci_target_err=1e-3``. All the ``ci_*`` metrics are built on it.
+    With ``ci_executor='process'``, ``metric`` must be picklable, i.e., defined at module level
+    under its own name rather than decorated in place.
+    """
+    if metric is None:
+        return functools.partial(confidence_interval, aggregate=aggregate, **options)
+
+    @functools.wraps(metric)
+    def ci_metric(ci_n, *args, **kwargs):
+        ci_options = dict(options, **_pop_ci_options(kwargs))
+        return aggregate(run_ci(ci_n, metric, args, kwargs, **ci_options))
+    return ci_metric
+
+def _evaluate(evaluator, gen_func, *gen_args):
+    return evaluator(gen_func(*gen_args))
+
+# the repetitions of the ci_* metrics sharing an evaluator, e.g., a precomputed test-set term
+_ci_evaluate = confidence_interval(_evaluate)
+
 def optimize_kde(X):
     # use grid search cross-validation to optimize the bandwidth
     params = {'bandwidth': np.logspace(-3, 1, 20)}
@@ -41,23 +155,182 @@ def gaussian_kernel(X, Y, sigma=1.0):
     s = beta * dist.flatten()
     return np.exp(-s)
 
-def maximum_mean_discrepancy(gen_func, X_test):
+def _as_backend(X, backend, device=None):
+    if backend == 'numpy':
+        return np.asarray(X, dtype=np.float64)
+    elif backend == 'torch':
+        import torch
+        return torch.as_tensor(np.asarray(X), dtype=torch.float64, device=device)
+    raise ValueError('Unknown backend: {}'.format(backend))
+
+def _kernel_block(X, Y, XX, YY, beta, zero_diag, backend):
+    # exp(-beta * ||x - y||) with the distances expanded as |x|^2 + |y|^2 - 2<x, y> for BLAS
+    if backend == 'numpy':
+        d2 = XX[:, None] + YY[None, :] - 2 * X @ Y.T
+        dist = np.sqrt(np.maximum(d2, 0, out=d2), out=d2)
+        if zero_diag: np.fill_diagonal(dist, 0)
+        return np.exp(-beta * dist, out=dist).sum()
+    else:
+        dist = (XX[:, None] + YY[None, :] - 2 * X @ Y.T).clamp_(min=0).sqrt_()
+        if zero_diag: dist.fill_diagonal_(0)
+        return dist.mul_(-beta).exp_().sum().item()
+
+def kernel_sum(X, Y=None, sigma=1.0, block_size=2048, backend='numpy', device=None):
+    r"""Sum of the kernel values of ``gaussian_kernel(X, Y)`` over all pairs, 
+    accumulated block by block so that at most ``block_size`` x ``block_size`` 
+    values are held in memory. Only half of the blocks are computed when ``Y`` is None (Y = X).
+
+    Args:
+        X: Samples of shape `(N, D)`.
+        Y: Samples of shape `(M, D)`, or None for Y = X.
+        sigma: The kernel bandwidth.
+        block_size: The number of rows of each tile.
+        backend: ``'numpy'`` (multithreaded through BLAS) or ``'torch'`` (CPU or GPU).
+        device: The torch device.
+    """
+    beta = 1. / (2. * sigma**2)
+    sym = Y is None
+    Y = X if sym else Y
+    total = 0.
+    for i in range(0, len(X), block_size):
+        X_i = _as_backend(X[i:i+block_size], backend, device)
+        XX_i = (X_i * X_i).sum(1)
+        for j in range(i if sym else 0, len(Y), block_size):
+            Y_j = X_i if sym and i == j else _as_backend(Y[j:j+block_size], backend, device)
+            YY_j = XX_i if sym and i == j else (Y_j * Y_j).sum(1)
+            block = _kernel_block(X_i, Y_j, XX_i, YY_j, beta, sym and i == j, backend)
+            total += block if not sym or i == j else 2 * block # symmetric blocks count twice
+    return float(total)
+
+def _linear_mmd2(X, Y, sigma):
+    # linear-time estimator over disjoint pairs of samples
+    beta = 1. / (2. * sigma**2)
+    n = min(len(X), len(Y)) // 2 * 2
+    k = lambda A, B: np.exp(-beta * np.linalg.norm(np.asarray(A, float) - np.asarray(B, float), axis=1))
+    x1, x2, y1, y2 = X[:n:2], X[1:n:2], Y[:n:2], Y[1:n:2]
+    return np.mean(k(x1, x2) + k(y1, y2) - k(x1, y2) - k(x2, y1))
+
+class RandomFourierFeatures:
+    r"""Random Fourier features of the kernel exp(-beta * ||x - y||) of ``gaussian_kernel``.
+
+    The spectral density of this kernel is the multivariate Cauchy distribution, so the 
+    frequencies are sampled as ``beta * z / |g|`` with standard normal `z` and `g`, and 
+    ``features(x) @ features(y)`` is an unbiased estimate of the kernel.
+
+    Args:
+        dim: The dimension of the inputs.
+        n_features: The number of features D.
+        sigma: The kernel bandwidth.
+        seed: The seed of the frequencies and phases.
+    """
+    def __init__(self, dim, n_features=2048, sigma=1.0, seed=None):
+        rng = np.random.default_rng(seed)
+        beta = 1. / (2. * sigma**2)
+        self.W = beta * rng.standard_normal((dim, n_features)) / np.abs(rng.standard_normal(n_features))
+        self.b = rng.uniform(0, 2 * np.pi, n_features)
+        self.n_features = n_features
+
+    def __call__(self, X):
+        return np.sqrt(2. / self.n_features) * np.cos(np.asarray(X, dtype=np.float64) @ self.W + self.b)
+
+    def mean_embedding(self, X, block_size=2048):
+        r"""The mean of the features over the samples X `(N, dim)`, computed in row blocks.
+        """
+        total = np.zeros(self.n_features)
+        for i in range(0, len(X), block_size):
+            total += self(X[i:i+block_size]).sum(0)
+        return total / len(X)
+
+def _rff_mmd(mu_X, mu_Y, n_blocks):
+    # the squared distance of the mean embeddings sums over feature blocks, each of which 
+    # (times n_blocks) is an independent estimate of the squared MMD
+    parts = n_blocks * np.array([np.sum(d**2) for d in np.array_split(mu_X - mu_Y, n_blocks)])
+    mmd2, err2 = parts.mean(), 1.96 * parts.std(ddof=1) / n_blocks**.5
+    value = np.sqrt(max(mmd2, 0))
+    err = max(np.sqrt(max(mmd2 + err2, 0)) - value, value - np.sqrt(max(mmd2 - err2, 0)))
+    return value, err
+
+class MMDEvaluator:
+    r"""Maximum mean discrepancy against a fixed reference set.
+
+    The reference-set statistics (the kernel self-term, or the mean feature embedding 
+    for ``'rff'``) are computed once at construction, so each evaluation only costs 
+    the terms involving the generated samples.
+
+    Args:
+        X_ref: The reference samples of shape `(M, ...)`.
+        sigma: The kernel bandwidth.
+        estimator: ``'biased'`` (V-statistic, the original benchmark number), 
+            ``'unbiased'`` (U-statistic), ``'linear'`` (linear-time, on disjoint pairs) 
+            or ``'rff'`` (linear-time approximation of ``'biased'`` with random Fourier features).
+        block_size, backend, device: See ``kernel_sum``. The ``'rff'`` estimator always runs on NumPy.
+        n_features: The number of random Fourier features of ``'rff'``.
+        seed: The seed of the random Fourier features.
+        n_blocks: The number of feature blocks the approximation error of ``'rff'`` is estimated from.
+    """
+    def __init__(
+        self, X_ref, sigma=1.0, estimator='biased', block_size=2048, backend='numpy', device=None,
+        n_features=2048, seed=None, n_blocks=16
+        ):
+        if estimator not in ('biased', 'unbiased', 'linear', 'rff'):
+            raise ValueError('Unknown estimator: {}'.format(estimator))
+        self.X_ref = X_ref.reshape((X_ref.shape[0], -1))
+        self.sigma = sigma
+        self.estimator = estimator
+        self.kwargs = dict(sigma=sigma, block_size=block_size, backend=backend, device=device)
+        self.k_ref = kernel_sum(self.X_ref, **self.kwargs) if estimator in ('biased', 'unbiased') else None
+        if estimator == 'rff':
+            self.features = RandomFourierFeatures(self.X_ref.shape[1], n_features, sigma, seed)
+            self.mu_ref = self.features.mean_embedding(self.X_ref, block_size)
+            self.n_blocks = n_blocks
+
+    def __call__(self, X_gen):
+        return self.evaluate(X_gen)[0]
+
+    def evaluate(self, X_gen):
+        r"""Returns the MMD and its approximation error, which is the 95% confidence 
+        half-width for ``'rff'`` and 0 for the exact estimators.
+        """
+        X = X_gen.reshape((X_gen.shape[0], -1))
+        if self.estimator == 'rff':
+            return _rff_mmd(self.features.mean_embedding(X, self.kwargs['block_size']), self.mu_ref, self.n_blocks)
+        if self.estimator == 'linear':
+            return np.sqrt(max(_linear_mmd2(X, self.X_ref, self.sigma), 0)), 0.
+        return self.from_sums(kernel_sum(X, **self.kwargs), kernel_sum(X, self.X_ref, **self.kwargs), len(X)), 0.
+
+    def from_sums(self, k_xx, k_xy, n):
+        r"""The exact MMD from the kernel sums over the n generated samples (``k_xx``) 
+        and between them and the reference samples (``k_xy``).
+        """
+        m, k_yy = len(self.X_ref), self.k_ref
+        if self.estimator == 'biased':
+            return np.sqrt(k_xx / n**2 - 2 * k_xy / (n * m) + k_yy / m**2)
+        else: # the diagonals are exactly 1
+            return np.sqrt(max((k_xx - n) / (n * (n-1)) - 2 * k_xy / (n * m) + (k_yy - m) / (m * (m-1)), 0))
+
+def mmd(X, Y, **kwargs):
+    r"""Maximum mean discrepancy between the samples X `(N, ...)` and Y `(M, ...)`. 
+    See ``MMDEvaluator`` for the keyword arguments.
+    """
+    return MMDEvaluator(Y, **kwargs)(X)
+
+def maximum_mean_discrepancy(gen_func, X_test, **kwargs):
     
     X_gen = gen_func() #gen_func randomly generate samples.
-    X_gen = X_gen.reshape((X_gen.shape[0], -1))
-    X_test = X_test.reshape((X_test.shape[0], -1))
-      
-    mmd = np.mean(gaussian_kernel(X_gen, X_gen)) - \
-            2 * np.mean(gaussian_kernel(X_gen, X_test)) + \
-            np.mean(gaussian_kernel(X_test, X_test))
-            
-    return np.sqrt(mmd)
+    return mmd(X_gen, X_test, **kwargs)
     
-def ci_mmd(n, gen_func, X_test):
-    mmds = np.zeros(n)
-    for i in range(n):
-        mmds[i] = maximum_mean_discrepancy(gen_func, np.squeeze(X_test))
-    return mean_err(mmds)
+def _mmd_mean_err(results):
+    mmds, errs = results.T
+    mean, err = mean_err(mmds)
+    # the features are shared by the repetitions, so the approximation error does not average out
+    return mean, np.sqrt(err**2 + np.mean(errs)**2)
+
+_ci_mmd = confidence_interval(_evaluate, aggregate=_mmd_mean_err)
+
+def ci_mmd(n, gen_func, X_test, **kwargs):
+    ci_options, kwargs = _split_ci_options(kwargs)
+    evaluator = MMDEvaluator(np.squeeze(X_test), **kwargs) # the test-set term is shared by all repetitions
+    return _ci_mmd(n, evaluator.evaluate, gen_func, **ci_options)
 
 
 ##########################
@@ -73,80 +346,161 @@ def sample_line(d, m, bounds):
     c = bounds[0] + (bounds[1]-bounds[0])*c
     return c
 
-def consistency(gen_func, latent_dim, bounds):
-    
-    n_eval = 100 # number of lines to be evaluated
-    n_points = 50 #number of points sampled on each line
-    mean_cor = 0 # sum of the correlation on each line
-    
-    for i in range(n_eval):
-        
-        c = sample_line(latent_dim, n_points, bounds)
-        dist_c = np.linalg.norm(c - c[0], axis=1)
-        
-        X = gen_func(c)
-        X = X.reshape((n_points, -1))
-        dist_X = np.linalg.norm(X - X[0], axis=1)
-        
-        mean_cor += np.corrcoef(dist_c, dist_X)[0,1]
-
-    return mean_cor/n_eval
-
-def ci_cons(n, gen_func, latent_dim=2, bounds=(0.0, 1.0)):
-    conss = np.zeros(n)
-    for i in range(n):
-        conss[i] = consistency(gen_func, latent_dim, bounds)
-    return mean_err(conss)
+def sample_lines(n_lines, d, m, bounds):
+    # Stack of n_lines lines of sample_line, drawn in the same order as repeated calls
+    return np.stack([sample_line(d, m, bounds) for _ in range(n_lines)])
+
+def _rowwise_corrcoef(a, b):
+    # Pearson correlation between the corresponding rows of a and b, as np.corrcoef(a[i], b[i])[0,1]
+    a = a - a.mean(1, keepdims=True)
+    b = b - b.mean(1, keepdims=True)
+    return np.clip(np.sum(a*b, 1) / np.sqrt(np.sum(a**2, 1) * np.sum(b**2, 1)), -1, 1)
+
+def line_correlations(gen_func, c, batch_size=10000):
+    # Correlation between the latent and design distances to the start of each line in c (n_lines, m, d).
+    # The points of all lines are generated together in batches of batch_size.
+    n_lines, n_points, d = c.shape
+    c_flat = c.reshape((-1, d))
+    X = np.concatenate([
+        gen_func(c_flat[i:i+batch_size]).reshape((len(c_flat[i:i+batch_size]), -1)) 
+        for i in range(0, len(c_flat), batch_size)
+        ])
+    X = X.reshape((n_lines, n_points, -1))
+    dist_c = np.linalg.norm(c - c[:, :1], axis=2)
+    dist_X = np.linalg.norm(X - X[:, :1], axis=2)
+    return _rowwise_corrcoef(dist_c, dist_X)
+
+def consistency(gen_func, latent_dim=2, bounds=(0.0, 1.0), n_eval=100, n_points=50, batch_size=10000):
+    # n_eval: number of lines to be evaluated
+    # n_points: number of points sampled on each line
+    c = sample_lines(n_eval, latent_dim, n_points, bounds)
+    return np.mean(line_correlations(gen_func, c, batch_size))
+
+ci_cons = confidence_interval(consistency)
 
 
 ##########################
 ########### RVOD #########
 ##########################
 
-def variation(X):
+def variation(X, chunk_size=10000):
+    # Mean over the shapes X (N, n_points, ...) of trace(cov(diff.T))/D, where diff is the 
+    # (n_points-1, D) point-to-point difference, i.e., the mean per-coordinate variance of diff.
+    # X may be a memory map, which is read in chunks of shapes.
     var = 0
-    for x in X:
-        diff = np.diff(x, axis=0)
-        cov = np.cov(diff.T)
-        var += np.trace(cov)/cov.shape[0]
+    for x in _iter_chunks(X, chunk_size):
+        diff = np.diff(x.reshape((x.shape[0], x.shape[1], -1)), axis=1)
+        var += np.var(diff, axis=1, ddof=1).mean(-1).sum()
     return var/X.shape[0]
     
-def ci_rsmth(n, gen_func, X_test):
-    rsmth = np.zeros(n)
-    for i in range(n):
-        X_gen = gen_func(2000)
-        rsmth[i] = variation(np.squeeze(X_test))/variation(X_gen)
-    return mean_err(rsmth)
+def _relative_variation(test_var, X_gen):
+    return test_var/variation(X_gen)
+
+def ci_rsmth(n, gen_func, X_test, **ci_options):
+    evaluator = functools.partial(_relative_variation, variation(np.squeeze(X_test)))
+    return _ci_evaluate(n, evaluator, gen_func, 2000, **ci_options)
 
 
 ##########################
 ########### MLL ##########
 ##########################
 
-def mean_log_likelihood(X_gen, X_test):
-    X_gen = X_gen.reshape((X_gen.shape[0], -1))
-    X_test = X_test.reshape((X_test.shape[0], -1))
-    kde = optimize_kde(X_gen)
-    return kde.score(X_test) / X_test.shape[0]
+def _sq_dist_blocks(X, Y, block_size):
+    # tiles of at most block_size x block_size of the pairwise squared distances between the 
+    # rows of X and Y, as (row offset, column offset, tile)
+    XX, YY = np.sum(X**2, 1), np.sum(Y**2, 1)
+    for i in range(0, len(X), block_size):
+        for j in range(0, len(Y), block_size):
+            d2 = XX[i:i+block_size, None] + YY[None, j:j+block_size] - 2 * X[i:i+block_size] @ Y[j:j+block_size].T
+            yield i, j, np.maximum(d2, 0, out=d2)
+
+def _tile_diagonal(i, j, d2):
+    # indices within the tile at (i, j) of the distances of the rows to themselves when X is Y
+    k = np.arange(max(i, j), min(i + d2.shape[0], j + d2.shape[1]))
+    return k - i, k - j
+
+def _kde_block(d2, h2):
+    # log of the Gaussian kernel sums over the columns of a squared distance tile, for every 
+    # bandwidth, to be merged across tiles with np.logaddexp; log-sum-exp shifted by the 
+    # nearest neighbor within the tile, overwrites d2
+    d_min = d2.min(1)
+    d_min[np.isinf(d_min)] = 0 # rows whose only column in the tile is left out
+    d2 -= d_min[:, None]
+    with np.errstate(divide='ignore'):
+        return np.log(np.exp(-d2 / h2).sum(2)) - d_min / h2[:, :, 0]
+
+def _kde_log_density(X, Y, bandwidths, block_size=256, loo=False):
+    # log-densities (len(bandwidths), len(X)) of the rows of X under the Gaussian KDE of Y, 
+    # matching KernelDensity.score_samples, with one distance pass shared by all bandwidths
+    X, Y = np.asarray(X, dtype=np.float64), np.asarray(Y, dtype=np.float64)
+    h2 = 2 * np.asarray(bandwidths, dtype=np.float64)[:, None, None]**2
+    out = np.full((len(h2), len(X)), -np.inf)
+    for i, j, d2 in _sq_dist_blocks(X, Y, block_size):
+        if loo: # X is Y, leave each sample out of its own estimate
+            d2[_tile_diagonal(i, j, d2)] = np.inf
+        rows = slice(i, i + len(d2))
+        out[:, rows] = np.logaddexp(out[:, rows], _kde_block(d2, h2))
+    n, d = len(Y) - loo, Y.shape[1]
+    return out - np.log(n) - d / 2 * np.log(np.pi * h2[:, :, 0])
+
+def select_bandwidth(X, bandwidths=np.logspace(-3, 1, 20), block_size=256):
+    r"""The KDE bandwidth among ``bandwidths`` maximizing the leave-one-out likelihood of X `(N, D)`.
+    """
+    loo = _kde_log_density(X, X, bandwidths, block_size, loo=True)
+    return bandwidths[np.argmax(loo.mean(1))]
+
+class MLLEvaluator:
+    r"""Mean log-likelihood of a fixed reference set under the Gaussian KDE of generated samples.
+
+    Replaces the grid search of ``optimize_kde``: the bandwidth is selected by 
+    leave-one-out likelihood over all of ``bandwidths`` in a single distance pass 
+    (see ``select_bandwidth``), on the first generated set, and reused for the 
+    following ones unless ``refit``.
+
+    Args:
+        X_ref: The reference samples of shape `(M, ...)`.
+        bandwidths: The candidate bandwidths.
+        block_size: The number of rows and columns per distance tile.
+        refit: Whether to reselect the bandwidth for every generated set.
+    """
+    def __init__(self, X_ref, bandwidths=np.logspace(-3, 1, 20), block_size=256, refit=False):
+        self.X_ref = X_ref.reshape((X_ref.shape[0], -1))
+        self.bandwidths = bandwidths
+        self.block_size = block_size
+        self.refit = refit
+        self.bandwidth = None
+
+    def __call__(self, X_gen):
+        X = X_gen.reshape((X_gen.shape[0], -1))
+        if self.bandwidth is None or self.refit:
+            self.bandwidth = select_bandwidth(X, self.bandwidths, self.block_size)
+        return _kde_log_density(self.X_ref, X, [self.bandwidth], self.block_size)[0].mean()
+
+def mean_log_likelihood(X_gen, X_test, **kwargs):
+    return MLLEvaluator(X_test, **kwargs)(X_gen)
     
-def ci_mll(n, gen_func, X_test):
-    mlls = np.zeros(n)
-    for i in range(n):
-        X_gen = gen_func(2000)
-        mlls[i] = mean_log_likelihood(X_gen, np.squeeze(X_test))
-    return mean_err(mlls)
+def ci_mll(n, gen_func, X_test, **kwargs):
+    ci_options, kwargs = _split_ci_options(kwargs)
+    # the bandwidth is shared by all repetitions, except across processes
+    evaluator = MLLEvaluator(np.squeeze(X_test), **kwargs)
+    return _ci_evaluate(n, evaluator, gen_func, 2000, **ci_options)
 
 
 ##########################
 ######## Diversity #######
 ##########################
-def variance(X):
-    cov = np.cov(X.T)
-    var = np.trace(cov)/cov.shape[0]
-#    var = np.mean(np.var(X, axis=0))
-#    var = np.linalg.det(cov)
-#    var = var**(1./cov.shape[0])
-    return var
+def variance(X, chunk_size=10000):
+    # trace(cov(X.T))/D, i.e., the mean per-feature variance of X (N, D), without forming the 
+    # covariance. The per-feature moments are merged over chunks of rows (Chan et al.).
+    n, mean, m2 = 0, 0., 0.
+    for x in _iter_chunks(X, chunk_size):
+        x = x.reshape((x.shape[0], -1))
+        n_b, mean_b = x.shape[0], x.mean(0)
+        delta = mean_b - mean
+        m2 = m2 + np.sum((x - mean_b)**2, 0) + delta**2 * n * n_b / (n + n_b)
+        mean = mean + delta * n_b / (n + n_b)
+        n += n_b
+    return np.mean(m2 / (n - 1))
 
 def rdiv(X_train, X_gen):
     ''' Relative div '''
@@ -167,16 +521,131 @@ def rdiv(X_train, X_gen):
     rdiv = gen_div/train_div
     return rdiv
 
-def ci_rdiv(n, X_train, gen_func, d=None, k=None, bounds=None):
-    rdivs = np.zeros(n)
-    for i in range(n):
-        if d is None or k is None or bounds is None:
-            X_gen = gen_func(X_train.shape[0])
-        else:
-            latent = np.random.uniform(bounds[0], bounds[1])*np.ones((X_train.shape[0], d))
-            latent[:, k] = np.random.uniform(bounds[0], bounds[1], size=X_train.shape[0])
-            X_gen = gen_func(latent)
-#            from shape_plot import plot_samples
-#            plot_samples(None, X_gen[:10], scatter=True, s=1, alpha=.7, c='k', fname='gen_%d' % k)
-        rdivs[i] = rdiv(X_train, X_gen)
-    return mean_err(rdivs)
\ No newline at end of file
+def _rdiv_repetition(X_train, gen_func, d=None, k=None, bounds=None):
+    if d is None or k is None or bounds is None:
+        X_gen = gen_func(X_train.shape[0])
+    else:
+        latent = np.random.uniform(bounds[0], bounds[1])*np.ones((X_train.shape[0], d))
+        latent[:, k] = np.random.uniform(bounds[0], bounds[1], size=X_train.shape[0])
+        X_gen = gen_func(latent)
+#        from shape_plot import plot_samples
+#        plot_samples(None, X_gen[:10], scatter=True, s=1, alpha=.7, c='k', fname='gen_%d' % k)
+    return rdiv(X_train, X_gen)
+
+ci_rdiv = confidence_interval(_rdiv_repetition)
+
+
+##########################
+########## Suite #########
+##########################
+
+class MetricSuite:
+    r"""Evaluates several distribution metrics from one cached pool of generated samples.
+
+    The pool is drawn with a single ``gen_func(pool_size)`` call and split into ``n`` 
+    repetitions of ``len(pool) // n`` consecutive samples, e.g., one copy of the conditions 
+    per repetition for the conditional ``gen_func`` of the scripts with ``pool_size=n``. 
+    The reference terms are computed once, and within a repetition the MMD and the KDE 
+    likelihood share the pairwise distance blocks. LSC needs latent-controlled 
+    samples, so it is still evaluated by ``ci_cons``.
+
+    Args:
+        gen_func: The generator function, returning the samples for ``gen_func(pool_size)``.
+        X_test: The reference samples of MMD, MLL and RVOD of shape `(M, ...)`.
+        X_train: The reference samples of the relative diversity, defaults to ``X_test``.
+        n: The number of repetitions.
+        pool_size: The argument of the ``gen_func`` call drawing the pool.
+        mmd_kwargs: The keyword arguments of ``MMDEvaluator``.
+        mll_kwargs: The keyword arguments of ``MLLEvaluator``.
+        block_size: The number of rows and columns per distance tile.
+    """
+    metrics = ('mmd', 'mll', 'rsmth', 'rdiv')
+
+    def __init__(self, gen_func, X_test, X_train=None, n=10, pool_size=10, mmd_kwargs=None, mll_kwargs=None, block_size=256):
+        self.gen_func = gen_func
+        self.X_test = np.squeeze(X_test)
+        self.X_train = self.X_test if X_train is None else np.squeeze(X_train)
+        self.n = n
+        self.pool_size = pool_size
+        self.mmd_kwargs = mmd_kwargs or {}
+        self.mll_kwargs = mll_kwargs or {}
+        self.block_size = block_size
+        self._pool = None
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = self.gen_func(self.pool_size)
+        return self._pool
+
+    def _distance_metrics(self, X, mmd_eval, mll_eval):
+        # MMD and MLL of one repetition X (N, D) from one pass over the distance blocks
+        mmd_value = mll_value = None
+        exact_mmd = mmd_eval is not None and mmd_eval.estimator in ('biased', 'unbiased')
+        select = mll_eval is not None and (mll_eval.bandwidth is None or mll_eval.refit)
+        beta = 1. / (2. * mmd_eval.sigma**2) if exact_mmd else None
+
+        if exact_mmd or select:
+            k_xx, bandwidths = 0., np.asarray(mll_eval.bandwidths) if select else None
+            h2 = 2 * bandwidths[:, None, None]**2 if select else None
+            loo = np.full((len(bandwidths), len(X)), -np.inf) if select else None
+            for i, j, d2 in _sq_dist_blocks(X, X, self.block_size):
+                diag = _tile_diagonal(i, j, d2)
+                if exact_mmd:
+                    d2[diag] = 0
+                    k_xx += np.exp(-beta * np.sqrt(d2)).sum()
+                if select:
+                    d2[diag] = np.inf
+                    rows = slice(i, i + len(d2))
+                    loo[:, rows] = np.logaddexp(loo[:, rows], _kde_block(d2, h2))
+            if select:
+                mll_eval.bandwidth = bandwidths[np.argmax(loo.mean(1) - X.shape[1] / 2 * np.log(h2[:, 0, 0]))]
+
+        if exact_mmd or mll_eval is not None:
+            k_xy, scores = 0., np.full(len(mll_eval.X_ref) if mll_eval is not None else 0, -np.inf)
+            X_ref = (mll_eval or mmd_eval).X_ref.astype(np.float64) # both are X_test
+            h2 = 2 * np.array([[[mll_eval.bandwidth]]])**2 if mll_eval is not None else None
+            for i, j, d2 in _sq_dist_blocks(X_ref, X, self.block_size):
+                if exact_mmd:
+                    k_xy += np.exp(-beta * np.sqrt(d2)).sum()
+                if mll_eval is not None:
+                    rows = slice(i, i + len(d2))
+                    scores[rows] = np.logaddexp(scores[rows], _kde_block(d2, h2)[0])
+            if exact_mmd:
+                mmd_value = mmd_eval.from_sums(k_xx, k_xy, len(X))
+            if mll_eval is not None:
+                mll_value = scores.mean() - np.log(len(X)) - X.shape[1] / 2 * np.log(np.pi * h2[0, 0, 0])
+
+        if mmd_eval is not None and not exact_mmd:
+            mmd_value = mmd_eval(X)
+        return mmd_value, mll_value
+
+    def evaluate(self, metrics=None):
+        r"""Returns the report ``{metric: (mean, err)}`` of ``metrics``, 
+        a subset of ``MetricSuite.metrics``, defaulting to all of them.
+        """
+        metrics = self.metrics if metrics is None else metrics
+        unknown = set(metrics) - set(self.metrics)
+        if unknown:
+            raise ValueError('Unknown metrics: {}'.format(', '.join(sorted(unknown))))
+
+        pool = self.pool
+        size = len(pool) // self.n
+        mmd_eval = MMDEvaluator(self.X_test, **self.mmd_kwargs) if 'mmd' in metrics else None
+        mll_eval = MLLEvaluator(self.X_test, **self.mll_kwargs) if 'mll' in metrics else None
+        test_var = variation(self.X_test) if 'rsmth' in metrics else None
+        train_var = variance(self.X_train.reshape((self.X_train.shape[0], -1))) if 'rdiv' in metrics else None
+
+        values = {metric: np.zeros(self.n) for metric in metrics}
+        for r in range(self.n):
+            X_gen = pool[r*size:(r+1)*size]
+            X = np.asarray(X_gen, dtype=np.float64).reshape((size, -1))
+            if 'mmd' in metrics or 'mll' in metrics:
+                mmd_value, mll_value = self._distance_metrics(X, mmd_eval, mll_eval)
+                if 'mmd' in metrics: values['mmd'][r] = mmd_value
+                if 'mll' in metrics: values['mll'][r] = mll_value
+            if 'rsmth' in metrics:
+                values['rsmth'][r] = test_var / variation(X_gen)
+            if 'rdiv' in metrics:
+                values['rdiv'][r] = variance(X) / train_var
+        return {metric: mean_err(values[metric]) for metric in metrics}
@@ -0,0 +1,78 @@
+"""
+Background rendering of the plots produced during training.
+"""
+import queue
+import warnings
+import traceback
+import multiprocessing as mp
+import torch
+
+
+def snapshot(input):
+    r"""Copy tensors, possibly nested in tuples or lists, into NumPy arrays.
+    """
+    if isinstance(input, torch.Tensor):
+        return input.detach().cpu().numpy()
+    elif type(input) == tuple or type(input) == list:
+        return type(input)(snapshot(each) for each in input)
+    else:
+        return input
+
+def _render_loop(tasks, plot_func, plot_kwargs):
+    from matplotlib import pyplot as plt
+    plt.switch_backend('Agg') # no display in the worker
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        epoch, args = task
+        try:
+            plot_func(epoch, *args, **plot_kwargs)
+        except Exception:
+            warnings.warn('Plotting failed at epoch {}:\n{}'.format(epoch, traceback.format_exc()))
+        finally:
+            plt.close('all')
+
+class PlotWorker:
+    r"""Renders epoch plots in a separate process so that plotting never blocks training.
+
+    An instance is meant to be passed as the ``plotting`` hook of ``GAN.train``.
+    Every ``interval`` epochs the hook arguments are copied into NumPy snapshots
+    and queued; the worker process then calls ``plot_func(epoch, *snapshots, **plot_kwargs)``.
+
+    Args:
+        plot_func: The plotting function. Must be picklable, i.e., defined at module level.
+        interval: The number of epochs between two plots.
+        max_pending: The maximum number of snapshots waiting to be rendered. Snapshots
+            arriving while the queue is full are dropped instead of stalling training.
+        start_method: The multiprocessing start method. ``'spawn'`` is safe with CUDA.
+        plot_kwargs: Additional keyword arguments sent to ``plot_func``.
+    """
+    def __init__(self, plot_func, interval: int=1, max_pending: int=4, start_method: str='spawn', **plot_kwargs):
+        context = mp.get_context(start_method)
+        self.interval = interval
+        self._tasks = context.Queue(max_pending)
+        self._process = context.Process(
+            target=_render_loop, args=(self._tasks, plot_func, plot_kwargs), daemon=True)
+        self._process.start()
+
+    def __call__(self, epoch, *args, **kwargs):
+        if (epoch + 1) % self.interval != 0:
+            return
+        try:
+            self._tasks.put_nowait((epoch, snapshot(args)))
+        except queue.Full:
+            warnings.warn('Plotting is lagging behind, skipping epoch {}.'.format(epoch))
+
+    def close(self, timeout=None):
+        r"""Render the pending snapshots and stop the worker process.
+        """
+        if self._process.is_alive():
+            self._tasks.put(None)
+            self._process.join(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
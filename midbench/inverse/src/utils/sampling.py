@@ -0,0 +1,141 @@
+"""
+Large-scale sampling of conditional generators streamed to memory-mapped .npy files.
+"""
+import os
+import json
+import numpy as np
+import torch
+from concurrent.futures import ThreadPoolExecutor
+from .dataloader import NoiseGenerator
+
+
+def _open_output(path, shape, dtype, resume):
+    if resume and os.path.exists(path):
+        array = np.load(path, mmap_mode='r+')
+        if array.shape == tuple(shape) and array.dtype == dtype:
+            return array
+        raise ValueError('Cannot resume: {} has shape {} and dtype {}, expected {} and {}.'.format(
+            path, array.shape, array.dtype, tuple(shape), np.dtype(dtype)))
+    return np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=tuple(shape))
+
+def _open_run(path, run, resume):
+    if resume and os.path.exists(os.path.join(os.path.dirname(path), 'done.npy')):
+        previous = None
+        if os.path.exists(path):
+            with open(path) as f:
+                previous = json.load(f)
+        if previous == run:
+            return
+        raise ValueError('Cannot resume: the samples in {} were drawn with {}, expected {}.'.format(
+            os.path.dirname(path), previous, run))
+    with open(path, 'w') as f:
+        json.dump(run, f)
+
+def _chunk_seed(seed, index):
+    return int(np.random.SeedSequence([seed, index]).generate_state(1)[0])
+
+def stream_samples(
+    generator, conditions, n_samples, out_dir, cz, noise_type,
+    chunk_size=10000, n_workers=1, seed=0, resume=True, device='cpu'
+    ):
+    r"""Sample a conditional generator chunk by chunk straight into memory-mapped files.
+
+    The outputs are preallocated in ``out_dir`` as ``airfoils.npy`` `(N, DP, 2)`,
+    ``aoas.npy`` `(N, 1)` and ``conditions.npy`` `(N, C)`, so the memory footprint
+    is bounded by the chunk size regardless of ``n_samples``. Sample ``i`` is drawn
+    under ``conditions[i % len(conditions)]``. The completed chunks are recorded in
+    ``done.npy``, so an interrupted run resumes from the first missing chunk. Each chunk
+    draws its noise from its own seed, hence the samples do not depend on the number
+    of workers or on resuming. The seed, chunk size and noise of the run are recorded
+    in ``run.json``, and resuming a run drawn with other settings raises a ValueError.
+
+    Args:
+        generator: The conditional generator, e.g., ``AirfoilAoAGenerator``, in eval mode.
+        conditions: The normalized conditions of shape `(M, C)`.
+        n_samples: The total number of samples N.
+        out_dir: The directory of the output files.
+        cz: The sizes of the noise components, as in the configs.
+        noise_type: The types of the noise components, as in the configs.
+        chunk_size: The number of samples generated per generator call.
+        n_workers: The number of threads producing chunks in parallel.
+        seed: The base seed of the noise.
+        resume: Whether to skip the chunks completed by a previous run with the same
+            seed, chunk size and noise.
+        device: The device the generator is on.
+
+    Returns:
+        The memory-mapped airfoils, AoAs and conditions.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    conditions = np.asarray(conditions, dtype=np.float32).reshape(len(conditions), -1)
+    n_chunks = -(-n_samples // chunk_size)
+    n_points = generator.n_data_points
+    run = {'seed': int(seed), 'chunk_size': int(chunk_size), 'cz': list(cz), 'noise_type': list(noise_type)}
+    _open_run(os.path.join(out_dir, 'run.json'), run, resume)
+
+    airfoils = _open_output(os.path.join(out_dir, 'airfoils.npy'), (n_samples, n_points, 2), np.float32, resume)
+    aoas = _open_output(os.path.join(out_dir, 'aoas.npy'), (n_samples, 1), np.float32, resume)
+    conds = _open_output(os.path.join(out_dir, 'conditions.npy'), (n_samples, conditions.shape[1]), np.float32, resume)
+    done = _open_output(os.path.join(out_dir, 'done.npy'), (n_chunks,), np.bool_, resume)
+
+    def produce(index):
+        start, stop = index * chunk_size, min(n_samples, (index + 1) * chunk_size)
+        noise_gen = NoiseGenerator(
+            stop - start, cz, noise_type, device=device,
+            generator=torch.Generator().manual_seed(_chunk_seed(seed, index)))
+        cond = conditions[np.arange(start, stop) % len(conditions)]
+        with torch.inference_mode():
+            airfoil, aoa = generator(noise_gen(), torch.from_numpy(cond).to(device))[0]
+        airfoils[start:stop] = airfoil.cpu().numpy().transpose([0, 2, 1])
+        aoas[start:stop] = aoa.cpu().numpy()
+        conds[start:stop] = cond
+
+    def produce_and_flush(index):
+        produce(index)
+        for each in (airfoils, aoas, conds): # the chunk must hit the disk before being marked as done
+            each.flush()
+        done[index] = True
+        done.flush()
+
+    todo = [index for index in range(n_chunks) if not done[index]]
+    if n_workers > 1:
+        with ThreadPoolExecutor(n_workers) as executor:
+            list(executor.map(produce_and_flush, todo))
+    else:
+        for index in todo:
+            produce_and_flush(index)
+
+    return tuple(np.load(os.path.join(out_dir, name), mmap_mode='r')
+                 for name in ('airfoils.npy', 'aoas.npy', 'conditions.npy'))
+
+def build_gen_func(generator, inp_paras, cz, noise_type, device='cpu', batch_size=100000):
+    r"""Wrap a conditional generator as the ``gen_func`` of ``utils.metrics``.
+
+    ``gen_func(N)`` returns N copies of samples under ``inp_paras``, stacked copy after copy,
+    with rows ``[airfoil (flattened), AoA, inp_paras]``. The copies are generated together
+    in generator calls of up to ``batch_size`` samples.
+
+    Args:
+        generator: The conditional generator, e.g., ``AirfoilAoAGenerator``.
+        inp_paras: The normalized conditions of shape `(M, C)`.
+        cz: The sizes of the noise components, as in the configs.
+        noise_type: The types of the noise components, as in the configs.
+        device: The device the generator is on.
+        batch_size: The maximum number of samples per generator call.
+    """
+    inp_paras = np.asarray(inp_paras, dtype=np.float32)
+    copies_per_call = max(1, batch_size // len(inp_paras))
+
+    def gen_func(N=1):
+        generator.eval()
+        tuples = []
+        for i in range(0, N, copies_per_call):
+            cond = np.tile(inp_paras, (min(copies_per_call, N - i), 1))
+            noise = NoiseGenerator(len(cond), cz, noise_type, device=device)()
+            with torch.no_grad():
+                airfoils, aoas = generator(noise, torch.from_numpy(cond).to(device))[0]
+            af_pred = airfoils.cpu().numpy().transpose([0, 2, 1]).reshape(len(cond), -1)
+            tuples.append(np.hstack([af_pred, aoas.cpu().numpy(), cond]))
+        return np.concatenate(tuples)
+    return gen_func
+
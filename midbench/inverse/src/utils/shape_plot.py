@@ -3,12 +3,14 @@ Plots samples or new shapes in the semantic space.
 
 Author(s): Wei Chen (wchen459@umd.edu), Jonah Chazan (jchazan@umd.edu)
 """
+import os
 import itertools
 import numpy as np
 
 from matplotlib import pyplot as plt
 from matplotlib import cm
 import matplotlib.colors as mcolors
+from matplotlib.collections import LineCollection, PolyCollection
 
 def gen_grid(d, points_per_axis, lb=0., rb=1.):
     ''' Generate a grid in a d-dimensional space 
@@ -21,32 +23,55 @@ def gen_grid(d, points_per_axis, lb=0., rb=1.):
     
     return np.array(coords)
 
-def plot_shape(xys, z1, z2, ax, scale, scatter, symm_axis, **kwargs):
-#    mx = max([y for (x, y) in m])
-#    mn = min([y for (x, y) in m])
-    xscl = scale# / (mx - mn)
-    yscl = scale# / (mx - mn)
-#    ax.scatter(z1, z2)
+_collection_aliases = {
+    'c': 'colors', 'color': 'colors', 
+    'lw': 'linewidths', 'linewidth': 'linewidths', 
+    'ls': 'linestyles', 'linestyle': 'linestyles'
+    }
+
+def plot_shapes(X, Z, ax, scale, scatter, symm_axis, **kwargs):
+    
+    ''' Plot a batch of shapes X [N, P, 2] centered at Z [N, 2] as a single collection.
+        All the shapes are transformed at once through broadcasting. '''
+    
+    X = np.asarray(X, dtype=float); Z = np.asarray(Z, dtype=float)
+    n = min(len(X), len(Z))
+    X = X[:n] * scale; Z = Z[:n, None, :2] # [N, P, 2], [N, 1, 2]
+    XY = X + Z
     if scatter:
         if 'c' not in kwargs:
-            kwargs['c'] = cm.rainbow(np.linspace(0,1,xys.shape[0]))
-#        ax.plot( *zip(*[(x * xscl + z1, y * yscl + z2) for (x, y) in xys]), lw=.2, c='b')
-        ax.scatter( *zip(*[(x * xscl + z1, y * yscl + z2) for (x, y) in xys]), edgecolors='none', **kwargs)
+            kwargs['c'] = np.tile(cm.rainbow(np.linspace(0, 1, X.shape[1])), (n, 1))
+        ax.scatter(XY[..., 0].ravel(), XY[..., 1].ravel(), edgecolors='none', **kwargs)
     else:
-        ax.plot( *zip(*[(x * xscl + z1, y * yscl + z2) for (x, y) in xys]), **kwargs)
-        
-    if symm_axis == 'y':
-#        ax.plot( *zip(*[(-x * xscl + z1, y * yscl + z2) for (x, y) in xys]), lw=.2, c='b')
-        plt.fill_betweenx( *zip(*[(y * yscl + z2, -x * xscl + z1, x * xscl + z1)
-                          for (x, y) in xys]), color='gray', alpha=.2)
-    elif symm_axis == 'x':
-#        ax.plot( *zip(*[(x * xscl + z1, -y * yscl + z2) for (x, y) in xys]), lw=.2, c='b')
-        plt.fill_between( *zip(*[(x * xscl + z1, -y * yscl + z2, y * yscl + z2)
-                          for (x, y) in xys]), color='gray', alpha=.2)
+        kwargs = {_collection_aliases.get(k, k): v for k, v in kwargs.items()}
+        ax.add_collection(LineCollection(XY, **kwargs))
+    
+    if symm_axis in ('x', 'y'):
+        # polygons enclosed by each shape and its mirror image, same as fill_between(x)
+        mirror = X * ([-1, 1] if symm_axis == 'y' else [1, -1]) + Z
+        polygons = np.concatenate([XY, mirror[:, ::-1]], axis=1)
+        ax.add_collection(PolyCollection(polygons, color='gray', alpha=.2))
+    ax.autoscale_view()
+
+def plot_shape(xys, z1, z2, ax, scale, scatter, symm_axis, **kwargs):
+    plot_shapes(np.asarray(xys)[None], [[z1, z2]], ax, scale, scatter, symm_axis, **kwargs)
+
+def _annotate(ax, labels, Z, template, dx, scale, **kwargs):
+    for label, z in zip(labels, Z):
+        ax.annotate(template.format(label), xy = (dx*scale+z[0], z[1]), size=20*scale, **kwargs)
+
+def _save(fname, fmt, dpi):
+    if fname:
+        plt.savefig(fname+'.'+fmt, dpi=dpi)
+    else:
+        plt.show()
+    plt.close()
 
-def plot_samples(Z, X, label=None, scale=0.8, points_per_axis=None, scatter=True, symm_axis=None, fname=None, **kwargs):
+def plot_samples(Z, X, label=None, scale=0.8, points_per_axis=None, scatter=True, symm_axis=None, fname=None, 
+                 fmt='svg', dpi=600, **kwargs):
     
-    ''' Plot shapes given design sapce and latent space coordinates '''
+    ''' Plot shapes given design sapce and latent space coordinates.
+        Use fmt='png' with a moderate dpi for fast raster output. '''
     
     plt.rc("font", size=12)
     if Z is None or Z.shape[1] != 2 or points_per_axis is None:
@@ -56,16 +81,15 @@ def plot_samples(Z, X, label=None, scale=0.8, points_per_axis=None, scatter=True
         Z = gen_grid(2, points_per_axis, bounds[0], bounds[1]) # Generate a grid
         
     scale /= points_per_axis
+    Z = Z[:, :2] * [1, .3]
         
     # Create a 2D plot
     fig = plt.figure(figsize=(10, 4))
     ax = fig.add_subplot(111)
         
-    for (i, z) in enumerate(Z):
-        plot_shape(X[i], z[0], .3*z[1], ax, scale, scatter, symm_axis, **kwargs)
-        if label is not None:
-            text = 'aoa: {:.2f}'.format(label[i])
-            plt.annotate(text, xy = (0.3*scale+z[0], .3*z[1]), size=20*scale)
+    plot_shapes(X, Z, ax, scale, scatter, symm_axis, **kwargs)
+    if label is not None:
+        _annotate(ax, label, Z, 'aoa: {:.2f}', 0.3, scale)
     
 #    plt.xlabel('c1')
 #    plt.ylabel('c2')
@@ -74,15 +98,13 @@ def plot_samples(Z, X, label=None, scale=0.8, points_per_axis=None, scatter=True
     plt.axis('off')
     plt.axis('equal')
     plt.tight_layout()
-    if fname:
-        plt.savefig(fname+'.svg', dpi=600)
-    else:
-        plt.show()
-    plt.close()
+    _save(fname, fmt, dpi)
 
-def plot_comparision(Z, G, Ps, lb_G=None, lb_P=None, scale=0.8, points_per_axis=None, scatter=True, symm_axis=None, fname=None, **kwargs):
+def plot_comparision(Z, G, Ps, lb_G=None, lb_P=None, scale=0.8, points_per_axis=None, scatter=True, symm_axis=None, fname=None, 
+                     fmt='svg', dpi=600, **kwargs):
     
-    ''' Plot comparision between groundtruth and prediction '''
+    ''' Plot comparision between groundtruth and prediction.
+        Use fmt='png' with a moderate dpi for fast raster output. '''
     
     plt.rc("font", size=12)
     if Z is None or Z.shape[1] != 2 or points_per_axis is None:
@@ -92,35 +114,28 @@ def plot_comparision(Z, G, Ps, lb_G=None, lb_P=None, scale=0.8, points_per_axis=
         Z = gen_grid(2, points_per_axis, bounds[0], bounds[1]) # Generate a grid
         
     scale /= points_per_axis
+    Z = Z[:, :2] * [1, .3]
         
     # Create a 2D plot
     fig = plt.figure(figsize=(10, 4))
     ax = fig.add_subplot(111)
 
-    for (i, z) in enumerate(Z):
-        plot_shape(G[i], z[0], .3*z[1], ax, scale, scatter, symm_axis, lw=2, c='k', **kwargs)
-        if lb_G is not None:
-            label = 'aoa_true: {:.2f}'.format(lb_G[i])
-            plt.annotate(label, xy = (0.1*scale+z[0], .3*z[1]), c='grey', size=20*scale)
+    plot_shapes(G, Z, ax, scale, scatter, symm_axis, lw=2, c='k', **kwargs)
+    if lb_G is not None:
+        _annotate(ax, lb_G, Z, 'aoa_true: {:.2f}', 0.1, scale, c='grey')
 
     for j, P in enumerate(Ps):
         color = list(mcolors.TABLEAU_COLORS.items())[j][1]
-        for (i, z) in enumerate(Z):
-            plot_shape(P[i], z[0], .3*z[1], ax, scale, scatter, symm_axis, lw=1, c=color, alpha=1, **kwargs)
-            if lb_P is not None:
-                label = 'aoa_pred: {:.2f}'.format(lb_P[i])
-                plt.annotate(label, xy = (0.5*scale+z[0], .3*z[1]), c='salmon', size=20*scale)
+        plot_shapes(P, Z, ax, scale, scatter, symm_axis, lw=1, c=color, alpha=1, **kwargs)
+        if lb_P is not None:
+            _annotate(ax, lb_P, Z, 'aoa_pred: {:.2f}', 0.5, scale, c='salmon')
     
     plt.xticks([])
     plt.yticks([])
     plt.axis('off')
     plt.axis('equal')
     plt.tight_layout()
-    if fname:
-        plt.savefig(fname+'.svg', dpi=600)
-    else:
-        plt.show()
-    plt.close()
+    _save(fname, fmt, dpi)
 
 def plot_synthesized(Z, gen_func, d=2, scale=.8, points_per_axis=None, scatter=True, symm_axis=None, fname=None, **kwargs):
     
@@ -158,3 +173,18 @@ def plot_grid(points_per_axis, gen_func, d=2, bounds=(0.0, 1.0), scale=.8, scatt
             Z[:, :3] = np.hstack((Zxy, Zz)) # zero after 3rd dimension [N^2, 3] = [N^2, 2 + 1]
             plot_synthesized(Z, gen_func, 2, scale, points_per_axis, scatter, symm_axis, '%s_%.2f' % (fname, zgrid[i]), **kwargs)
         
+def plot_epoch(epoch, batch, fake, img_dir, num=36, fmt='png', dpi=150, **kwargs):
+    
+    ''' Plot the groundtruth batch against the prediction of a given epoch.
+        Meant to be run by utils.plot_worker.PlotWorker on NumPy snapshots. '''
+    
+    num = min(num, len(fake[0]))
+    airfoils, aoas_opt, _ = batch
+    airfoils = airfoils.transpose([0, 2, 1])[:num]
+    aoas_opt = aoas_opt.squeeze()[:num]
+    pred_airfoils = fake[0].transpose([0, 2, 1])[:num]
+    pred_aoas = fake[1].squeeze()[:num]
+    plot_comparision(
+        None, airfoils, [pred_airfoils], aoas_opt, pred_aoas, scale=1.0, scatter=False, symm_axis=None, 
+        fname=os.path.join(img_dir, 'epoch {}'.format(epoch+1)), fmt=fmt, dpi=dpi, **kwargs
+        )
@@ -16,7 +16,7 @@ with open("README.md") as fh:
 
 setup(
   name = 'midbench',
-  packages = ['midbench', 'midbench.envs', 'midbench.utils', 'midbench.envs.airfoil', 'midbench.envs.heatconduction'],
+  packages = ['midbench', 'midbench.data', 'midbench.envs', 'midbench.utils', 'midbench.envs.airfoil', 'midbench.envs.heatconduction'],
   version = '0.1',
   license='MIT',
   description = "The Maryland Inverse Design (MID) Benchmark Suite",
@@ -33,8 +33,7 @@ setup(
           'torch',
           'dataclasses',
           'typing_extensions',
-          'importlib-metadata',
-          'pandas'
+          'importlib-metadata'
       ],
   classifiers=[
     'Development Status :: 3 - Alpha',
@@ -0,0 +1,141 @@
+"""Chunked storage, reads and range queries of ``midbench.data.DataBase``."""
+import json
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from midbench import error  # noqa: E402
+from midbench.data import DataBase, DataEntry  # noqa: E402
+
+
+def entry(start, n):
+    rows = np.arange(start, start + n)
+    return DataEntry(
+        designs={"airfoil": np.stack([rows, -rows], axis=-1)[:, None].repeat(3, axis=1).astype(np.float32)},
+        conditions={"mach": (rows % 7) / 10.0, "reynolds": 1e6 * (rows % 5)},
+        performances={"cd": rows.astype(np.float64)},
+    )
+
+
+def test_data_entry():
+    data = entry(0, 4)
+    assert len(data) == 4
+    assert sorted(data.columns()) == ["conditions.mach", "conditions.reynolds", "designs.airfoil", "performances.cd"]
+    np.testing.assert_array_equal(data[1:3].performances["cd"], [1, 2])
+    np.testing.assert_array_equal(data[-1].performances["cd"], [3])
+    assert [len(row) for row in data] == [1] * 4
+    record = DataEntry.from_record(designs=np.zeros(3), conditions={"mach": 0.8}, performances=None)
+    assert len(record) == 1 and record.designs["value"].shape == (1, 3)
+
+
+def test_append_across_chunks(tmp_path):
+    db = DataBase(str(tmp_path / "db"), chunk_rows=4)
+    for start, n in [(0, 3), (3, 0), (3, 6), (9, 1), (10, 4)]:
+        db.append(entry(start, n))
+    assert len(db) == 14
+    assert sorted(os.listdir(tmp_path / "db" / "chunks")) == ["000000", "000001", "000002", "000003"]
+    expected = entry(0, 14)
+    for name, value in expected.columns().items():
+        np.testing.assert_array_equal(db.read(name), value)
+        np.testing.assert_array_equal(np.concatenate(list(db.chunks(name))), value)
+    stats = db.schema["stats"]["performances.cd"]
+    assert stats == [[0, 3], [4, 7], [8, 11], [12, 13]]
+    assert "designs.airfoil" not in db.schema["stats"]
+
+
+def test_empty_append(tmp_path):
+    db = DataBase(str(tmp_path / "db"), entry(0, 0), chunk_rows=4)
+    assert len(db) == 0
+    assert db.read("performances.cd").shape == (0,)
+    assert db.query({"conditions.mach": (None, None)}).size == 0
+    db.append(entry(0, 2))
+    np.testing.assert_array_equal(db.read("performances.cd"), [0, 1])
+
+
+def test_reads(tmp_path):
+    db = DataBase(str(tmp_path / "db"), entry(0, 10), chunk_rows=4)
+    cd = np.arange(10.0)
+    view = db.read("performances.cd", slice(4, 7))
+    assert not view.flags.writeable  # a view of the memory map
+    np.testing.assert_array_equal(view, cd[4:7])
+    for rows in [slice(2, 9), slice(None, None, 3), slice(-3, None), [9, 0, 5, 5], [-1, -10], np.array([], dtype=int)]:
+        np.testing.assert_array_equal(db.read("performances.cd", rows), cd[rows])
+    np.testing.assert_array_equal(db["designs.airfoil"], entry(0, 10).designs["airfoil"])
+    selected = db[[-2, 1]]
+    np.testing.assert_array_equal(selected.conditions["mach"], entry(0, 10).conditions["mach"][[-2, 1]])
+    assert selected.specs is None
+    assert list(db.select(slice(0, 2), ["conditions.mach"]).columns()) == ["conditions.mach"]
+    np.testing.assert_array_equal(db[3].performances["cd"], [3])
+    with pytest.raises(IndexError):
+        db.read("performances.cd", [10])
+    with pytest.raises(IndexError):
+        db.read("performances.cd", [-11])
+    with pytest.raises(KeyError):
+        db.read("performances.cl")
+
+
+def test_reopen(tmp_path):
+    path = str(tmp_path / "db")
+    DataBase(path, entry(0, 6), chunk_rows=4)
+    with open(os.path.join(path, "schema.json")) as f:
+        assert json.load(f)["n_rows"] == 6
+    db = DataBase(path, chunk_rows=100)  # the chunk size of the schema
+    assert len(db) == 6 and db.chunk_rows == 4
+    assert db.columns["designs.airfoil"] == (np.dtype(np.float32), (3, 2))
+    db.extend([entry(6, 1), entry(7, 3)])
+    np.testing.assert_array_equal(DataBase(path).read("performances.cd"), np.arange(10.0))
+
+
+def _naive_query(data, ranges):
+    mask = np.ones(len(data), dtype=bool)
+    for name, (low, high) in ranges.items():
+        value = data.columns()[name]
+        mask &= (value >= (-np.inf if low is None else low)) & (value <= (np.inf if high is None else high))
+    return np.flatnonzero(mask)
+
+
+@pytest.mark.parametrize("indexed", [(), ("conditions.mach",), ("conditions.mach", "conditions.reynolds")])
+def test_query(indexed, tmp_path):
+    path = str(tmp_path / "db")
+    db = DataBase(path, entry(0, 11), chunk_rows=4)
+    for name in indexed:
+        db.create_index(name)
+    queries = [
+        {"conditions.mach": (0.2, 0.4)},
+        {"conditions.mach": (None, 0.1), "conditions.reynolds": (1e6, None)},
+        {"conditions.reynolds": (2e6, 2e6)},
+        {"performances.cd": (3, 9), "conditions.mach": (0.3, None)},
+        {"conditions.mach": (1.0, None)},
+    ]
+    for ranges in queries:
+        np.testing.assert_array_equal(db.query(ranges), _naive_query(entry(0, 11), ranges))
+    db.append(entry(11, 6))  # the indexes are merged with the new rows on the next query
+    for ranges in queries:
+        np.testing.assert_array_equal(db.query(ranges), _naive_query(entry(0, 17), ranges))
+    reopened = DataBase(path)
+    assert reopened.schema["indexes"] == {name: 17 for name in indexed}
+    reopened.append(entry(17, 2))
+    for ranges in queries:
+        np.testing.assert_array_equal(reopened.query(ranges), _naive_query(entry(0, 19), ranges))
+
+
+def test_schema_errors(tmp_path):
+    with pytest.raises(error.SchemaError):
+        DataEntry(designs=np.zeros((3, 2)), conditions={"mach": np.zeros(2)}, performances=None)
+    db = DataBase(str(tmp_path / "db"), entry(0, 2), chunk_rows=4)
+    data = entry(2, 2)
+    with pytest.raises(error.SchemaError):  # missing column
+        db.append(DataEntry(data.designs, data.conditions, None))
+    with pytest.raises(error.SchemaError):  # extra column
+        db.append(DataEntry(data.designs, data.conditions, {**data.performances, "cl": np.zeros(2)}))
+    with pytest.raises(error.SchemaError):  # row shape
+        db.append(DataEntry({"airfoil": np.zeros((2, 4, 2), np.float32)}, data.conditions, data.performances))
+    with pytest.raises(error.SchemaError):  # dtype
+        db.append(DataEntry(data.designs, {**data.conditions, "mach": np.array(["a", "b"])}, data.performances))
+    with pytest.raises(error.SchemaError):
+        db.create_index("designs.airfoil")
+    with pytest.raises(error.SchemaError):
+        db.query({"designs.airfoil": (0, 1)})
+    assert len(db) == 2 and len(DataBase(db.path)) == 2
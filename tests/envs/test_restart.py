@@ -0,0 +1,80 @@
+"""Warm starts of ``RestartStore`` onto the mesh a simulation actually runs on."""
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+if "SU2_RUN" not in os.environ:  # importing midbench.envs.airfoil imports SU2
+    pytest.skip("SU2 is not installed", allow_module_level=True)
+
+from midbench.envs.airfoil import su2_io  # noqa: E402
+from midbench.envs.airfoil.airfoil2d import Airfoil2dCondition, Airfoil2dDesign  # noqa: E402
+from midbench.envs.airfoil.restart import RestartStore  # noqa: E402
+
+HEADER = ["PointID", "x", "y", "Density", "Momentum_x"]
+
+
+class Config(dict):
+    """The attribute access of ``SU2.io.Config`` without parsing a file."""
+
+    __getattr__ = dict.__getitem__
+    __setattr__ = dict.__setitem__
+
+
+def _write_mesh(path, points):
+    with open(path, "w") as f:
+        f.write("NDIME= 2\nNELEM= 0\n")
+        f.write(f"NPOIN= {len(points)}\n")
+        for i, (x, y) in enumerate(points):
+            f.write(f"{x:.15e} {y:.15e} {i}\n")
+    return str(path)
+
+
+@pytest.fixture
+def case(tmp_path):
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-1.0, 1.0, size=(40, 2))
+    fine = _write_mesh(tmp_path / "air_coord.su2", points)
+    coarse = _write_mesh(tmp_path / "air_coord_coarse.su2", points[::2])
+    air_coord = tmp_path / "air_coord.npy"
+    np.save(air_coord, rng.uniform(0.0, 1.0, size=(1, 16, 2)))
+    designs = Airfoil2dDesign(air_coord_path=str(air_coord), su2=fine, su2_coarse=coarse)
+    conditions = Airfoil2dCondition()
+
+    values = np.stack([1.0 + points[:, 0], 2.0 * points[:, 1]], axis=1)
+    restart = str(tmp_path / "restart_flow.csv")
+    su2_io.write_restart(restart, HEADER, np.column_stack([np.arange(len(points)), points, values]))
+    store = RestartStore(str(tmp_path / "store"))
+    assert store.add(conditions, designs, restart) == 0
+    return store, conditions, designs, points, values
+
+
+@pytest.mark.parametrize("fidelity", ["coarse", "full"])
+def test_warm_start_onto_the_mesh_of_the_fidelity(case, fidelity, tmp_path):
+    store, conditions, designs, points, values = case
+    idx = np.arange(0, len(points), 2) if fidelity == "coarse" else np.arange(len(points))
+    config = Config(MESH_FILENAME=designs.mesh(fidelity), OUTPUT_FILES=["RESTART"])
+    run_dir = tmp_path / fidelity
+    run_dir.mkdir()
+
+    assert store.warm_start(config, conditions, designs, str(run_dir)) == 0
+    assert config.RESTART_SOL == "YES"
+    assert config.READ_BINARY_RESTART == "NO"
+    assert "RESTART_ASCII" in config.OUTPUT_FILES
+
+    header, data = su2_io.read_restart(config.SOLUTION_FILENAME)
+    assert header == HEADER
+    assert len(data) == len(su2_io.read_mesh_points(config.MESH_FILENAME)) == len(idx)
+    np.testing.assert_array_equal(data[:, 0], np.arange(len(idx)))
+    np.testing.assert_allclose(data[:, 1:3], points[idx], rtol=0, atol=1e-12)
+    np.testing.assert_allclose(data[:, 3:], values[idx], rtol=0, atol=1e-12)
+
+
+def test_add_skips_missing_and_truncated_restarts(case, tmp_path):
+    store, conditions, designs, points, values = case
+    assert store.add(conditions, designs, str(tmp_path / "missing.csv")) is None
+    restart = tmp_path / "restart_flow.csv"
+    restart.write_bytes(restart.read_bytes()[:-10])  # as left by a solver stopped while writing
+    assert store.add(conditions, designs, str(restart)) is None
+    assert len(store) == 1
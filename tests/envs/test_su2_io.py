@@ -0,0 +1,143 @@
+"""Readers of the SU2 outputs and rendering of the config files of the airfoil tutorial in ``su2_io``."""
+import importlib.util
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from midbench import error  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(__file__), "..", "..")
+TUTORIAL = os.path.join(ROOT, "tutorials", "airfoil2d")
+CFGFILES = [os.path.join(TUTORIAL, name) for name in ("config_simu.cfg", "config_opt.cfg")]
+
+# su2_io is loaded from its file since the __init__ of midbench.envs.airfoil imports SU2
+_spec = importlib.util.spec_from_file_location("su2_io", os.path.join(ROOT, "midbench", "envs", "airfoil", "su2_io.py"))
+su2_io = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(su2_io)
+
+HEADER = '"Inner_Iter",     "CD"      ,      "CL"      \n'
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def _write(path, text, mode="w"):
+    with open(path, mode) as f:
+        f.write(text)
+    return str(path)
+
+
+def test_read_last_row(tmp_path):
+    path = _write(tmp_path / "history.csv", HEADER + "0,0.02,0.3\n1,0.0125,0.45\n")
+    assert su2_io.read_header(path) == ["Inner_Iter", "CD", "CL"]
+    assert su2_io.read_last_row(path) == {"Inner_Iter": 1.0, "CD": 0.0125, "CL": 0.45}
+
+
+def test_read_last_row_skips_a_truncated_last_line(tmp_path):
+    # as left by a solver stopped in the middle of a write
+    path = _write(tmp_path / "history.csv", HEADER + "0,0.02,0.3\n1,0.0125,0.45\n2,0.01234567,0.5")
+    assert su2_io.read_last_row(path) == {"Inner_Iter": 1.0, "CD": 0.0125, "CL": 0.45}
+
+
+def test_read_last_row_skips_nan_and_crlf(tmp_path):
+    path = str(tmp_path / "history.csv")
+    with open(path, "wb") as f:
+        f.write((HEADER.rstrip("\n") + "\r\n0,0.02,0.3\r\n1,nan,0.45\r\n").encode())
+    assert su2_io.read_last_row(path) == {"Inner_Iter": 0.0, "CD": 0.02, "CL": 0.3}
+
+
+def test_read_last_row_grows_the_block_backwards(tmp_path):
+    rows = "".join(f"{i},{1.0 / (i + 1)},{i / 10}\n" for i in range(200))
+    path = _write(tmp_path / "history.csv", HEADER + rows + "200,nan,nan\n" * 100)
+    assert su2_io.read_last_row(path, block_size=16) == {"Inner_Iter": 199.0, "CD": 1.0 / 200, "CL": 19.9}
+
+
+@pytest.mark.parametrize("rows", ["", "0,0.02", "0,nan,0.3\n"])
+def test_read_last_row_without_complete_row(rows, tmp_path):
+    path = _write(tmp_path / "history.csv", HEADER + rows)
+    with pytest.raises(error.SolverOutputError):
+        su2_io.read_last_row(path)
+
+
+def test_read_columns(tmp_path):
+    path = _write(tmp_path / "surface_flow.csv", '"PointID","x","y"\n0,1.0,0.0\n1,0.5,nan\n2,0.0,0.0\n')
+    data = su2_io.read_columns(path, ["x", "y"])
+    np.testing.assert_array_equal(data["x"], [1.0, 0.0])
+    np.testing.assert_array_equal(data["y"], [0.0, 0.0])
+    with pytest.raises(KeyError):
+        su2_io.read_columns(path, ["z"])
+
+
+def test_restart_round_trip(tmp_path):
+    header = ["PointID", "x", "y", "Density"]
+    data = np.array([[1, 0.5, 0.1, 1.2], [0, 1.0, 0.0, 1.1]])
+    path = str(tmp_path / "restart_flow.csv")
+    su2_io.write_restart(path, header, data)
+    read_header, read_data = su2_io.read_restart(path)
+    assert read_header == header
+    np.testing.assert_array_equal(read_data, data[::-1])
+
+
+def test_read_mesh_points(tmp_path):
+    path = _write(tmp_path / "mesh.su2", "NDIME= 2\nNELEM= 0\nNPOIN= 2\n0.0 1.0 0\n2.0 3.0 1\nNMARK= 0\n")
+    np.testing.assert_array_equal(su2_io.read_mesh_points(path), [[0.0, 1.0], [2.0, 3.0]])
+
+
+def test_history_tail(tmp_path):
+    path = str(tmp_path / "history.csv")
+    tail = su2_io.HistoryTail(path)
+    assert tail.read().shape == (0, 0)
+    _write(path, HEADER + "0,0.02,0.3\n1,nan,0.4")
+    np.testing.assert_array_equal(tail.read(), [[0, 0.02, 0.3]])
+    assert tail.header == ["Inner_Iter", "CD", "CL"]
+    _write(path, "5\n", mode="a")
+    np.testing.assert_array_equal(tail.read(), [[1, np.nan, 0.45]])
+    assert tail.read().shape == (0, 3)
+
+
+@pytest.mark.parametrize("cfgfile", CFGFILES)
+def test_render_without_overrides_is_identity(cfgfile, tmp_path):
+    path = str(tmp_path / "config.cfg")
+    su2_io.render_config(_read(cfgfile), {}, path)
+    assert _read(path) == _read(cfgfile)
+
+
+@pytest.mark.parametrize("cfgfile", CFGFILES)
+def test_render_rewrites_only_the_overrides(cfgfile, tmp_path):
+    overrides = {
+        "MACH_NUMBER": 0.8,
+        "AOA": 1.5,
+        "ITER": 300,
+        "MESH_FILENAME": "/tmp/air_coord_coarse.su2",
+        "OUTPUT_FILES": ["CSV", "RESTART", "RESTART_ASCII"],
+        "READ_BINARY_RESTART": "NO",  # absent from the template
+    }
+    path = str(tmp_path / "config.cfg")
+    su2_io.render_config(_read(cfgfile), overrides, path)
+
+    template, rendered = _read(cfgfile).splitlines(), _read(path).splitlines()
+    assert len(rendered) == len(template) + 1
+    changed = {line.partition("=")[0].strip() for old, line in zip(template, rendered) if old != line}
+    assert changed == {"MACH_NUMBER", "AOA", "ITER", "MESH_FILENAME", "OUTPUT_FILES"}
+    assert "OUTPUT_FILES= ( CSV, RESTART, RESTART_ASCII )" in rendered
+    assert rendered[-1] == "READ_BINARY_RESTART= NO"
+
+
+@pytest.mark.skipif("SU2_RUN" not in os.environ, reason="SU2 is not installed")
+@pytest.mark.parametrize("cfgfile", CFGFILES)
+def test_rendered_config_round_trip(cfgfile, tmp_path):
+    sys.path.append(os.environ["SU2_RUN"])
+    import SU2
+
+    overrides = {"MACH_NUMBER": 0.8, "ITER": 300, "OUTPUT_FILES": ["CSV", "RESTART", "RESTART_ASCII"]}
+    path = str(tmp_path / "config.cfg")
+    su2_io.render_config(_read(cfgfile), overrides, path)
+    expected, config = SU2.io.Config(cfgfile), SU2.io.Config(path)
+    expected.update(overrides)
+    for key in expected:
+        assert str(config[key]) == str(expected[key]), key
@@ -0,0 +1,64 @@
+"""Contour ordering and incremental dataset construction of ``utils.builder``."""
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+
+SRC = os.path.join(os.path.dirname(__file__), "..", "..", "midbench", "inverse", "src")
+sys.path.insert(0, SRC)
+
+from utils.builder import DatasetBuilder, order_contour  # noqa: E402
+
+
+def naca4(m=0.0, p=0.4, t=0.12, n=100, closed=True):
+    """A NACA 4-digit airfoil in the UIUC order with cosine spacing, from the trailing edge over the upper surface."""
+    x = 0.5 * (1 + np.cos(np.linspace(0, np.pi, n)))
+    a4 = -0.1036 if closed else -0.1015
+    yt = 5 * t * (0.2969 * np.sqrt(x) - 0.1260 * x - 0.3516 * x**2 + 0.2843 * x**3 + a4 * x**4)
+    yc = np.where(x < p, m / p**2 * (2 * p * x - x**2), m / (1 - p) ** 2 * (1 - 2 * p + 2 * p * x - x**2))
+    theta = np.arctan(np.where(x < p, 2 * m / p**2 * (p - x), 2 * m / (1 - p) ** 2 * (p - x)))
+    upper = np.stack([x - yt * np.sin(theta), yc + yt * np.cos(theta)], axis=1)
+    lower = np.stack([x + yt * np.sin(theta), yc - yt * np.cos(theta)], axis=1)[::-1][1:]  # the leading edge once
+    if closed:
+        lower = lower[:-1]  # the trailing edge once
+    return np.concatenate([upper, lower])
+
+
+@pytest.mark.parametrize("closed", [True, False])
+@pytest.mark.parametrize("camber", [(0.0, 0.4), (0.04, 0.4), (0.09, 0.3)])  # the lower surface of the last one crosses the chord
+@pytest.mark.parametrize("seed", range(3))
+def test_order_contour_recovers_a_shuffled_airfoil(closed, camber, seed):
+    airfoil = naca4(*camber, closed=closed)
+    shuffled = airfoil[np.random.default_rng(seed).permutation(len(airfoil))]
+    np.testing.assert_array_equal(order_contour(shuffled), airfoil)
+
+
+def test_order_contour_reverses_a_clockwise_contour():
+    airfoil = naca4()
+    clockwise = np.concatenate([airfoil[:1], airfoil[:0:-1]])
+    np.testing.assert_array_equal(order_contour(clockwise), airfoil)
+
+
+class Conditions:
+    mach, reynolds, lift, aoa = 0.8, 8e6, 0.35, 1.0
+
+
+def test_dataset_builder(tmp_path):
+    builder = DatasetBuilder(str(tmp_path / "dataset"), N=64, chunk_rows=2)
+    airfoil = naca4()
+    shuffled = airfoil[np.random.default_rng(0).permutation(len(airfoil))]
+    results = [(Conditions(), (0.01 * i, 40.0 + i, shuffled.T, 1.5 + i)) for i in range(3)]
+    assert builder.consume(iter(results)) == 3
+
+    designs = builder.database.read("designs.airfoil")
+    assert designs.shape == (3, 64, 2)
+    assert designs.dtype == np.float32
+    # starts at the trailing edge and runs over the upper surface
+    np.testing.assert_allclose(designs[:, 0], [[1.0, 0.0]] * 3, atol=1e-3)
+    assert np.all(designs[:, 1:31, 1] > 0) and np.all(designs[:, 34:-1, 1] < 0)
+    np.testing.assert_allclose(builder.database.read("designs.aoa"), [1.5, 2.5, 3.5])
+    np.testing.assert_allclose(builder.database.read("performances.cd"), [0.0, 0.01, 0.02])
+    np.testing.assert_allclose(builder.database.read("conditions.reynolds"), [8e6] * 3)
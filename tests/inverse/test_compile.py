@@ -0,0 +1,30 @@
+"""Opt-in ``torch.compile`` of the models with ``compile_module``."""
+import os
+import sys
+
+import pytest
+
+torch = pytest.importorskip("torch")
+dynamo = pytest.importorskip("torch._dynamo")
+
+SRC = os.path.join(os.path.dirname(__file__), "..", "..", "midbench", "inverse", "src")
+sys.path.insert(0, SRC)
+
+from models.utils import compile_module  # noqa: E402
+
+
+def test_compile_module_keeps_the_global_dynamo_config():
+    torch.manual_seed(0)
+    module = torch.nn.Sequential(torch.nn.Linear(4, 8), torch.nn.ReLU(), torch.nn.Linear(8, 2))
+    x = torch.randn(5, 4)
+    expected = module(x)
+    keys = list(module.state_dict())
+    assert not dynamo.config.suppress_errors
+
+    seen = []
+    module.register_forward_hook(lambda *args: seen.append(dynamo.config.suppress_errors))
+    assert compile_module(module, backend="eager") is module
+    assert list(module.state_dict()) == keys
+    torch.testing.assert_close(module(x), expected)
+    assert seen == [True]  # within the compiled call only
+    assert not dynamo.config.suppress_errors
@@ -0,0 +1,52 @@
+"""Numerical equivalence of the generator with batch normalization folded in by ``fuse_for_inference``."""
+import json
+import os
+import sys
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+SRC = os.path.join(os.path.dirname(__file__), "..", "..", "midbench", "inverse", "src")
+sys.path.insert(0, SRC)
+
+from models.cgans import AirfoilAoAGenerator  # noqa: E402
+from utils.dataloader import NoiseGenerator  # noqa: E402
+
+# float32 reassociation of the folded affine transforms
+RTOL, ATOL = 1e-4, 1e-5
+
+
+@pytest.fixture(scope="module")
+def generators():
+    torch.manual_seed(0)
+    with open(os.path.join(SRC, "configs", "cebgan.json")) as f:
+        configs = json.load(f)
+    noise_gen = NoiseGenerator(64, sizes=configs["cz"], noise_type=configs["noise_type"])
+    generator = AirfoilAoAGenerator(**configs["gen"])
+    for module in generator.modules():  # non-trivial affine parameters
+        if isinstance(module, torch.nn.modules.batchnorm._BatchNorm):
+            torch.nn.init.uniform_(module.weight, 0.5, 1.5)
+            torch.nn.init.uniform_(module.bias, -0.5, 0.5)
+    with torch.no_grad():  # populate the running statistics
+        for _ in range(5):
+            generator(noise_gen(), torch.randn(64, 3))
+    generator.eval()
+    return generator, generator.fuse_for_inference(), noise_gen
+
+
+def test_fused_generator_matches(generators):
+    generator, fused, noise_gen = generators
+    noise, inp_paras = noise_gen(), torch.randn(64, 3)
+    with torch.no_grad():
+        (dp, aoa), cp, w, _, _ = generator(noise, inp_paras)
+        (dp_f, aoa_f), cp_f, w_f, _, _ = fused(noise, inp_paras)
+    torch.testing.assert_close(dp_f, dp, rtol=RTOL, atol=ATOL)
+    torch.testing.assert_close(aoa_f, aoa, rtol=RTOL, atol=ATOL)
+    torch.testing.assert_close(cp_f, cp, rtol=RTOL, atol=ATOL)
+    torch.testing.assert_close(w_f, w, rtol=RTOL, atol=ATOL)
+
+
+def test_fused_generator_has_no_batchnorm(generators):
+    _, fused, _ = generators
+    assert not any(isinstance(m, torch.nn.modules.batchnorm._BatchNorm) for m in fused.modules())
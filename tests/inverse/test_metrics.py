@@ -0,0 +1,187 @@
+"""Confidence intervals and distribution metrics of ``utils.metrics``."""
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("sklearn")
+
+SRC = os.path.join(os.path.dirname(__file__), "..", "..", "midbench", "inverse", "src")
+sys.path.insert(0, SRC)
+
+from utils import metrics  # noqa: E402
+
+# module-level metrics and generators, so that worker processes can unpickle them
+
+
+def gen_normal(N):
+    return np.random.normal(size=(N, 8))
+
+
+def noisy_score(scale, rng):
+    return scale * rng.normal()
+
+
+ci_noisy_score = metrics.confidence_interval(noisy_score)
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_ci_seed_is_reproducible_across_executors(executor):
+    # the rng passed to metrics accepting it is independent of the executor
+    reference = ci_noisy_score(8, 1.0, ci_seed=0)
+    assert ci_noisy_score(8, 1.0, ci_seed=0, ci_executor=executor, ci_max_workers=3) == reference
+    assert ci_noisy_score(8, 1.0, ci_seed=1) != reference
+
+
+def test_ci_seed_is_reproducible_with_processes():
+    # the global NumPy state seeded for the other metrics is per process
+    X_train = np.random.default_rng(0).normal(size=(500, 8))
+    reference = metrics.ci_rdiv(6, X_train, gen_normal, ci_seed=0)
+    assert metrics.ci_rdiv(6, X_train, gen_normal, ci_seed=0, ci_executor="process", ci_max_workers=2) == reference
+    assert metrics.ci_rdiv(6, X_train, gen_normal, ci_seed=1) != reference
+
+
+def test_ci_target_err_stops_early():
+    results = metrics.run_ci(100, noisy_score, (1e-6,), seed=0, target_err=1e-3, min_n=4)
+    assert len(results) == 4
+    np.testing.assert_array_equal(results, metrics.run_ci(4, noisy_score, (1e-6,), seed=0))
+    mean, err = ci_noisy_score(100, 1e-6, ci_seed=0, ci_target_err=1e-3, ci_min_n=4)
+    assert (mean, err) == metrics.mean_err(results)
+
+
+def test_confidence_interval_options():
+    fixed = metrics.confidence_interval(executor="thread", seed=3)(noisy_score)
+    assert fixed(5, 2.0) == ci_noisy_score(5, 2.0, ci_seed=3)
+    assert fixed.__name__ == "noisy_score"
+    with pytest.raises(ValueError):
+        ci_noisy_score(2, 1.0, ci_executor="gpu")
+    with pytest.raises(TypeError):
+        metrics.ci_rsmth(2, gen_normal, np.zeros((10, 4, 2)), unknown=1)
+
+
+def gen_shapes(N):
+    return np.cumsum(np.random.normal(size=(N, 16, 2)), axis=1)
+
+
+def gen_latent(c):
+    return np.tanh(c @ np.arange(1.0, 7.0).reshape((2, 3)))
+
+
+@pytest.mark.parametrize(
+    "ci_metric, args",
+    [
+        (metrics.ci_mmd, (lambda: gen_shapes(50), gen_shapes(40))),
+        (metrics.ci_mll, (gen_shapes, gen_shapes(40))),
+        (metrics.ci_rsmth, (gen_shapes, gen_shapes(40))),
+        (metrics.ci_rdiv, (gen_shapes(40), gen_shapes)),
+        (metrics.ci_cons, (gen_latent, 2)),
+    ],
+)
+def test_ci_metrics_are_seeded(ci_metric, args):
+    mean, err = ci_metric(3, *args, ci_seed=0)
+    assert np.isfinite(mean) and err >= 0
+    assert ci_metric(3, *args, ci_seed=0) == (mean, err)
+
+
+# the tiled metrics against their dense, naive formulas
+
+
+def naive_mmd(X, Y, sigma, unbiased):
+    k_xx = metrics.gaussian_kernel(X, X, sigma).reshape(len(X), len(X))
+    k_yy = metrics.gaussian_kernel(Y, Y, sigma).reshape(len(Y), len(Y))
+    k_xy = metrics.gaussian_kernel(X, Y, sigma)
+    if unbiased:
+        n, m = len(X), len(Y)
+        mmd2 = (k_xx.sum() - n) / (n * (n - 1)) + (k_yy.sum() - m) / (m * (m - 1)) - 2 * k_xy.mean()
+    else:
+        mmd2 = k_xx.mean() + k_yy.mean() - 2 * k_xy.mean()
+    return np.sqrt(max(mmd2, 0))
+
+
+@pytest.mark.parametrize("backend", ["numpy", "torch"])
+def test_tiled_mmd_matches_dense_kernels(backend):
+    if backend == "torch":
+        pytest.importorskip("torch")
+    rng = np.random.default_rng(0)
+    X, Y = rng.normal(size=(23, 5)), rng.normal(0.3, 1.2, size=(17, 5))
+    for block_size in [4, 7, 100]:
+        kwargs = dict(sigma=1.5, block_size=block_size, backend=backend)
+        assert metrics.kernel_sum(X, **kwargs) == pytest.approx(metrics.gaussian_kernel(X, X, 1.5).sum(), rel=1e-10)
+        assert metrics.kernel_sum(X, Y, **kwargs) == pytest.approx(metrics.gaussian_kernel(X, Y, 1.5).sum(), rel=1e-10)
+        for estimator in ["biased", "unbiased"]:
+            expected = naive_mmd(X, Y, 1.5, estimator == "unbiased")
+            assert metrics.mmd(X, Y, estimator=estimator, **kwargs) == pytest.approx(expected, rel=1e-8)
+
+
+def naive_kde_log_density(X, Y, bandwidth, loo=False):
+    from scipy.special import logsumexp
+
+    d2 = ((X[:, None] - Y[None]) ** 2).sum(-1)
+    if loo:
+        np.fill_diagonal(d2, np.inf)
+    n, d = len(Y) - loo, Y.shape[1]
+    return logsumexp(-d2 / (2 * bandwidth**2), axis=1) - np.log(n) - d / 2 * np.log(2 * np.pi * bandwidth**2)
+
+
+def test_tiled_kde_matches_logsumexp():
+    pytest.importorskip("scipy")
+    rng = np.random.default_rng(0)
+    X, Y = rng.normal(size=(19, 4)), rng.normal(size=(13, 4))
+    bandwidths = np.array([0.05, 0.3, 1.0])
+    for block_size in [4, 5, 256]:
+        log_density = metrics._kde_log_density(X, Y, bandwidths, block_size)
+        loo = metrics._kde_log_density(Y, Y, bandwidths, block_size, loo=True)
+        for k, h in enumerate(bandwidths):
+            np.testing.assert_allclose(log_density[k], naive_kde_log_density(X, Y, h), rtol=1e-10)
+            np.testing.assert_allclose(loo[k], naive_kde_log_density(Y, Y, h, loo=True), rtol=1e-10)
+    score = metrics.KernelDensity(bandwidth=0.3).fit(Y).score_samples(X)
+    np.testing.assert_allclose(metrics._kde_log_density(X, Y, [0.3], 4)[0], score, rtol=1e-10)
+    naive_loo = [naive_kde_log_density(Y, Y, h, loo=True).mean() for h in bandwidths]
+    assert metrics.select_bandwidth(Y, bandwidths, block_size=4) == bandwidths[np.argmax(naive_loo)]
+
+
+def test_variation_and_variance_match_naive_formulas():
+    X = np.random.default_rng(0).normal(size=(11, 6, 2))
+    naive_variation = np.mean([np.trace(np.cov(np.diff(x, axis=0).T)) / 2 for x in X])
+    flat = X.reshape((11, -1))
+    for chunk_size in [1, 3, 100]:
+        assert metrics.variation(X, chunk_size) == pytest.approx(naive_variation, rel=1e-12)
+        assert metrics.variance(flat, chunk_size) == pytest.approx(np.trace(np.cov(flat.T)) / 12, rel=1e-12)
+        assert metrics.variance(flat, chunk_size) == pytest.approx(np.var(flat, axis=0, ddof=1).mean(), rel=1e-12)
+
+
+def test_metric_suite_matches_the_separate_metrics():
+    rng = np.random.default_rng(0)
+    pool, X_test = rng.normal(size=(30, 6, 2)), rng.normal(size=(25, 6, 2))
+    report = metrics.MetricSuite(lambda N: pool, X_test, n=3, pool_size=3, block_size=4).evaluate()
+    mll_eval = metrics.MLLEvaluator(X_test)
+    expected = {
+        "mmd": [metrics.mmd(X, X_test) for X in np.split(pool, 3)],
+        "mll": [mll_eval(X) for X in np.split(pool, 3)],
+        "rsmth": [metrics._relative_variation(metrics.variation(X_test), X) for X in np.split(pool, 3)],
+        "rdiv": [metrics.rdiv(X_test, X) for X in np.split(pool, 3)],
+    }
+    for name, values in expected.items():
+        np.testing.assert_allclose(report[name], metrics.mean_err(values), rtol=1e-8, err_msg=name)
+
+
+def naive_consistency(gen_func, latent_dim, bounds, n_eval=100, n_points=50):
+    # one generator call and np.corrcoef per line
+    correlations = []
+    for _ in range(n_eval):
+        c = metrics.sample_line(latent_dim, n_points, bounds)
+        X = gen_func(c).reshape((n_points, -1))
+        dist_c = np.linalg.norm(c - c[0], axis=1)
+        dist_X = np.linalg.norm(X - X[0], axis=1)
+        correlations.append(np.corrcoef(dist_c, dist_X)[0, 1])
+    return np.mean(correlations)
+
+
+def test_ci_cons_matches_looped_consistency():
+    values = []
+    for seed in np.random.SeedSequence(0).spawn(3):  # the seed streams of run_ci
+        np.random.seed(int(seed.generate_state(1)[0]))
+        values.append(naive_consistency(gen_latent, 2, (0.0, 1.0)))
+    mean, err = metrics.ci_cons(3, gen_latent, 2, ci_seed=0, batch_size=128)
+    np.testing.assert_allclose((mean, err), metrics.mean_err(values), rtol=1e-10)
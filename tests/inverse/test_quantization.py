@@ -0,0 +1,43 @@
+"""INT8 generator of ``quantize_for_inference``."""
+import json
+import os
+import sys
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+SRC = os.path.join(os.path.dirname(__file__), "..", "..", "midbench", "inverse", "src")
+sys.path.insert(0, SRC)
+
+from models.cgans import AirfoilAoAGenerator  # noqa: E402
+from models.inference import quantize_for_inference  # noqa: E402
+from utils.dataloader import NoiseGenerator  # noqa: E402
+
+BACKEND = "fbgemm"
+pytestmark = pytest.mark.skipif(
+    BACKEND not in torch.backends.quantized.supported_engines, reason=f"no {BACKEND} engine"
+)
+
+
+def test_quantize_for_inference_restores_the_engine():
+    torch.manual_seed(0)
+    with open(os.path.join(SRC, "configs", "cebgan.json")) as f:
+        configs = json.load(f)
+    noise_gen = NoiseGenerator(64, sizes=configs["cz"], noise_type=configs["noise_type"])
+    generator = AirfoilAoAGenerator(**configs["gen"]).eval()
+    previous = torch.backends.quantized.engine
+    if previous == BACKEND:
+        pytest.skip(f"{BACKEND} is already the default engine")
+
+    calibration = [(noise_gen(), torch.randn(64, 3)) for _ in range(2)]
+    int8 = quantize_for_inference(generator, calibration, backend=BACKEND)
+    assert torch.backends.quantized.engine == previous
+
+    noise, inp_paras = noise_gen(), torch.randn(64, 3)
+    with torch.no_grad():
+        (dp, aoa), *_ = generator(noise, inp_paras)
+        (dp_q, aoa_q), *_ = int8(noise, inp_paras)
+    assert dp_q.shape == dp.shape and aoa_q.shape == aoa.shape
+    # the INT8 copy stays close to float32, and runs under the restored engine
+    assert (dp_q - dp).norm() / dp.norm() < 0.1
@@ -0,0 +1,70 @@
+"""Resumable streaming of generator samples with ``stream_samples``."""
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+torch = pytest.importorskip("torch")
+
+SRC = os.path.join(os.path.dirname(__file__), "..", "..", "midbench", "inverse", "src")
+sys.path.insert(0, SRC)
+
+from utils.sampling import stream_samples  # noqa: E402
+
+CZ, NOISE_TYPE = [3, 2], ["u", "n"]
+
+
+class Generator(torch.nn.Module):
+    """A conditional generator of 8-point airfoils that fails after ``fail_after`` calls."""
+
+    n_data_points = 8
+
+    def __init__(self, fail_after=None):
+        super().__init__()
+        self.linear = torch.nn.Linear(sum(CZ) + 2, 2 * self.n_data_points + 1)
+        rng = torch.Generator().manual_seed(0)
+        for parameter in self.linear.parameters():
+            torch.nn.init.normal_(parameter, generator=rng)
+        self.fail_after = fail_after
+
+    def forward(self, noise, cond):
+        if self.fail_after is not None:
+            if self.fail_after == 0:
+                raise KeyboardInterrupt
+            self.fail_after -= 1
+        out = self.linear(torch.cat([noise, cond], dim=1))
+        return (out[:, :-1].reshape(len(out), 2, -1), out[:, -1:]), None
+
+
+def stream(out_dir, generator=None, **kwargs):
+    conditions = np.linspace(0.0, 1.0, 6, dtype=np.float32).reshape(3, 2)
+    kwargs = {"chunk_size": 4, "seed": 0, **kwargs}
+    return stream_samples(generator or Generator(), conditions, 10, str(out_dir), CZ, NOISE_TYPE, **kwargs)
+
+
+def test_resume_matches_an_uninterrupted_run(tmp_path):
+    reference = [np.array(each) for each in stream(tmp_path / "reference")]
+    assert reference[0].shape == (10, 8, 2)
+    np.testing.assert_array_equal(reference[2][3], reference[2][0])
+
+    with pytest.raises(KeyboardInterrupt):
+        stream(tmp_path / "run", Generator(fail_after=2))
+    assert np.load(tmp_path / "run" / "done.npy").tolist() == [True, True, False]
+    for resumed, expected in zip(stream(tmp_path / "run", n_workers=2), reference):
+        np.testing.assert_array_equal(resumed, expected)
+
+
+@pytest.mark.parametrize("kwargs", [{"seed": 1}, {"chunk_size": 5}])
+def test_resume_refuses_another_run(kwargs, tmp_path):
+    # a chunk size of 5 gives the same number of chunks, hence the same done.npy
+    with pytest.raises(KeyboardInterrupt):
+        stream(tmp_path, Generator(fail_after=1))
+    with pytest.raises(ValueError):
+        stream(tmp_path, **kwargs)
+    with pytest.raises(ValueError):  # missing run record
+        os.remove(tmp_path / "run.json")
+        stream(tmp_path)
+    reference = stream(tmp_path / "reference", **kwargs)
+    for fresh, expected in zip(stream(tmp_path, resume=False, **kwargs), reference):
+        np.testing.assert_array_equal(fresh, expected)
@@ -0,0 +1,47 @@
+"""
+Benchmark of midbench.envs.airfoil.su2_io against the pandas parsing of the SU2 outputs.
+
+Writes a synthetic history.csv in the SU2 format and checks that both paths
+extract the same final CD and CL.
+"""
+import os
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+from midbench.envs.airfoil import su2_io
+
+COLUMNS = ['Time_Iter', 'Outer_Iter', 'Inner_Iter', 'rms[Rho]', 'rms[RhoU]', 'rms[RhoV]', 'rms[RhoE]',
+           'rms[nu]', 'CD', 'CL', 'CSF', 'CMx', 'CMy', 'CMz', 'CFx', 'CFy', 'CFz', 'CEff']
+
+def write_history(path, n_iter):
+    rng = np.random.default_rng(0)
+    with open(path, 'w') as f:
+        f.write(','.join('{:^18}'.format('"{}"'.format(name)) for name in COLUMNS) + '\n')
+        values = rng.normal(size=(n_iter, len(COLUMNS)))
+        values[:, :3] = np.arange(n_iter)[:, None]
+        np.savetxt(f, values, delimiter=',', fmt='%18.10e')
+
+def pandas_last_row(path):
+    data = pd.read_csv(path)
+    data.dropna(inplace = True)
+    return data['       "CD"       '][data.index[-1]], data['       "CL"       '][data.index[-1]]
+
+def timed(func, *args, n_repeat=5):
+    start = time.perf_counter()
+    for _ in range(n_repeat): out = func(*args)
+    return out, (time.perf_counter() - start) / n_repeat
+
+if __name__ == '__main__':
+    path = os.path.join(tempfile.mkdtemp(), 'history.csv')
+    for n_iter in [1000, 10000, 100000]:
+        write_history(path, n_iter)
+        (cd, cl), t_pandas = timed(pandas_last_row, path)
+        row, t_tail = timed(su2_io.read_last_row, path)
+        assert np.isclose(row['CD'], cd) and np.isclose(row['CL'], cl)
+        print('history.csv, {} iterations: pandas {:.2f} ms, tail seek {:.3f} ms'.format(
+            n_iter, t_pandas * 1e3, t_tail * 1e3))
+
+        _, t_pandas = timed(lambda: pd.read_csv(path).dropna()[['       "CD"       ', '       "CL"       ']].to_numpy())
+        _, t_loadtxt = timed(su2_io.read_columns, path, ['CD', 'CL'])
+        print('  full CD/CL columns: pandas {:.2f} ms, su2_io {:.2f} ms'.format(t_pandas * 1e3, t_loadtxt * 1e3))